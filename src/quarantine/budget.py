@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import os
+import random
+import time
+from typing import Any, Iterator, Optional
+
+from aws_lambda_powertools import Logger
+import boto3
+
+from quarantine.constants import (
+    API_BUDGET_ENABLED,
+    BUDGET_CONTAINMENT_RESERVE,
+    BUDGET_MAX_WAIT_SECS,
+    BUDGET_WINDOW_SECS,
+    RATE_LIMITS,
+)
+from quarantine.store import AbstractStore, get_store
+
+logger = Logger(child=True)
+
+__all__ = ["ApiBudget", "BudgetExhausted", "plugin_scope", "register_budget"]
+
+AWS_ACCOUNT_ID = os.getenv("AWS_ACCOUNT_ID", "")
+
+# Attempts at a conditional write before waiting for the next window
+MAX_ATTEMPTS = 5
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised when a non-critical call could not get budget in time
+    """
+
+
+class _Scope:
+    def __init__(self, critical: bool) -> None:
+        self.critical = critical
+        self.exhausted = False
+
+
+# Priority of the plugin making calls on the current thread, inherited by the threads it starts
+# with ContextThreadPoolExecutor. Calls made outside a plugin are treated as critical.
+_SCOPE: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("scope", default=None)
+
+
+@contextmanager
+def plugin_scope(critical: bool) -> Iterator[_Scope]:
+    """
+    Run calls at the priority of a plugin, the scope records whether the budget ran out
+    """
+
+    scope = _Scope(critical)
+    token = _SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _SCOPE.reset(token)
+
+
+class ApiBudget:
+    """
+    Per-account, per-API call budget shared by every concurrent invocation through the state
+    store.
+
+    Time is divided into windows of `BUDGET_WINDOW_SECS` and each API may be called at its rate
+    limit in each window, counted with conditional writes. Non-critical (forensic) calls may only
+    use the budget not reserved for containment. Non-critical callers that find the window spent
+    wait for a later window with jitter so they do not all retry at once, critical callers that
+    have used the whole window, reserve included, make the call without waiting.
+    """
+
+    def __init__(self, store: AbstractStore, account_id: str = AWS_ACCOUNT_ID) -> None:
+        self.store = store
+        self.account_id = account_id
+
+    def _capacity(self, api: str, critical: bool) -> int:
+        rate, _ = RATE_LIMITS[api]
+        capacity = rate * BUDGET_WINDOW_SECS
+        if not critical:
+            capacity *= 1 - BUDGET_CONTAINMENT_RESERVE
+        return max(1, int(capacity))
+
+    def _take(self, api: str, critical: bool) -> bool:
+        window = int(time.time() // BUDGET_WINDOW_SECS)
+        key = f"budget#{self.account_id}#{api}#{window}"
+        capacity = self._capacity(api, critical)
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(key)
+            used = item["used"] if item is not None else 0
+            if used >= capacity:
+                return False
+
+            ttl = int((window + 1) * BUDGET_WINDOW_SECS) + 60
+            version = item["version"] if item is not None else None
+            if self.store.put(key, {"used": used + 1, "ttl": ttl}, version):
+                return True
+
+        return False
+
+    def acquire(self, api: str, critical: bool = True) -> None:
+        """
+        Take one call of budget for an API ("service.Operation"), waiting for it if needed
+
+        Critical calls proceed at once when the window is spent, waiting would only delay
+        containment. Non-critical calls wait up to `BUDGET_MAX_WAIT_SECS` for a later window and
+        raise BudgetExhausted after that.
+        """
+
+        deadline = time.monotonic() + BUDGET_MAX_WAIT_SECS
+        while not self._take(api, critical):
+            if critical:
+                logger.warning(f"No budget for {api}, calling it anyway")
+                return
+            if time.monotonic() >= deadline:
+                raise BudgetExhausted(f"No budget for {api} within {BUDGET_MAX_WAIT_SECS}s")
+
+            # wait for the next window, spread out across it
+            window_end = (time.time() // BUDGET_WINDOW_SECS + 1) * BUDGET_WINDOW_SECS
+            delay = window_end - time.time() + random.uniform(0, BUDGET_WINDOW_SECS)
+            logger.debug(f"Waiting {delay:.3f}s for {api} budget")
+            time.sleep(delay)
+
+
+def register_budget(client: Any, service_name: str, session: boto3.Session) -> None:
+    """
+    Make calls to rate limited APIs of a boto3 client take budget first
+    """
+
+    if not API_BUDGET_ENABLED or not any(api.startswith(f"{service_name}.") for api in RATE_LIMITS):
+        return
+
+    def before_call(model: Any, **kwargs: Any) -> None:
+        api = f"{service_name}.{model.name}"
+        if api not in RATE_LIMITS:
+            return
+
+        scope = _SCOPE.get()
+        critical = scope is None or scope.critical
+        try:
+            ApiBudget(get_store(session)).acquire(api, critical)
+        except BudgetExhausted:
+            scope.exhausted = True
+            raise
+
+    client.meta.events.register("before-parameter-build", before_call)
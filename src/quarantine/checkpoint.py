@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import CHECKPOINT_TTL_SECS
+from quarantine.store import AbstractStore
+
+logger = Logger(child=True)
+
+__all__ = ["Checkpoint"]
+
+# Attempts at a conditional write before giving up on a heavily contended checkpoint
+MAX_ATTEMPTS = 10
+
+
+class Checkpoint:
+    """
+    Progress of the plugins quarantining an instance for a finding, so a retried or resumed
+    invocation continues from the first incomplete plugin instead of starting over.
+
+    Each completed plugin is recorded with its output (such as snapshot IDs, isolation group IDs
+    or artifact keys) and any work it left pending.
+    """
+
+    def __init__(self, store: AbstractStore, instance_id: str, finding_id: str) -> None:
+        self.store = store
+        self.instance_id = instance_id
+        self.finding_id = finding_id
+
+        self.key = f"checkpoint#{finding_id}#{instance_id}"
+
+        self._completed: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Plugins completed by this or a previous invocation, read from the store once
+        """
+
+        with self._lock:
+            if self._completed is None:
+                item = self.store.get(self.key)
+                self._completed = item["plugins"] if item is not None else {}
+                if self._completed:
+                    logger.info(f"Resuming after completed plugins {sorted(self._completed)}")
+            return self._completed
+
+    def record(self, name: str, output: Dict[str, Any], pending: Optional[str] = None) -> None:
+        """
+        Record a plugin as completed
+        """
+
+        entry = {"output": output, "pending": pending}
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(self.key)
+            version = item["version"] if item is not None else None
+            plugins = item["plugins"] if item is not None else {}
+            plugins[name] = entry
+
+            item = {"plugins": plugins, "ttl": int(time.time()) + CHECKPOINT_TTL_SECS}
+            if self.store.put(self.key, item, version):
+                with self._lock:
+                    self._completed = plugins
+                logger.debug(f"Recorded checkpoint of plugin {name}")
+                return
+
+        # losing the checkpoint only means the plugin runs again on a retry
+        logger.warning(f"Unable to record checkpoint of plugin {name}")
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint once the quarantine has completed
+        """
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(self.key)
+            if item is None or self.store.delete(self.key, item["version"]):
+                with self._lock:
+                    self._completed = {}
+                return
@@ -19,23 +19,195 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import os
+
 from botocore.config import Config
 
 __all__ = [
+    "API_BUDGET_ENABLED",
+    "API_CONNECT_TIMEOUT_SECS",
+    "API_MAX_ATTEMPTS",
+    "API_READ_TIMEOUT_SECS",
+    "ARTIFACT_COMPRESSION_LEVEL",
+    "ARTIFACT_KEY_LAYOUT",
+    "ARTIFACT_KEY_SHARD_WIDTH",
+    "ARTIFACT_MULTIPART_THRESHOLD",
+    "ARTIFACT_PART_SIZE",
     "BOTO3_CONFIG",
+    "BUDGET_CONTAINMENT_RESERVE",
+    "BUDGET_MAX_WAIT_SECS",
+    "BUDGET_WINDOW_SECS",
+    "CHECKPOINT_TTL_SECS",
+    "DEADLINE_CRITICAL_RESERVE_SECS",
+    "DEADLINE_SAFETY_MARGIN_SECS",
+    "DEFAULT_RATE_LIMIT",
+    "DEFERRED_PLUGINS_TAG",
+    "ELB_SCAN_MAX_WORKERS",
+    "LB_INDEX_REBUILD_SECS",
+    "LB_INDEX_TTL_SECS",
+    "MAX_POOL_CONNECTIONS",
+    "NOTIFICATION_STREAMING",
+    "PENDING_COMMAND_TAG",
+    "PENDING_SINCE_TAG",
+    "PLUGIN_MAX_WORKERS",
+    "PROFILE_READY_TIMEOUT_SECS",
+    "QUARANTINE_LEASE_SECS",
+    "QUARANTINE_RECORD_RETENTION_SECS",
+    "RATE_LIMITS",
+    "SNAPSHOT_MAX_WORKERS",
+    "SQS_MAX_CONCURRENT_INSTANCES",
+    "SSM_ASYNC_CAPTURE",
+    "SSM_ASYNC_EXECUTION_TIMEOUT_SECS",
     "SSM_COMMANDS",
-    "SSM_DRAIN_TIME_SECS"
+    "SSM_COMMAND_TIMEOUT_SECS",
+    "SSM_DRAIN_TIME_SECS",
+    "STATE_TABLE",
 ]
 
+# Size of the connection pool of each shared client. This should be at least the number of
+# plugins that can execute concurrently, or parallel plugins will queue for a connection.
+MAX_POOL_CONNECTIONS = int(os.getenv("MAX_POOL_CONNECTIONS", "25"))
+
+# Limits of a single API attempt and of the attempts made for a call. Calls made by a plugin
+# are also not retried once the time budget of the plugin has run out.
+API_CONNECT_TIMEOUT_SECS = int(os.getenv("API_CONNECT_TIMEOUT_SECS", "5"))
+API_READ_TIMEOUT_SECS = int(os.getenv("API_READ_TIMEOUT_SECS", "20"))
+API_MAX_ATTEMPTS = int(os.getenv("API_MAX_ATTEMPTS", "10"))
+
 BOTO3_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    connect_timeout=API_CONNECT_TIMEOUT_SECS,
+    read_timeout=API_READ_TIMEOUT_SECS,
     retries={
-        "max_attempts": 10,
+        "max_attempts": API_MAX_ATTEMPTS,
         "mode": "standard",
-    }
+    },
 )
 
-# Commands to execute on EC2 instances for information gathering
-SSM_COMMANDS = ["uname -a", "whoami", "netstat -ap", "lsof"]
+# Commands to execute on EC2 instances for information gathering. Addresses and ports are not
+# resolved to names, so the parsed netstat and lsof datasets can be queried by IP address.
+SSM_COMMANDS = ["uname -a", "whoami", "netstat -anp", "lsof -nP"]
+
+# Maximum amount of time to wait for a newly attached instance profile to be associated and for
+# the SSM agent to report online
+PROFILE_READY_TIMEOUT_SECS = 30
 
-# Amount of time to wait after executing an SSM command for the output to be uploaded to S3
+# Maximum amount of time to wait for SSM commands to finish executing
+SSM_COMMAND_TIMEOUT_SECS = 60
+
+# Maximum amount of time to wait after executing an SSM command for the output to be uploaded to S3
 SSM_DRAIN_TIME_SECS = 10
+
+# When enabled, the quarantine function sends the SSM commands and returns without waiting for
+# them. Isolation and the other plugins that depend on the commands are deferred, so the SSM
+# agent keeps network access to upload the output. The SSM completion notification removes the
+# temporary instance profile and runs the deferred plugins.
+SSM_ASYNC_CAPTURE = os.getenv("SSM_ASYNC_CAPTURE", "false").lower() == "true"
+
+# Execution timeout of asynchronous SSM commands. A capture still pending this long after the
+# commands were sent, plus SSM_DRAIN_TIME_SECS for the output upload, is completed by the
+# scheduled sweep of the SSM completion function even if no notification arrived, so isolation
+# is never deferred much longer than this.
+SSM_ASYNC_EXECUTION_TIMEOUT_SECS = int(os.getenv("SSM_ASYNC_EXECUTION_TIMEOUT_SECS", "300"))
+
+# Instance tags that record an asynchronous SSM capture in progress
+PENDING_COMMAND_TAG = "SOC-PendingCommandId"
+DEFERRED_PLUGINS_TAG = "SOC-DeferredPlugins"
+PENDING_SINCE_TAG = "SOC-PendingSince"
+
+# Number of plugins that may execute concurrently. Set to 1 to run plugins sequentially in
+# filename order.
+PLUGIN_MAX_WORKERS = int(os.getenv("PLUGIN_MAX_WORKERS", "6"))
+
+# Number of instances quarantined concurrently from a single SQS batch
+SQS_MAX_CONCURRENT_INSTANCES = int(os.getenv("SQS_MAX_CONCURRENT_INSTANCES", "5"))
+
+# DynamoDB table holding state shared between concurrent invocations. When unset, state is only
+# shared between invocations in the same container.
+STATE_TABLE = os.getenv("STATE_TABLE")
+
+# How long an invocation owns the quarantine of an instance before another invocation may take
+# over, this should be at least the function timeout
+QUARANTINE_LEASE_SECS = int(os.getenv("QUARANTINE_LEASE_SECS", "900"))
+
+# How long the record of a completed quarantine (and the findings it covered) is kept
+QUARANTINE_RECORD_RETENTION_SECS = int(
+    os.getenv("QUARANTINE_RECORD_RETENTION_SECS", str(30 * 24 * 60 * 60))
+)
+
+# Publish the result of every plugin as it finishes (in batches) in addition to the digest of
+# the incident published at the end of the invocation
+NOTIFICATION_STREAMING = os.getenv("NOTIFICATION_STREAMING", "false").lower() == "true"
+
+# Time kept at the end of an invocation to report cancelled plugins and release the quarantine
+DEADLINE_SAFETY_MARGIN_SECS = int(os.getenv("DEADLINE_SAFETY_MARGIN_SECS", "5"))
+
+# Time reserved for critical plugins: until they have all finished, non-critical plugins may
+# not use the last seconds of the invocation
+DEADLINE_CRITICAL_RESERVE_SECS = int(os.getenv("DEADLINE_CRITICAL_RESERVE_SECS", "20"))
+
+# How long the plugin progress of a finding is kept for retries to resume from
+CHECKPOINT_TTL_SECS = int(os.getenv("CHECKPOINT_TTL_SECS", str(24 * 60 * 60)))
+
+# Artifacts larger than the threshold (in bytes) are uploaded in parts, so at most one part is
+# held in memory. Parts must be at least 5 MiB.
+ARTIFACT_MULTIPART_THRESHOLD = int(os.getenv("ARTIFACT_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+ARTIFACT_PART_SIZE = max(
+    5 * 1024 * 1024, int(os.getenv("ARTIFACT_PART_SIZE", str(8 * 1024 * 1024)))
+)
+
+# gzip level of compressed artifacts such as the instance metadata and the SSM command output
+ARTIFACT_COMPRESSION_LEVEL = int(os.getenv("ARTIFACT_COMPRESSION_LEVEL", "6"))
+
+# Key prefix of the artifacts of an incident, with the fields {shard} (leading hex characters
+# of a hash of the instance ID, to spread the request load), {year}, {month}, {day} and {hour}
+# (when the incident started), {instance_id} and {finding_id}
+ARTIFACT_KEY_LAYOUT = os.getenv(
+    "ARTIFACT_KEY_LAYOUT",
+    "shard={shard}/year={year}/month={month}/day={day}/"
+    "instance_id={instance_id}/finding_id={finding_id}",
+)
+ARTIFACT_KEY_SHARD_WIDTH = int(os.getenv("ARTIFACT_KEY_SHARD_WIDTH", "2"))
+
+# Number of volumes snapshotted in parallel when they are not covered by the multi-volume
+# CreateSnapshots call
+SNAPSHOT_MAX_WORKERS = int(os.getenv("SNAPSHOT_MAX_WORKERS", "4"))
+
+# Number of target groups checked concurrently when looking for the target groups of an instance
+ELB_SCAN_MAX_WORKERS = int(os.getenv("ELB_SCAN_MAX_WORKERS", "8"))
+
+# How long load balancer index entries are used for. The index function rebuilds the index every
+# 15 minutes, this should be longer so a single failed rebuild does not expire the index.
+LB_INDEX_TTL_SECS = int(os.getenv("LB_INDEX_TTL_SECS", "1800"))
+
+# Interval of the index function schedule. An index built longer ago than this missed a rebuild,
+# registrations since then are not in it so the load balancers of the instance are scanned.
+LB_INDEX_REBUILD_SECS = int(os.getenv("LB_INDEX_REBUILD_SECS", "900"))
+
+# Client-side rate limits of API operations as (calls per second, burst), shared by every
+# invocation in the container. EC2 mutating calls have their own, smaller buckets in the EC2 API
+# request rate limits, so each gets its own limiter. Limits adapt down when calls are throttled.
+DEFAULT_RATE_LIMIT = (float(os.getenv("DEFAULT_RATE_LIMIT", "20")), 40)
+RATE_LIMITS = {
+    "ec2.CreateSnapshot": (5.0, 10),
+    "ec2.CreateSnapshots": (5.0, 10),
+    "ec2.CreateSecurityGroup": (5.0, 10),
+    "ec2.CreateTags": (5.0, 10),
+    "ec2.DeleteTags": (5.0, 10),
+    "ec2.ModifyInstanceAttribute": (5.0, 10),
+    "ec2.ModifyNetworkInterfaceAttribute": (5.0, 10),
+    "ec2.RevokeSecurityGroupEgress": (5.0, 10),
+    "ec2.AssociateIamInstanceProfile": (5.0, 10),
+    "ec2.DisassociateIamInstanceProfile": (5.0, 10),
+    "ec2.GetConsoleScreenshot": (2.0, 5),
+    "ssm.SendCommand": (5.0, 10),
+}
+
+# Concurrent invocations share a per-account budget for each rate limited API (RATE_LIMITS)
+# through the state table. Forensic plugins may only use the part of each window not reserved
+# for containment plugins, and give up after waiting BUDGET_MAX_WAIT_SECS for budget. Containment
+# plugins that have used the whole window do not wait.
+API_BUDGET_ENABLED = os.getenv("API_BUDGET_ENABLED", "true").lower() == "true"
+BUDGET_WINDOW_SECS = int(os.getenv("BUDGET_WINDOW_SECS", "1"))
+BUDGET_CONTAINMENT_RESERVE = float(os.getenv("BUDGET_CONTAINMENT_RESERVE", "0.3"))
+BUDGET_MAX_WAIT_SECS = int(os.getenv("BUDGET_MAX_WAIT_SECS", "10"))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.resources import AutoScaling, EC2, SSM
+from quarantine.utils import ContextThreadPoolExecutor
+
+logger = Logger(child=True)
+
+__all__ = ["InstanceContext"]
+
+
+class InstanceContext:
+    """
+    Request-scoped cache of the state of a single instance, shared by all plugins.
+
+    Each attribute is described at most once per invocation. Plugins that modify the instance
+    must call `invalidate()` with the attributes they changed so the next read is fresh.
+    """
+
+    ATTRIBUTES = (
+        "instance",
+        "network_interfaces",
+        "volumes",
+        "iam_instance_profile_associations",
+        "auto_scaling_groups",
+        "instance_information",
+    )
+
+    # Attributes describing the EC2 state of the instance, read by most plugins. Volumes are only
+    # described when a plugin reads them.
+    PREFETCH = ("instance", "network_interfaces", "iam_instance_profile_associations")
+
+    def __init__(
+        self,
+        ec2: EC2,
+        instance_id: str,
+        autoscaling: Optional[AutoScaling] = None,
+        ssm: Optional[SSM] = None,
+    ) -> None:
+        self.ec2 = ec2
+        self.autoscaling = autoscaling
+        self.ssm = ssm
+        self.instance_id = instance_id
+
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {
+            name: threading.Lock() for name in self.ATTRIBUTES
+        }
+
+    def _get(self, name: str, loader: Callable[[str], Any]) -> Any:
+        with self._lock:
+            if name in self._cache:
+                return self._cache[name]
+
+        # only one thread describes a given attribute, the others wait for its result
+        with self._loading[name]:
+            with self._lock:
+                if name in self._cache:
+                    return self._cache[name]
+
+            value = loader(self.instance_id)
+
+            with self._lock:
+                self._cache[name] = value
+
+        return value
+
+    @property
+    def instance(self) -> Dict[str, Any]:
+        return self._get("instance", self.ec2.describe_instances)
+
+    @property
+    def network_interfaces(self) -> List[Dict[str, Any]]:
+        return self._get("network_interfaces", self.ec2.describe_network_interfaces)
+
+    @property
+    def volumes(self) -> List[Dict[str, Any]]:
+        return self._get("volumes", self.ec2.describe_volumes)
+
+    @property
+    def iam_instance_profile_associations(self) -> List[Dict[str, Any]]:
+        return self._get(
+            "iam_instance_profile_associations",
+            self.ec2.describe_iam_instance_profile_associations,
+        )
+
+    @property
+    def auto_scaling_groups(self) -> List[str]:
+        return self._get("auto_scaling_groups", self.autoscaling.describe_auto_scaling_groups)
+
+    @property
+    def instance_information(self) -> List[Dict[str, Any]]:
+        return self._get("instance_information", self.ssm.describe_instance_information)
+
+    def seed(self, name: str, value: Any) -> None:
+        """
+        Cache an attribute that was already described elsewhere, such as in a batch request
+        """
+
+        if name not in self.ATTRIBUTES:
+            raise ValueError(f"Unknown instance context attribute: {name}")
+
+        with self._lock:
+            self._cache[name] = value
+
+    def prefetch(self) -> None:
+        """
+        Describe the EC2 state of the instance in parallel. Failures are logged and left uncached
+        so the plugin that reads the attribute sees the error.
+        """
+
+        def load(name: str) -> None:
+            try:
+                getattr(self, name)
+            except Exception:
+                logger.exception(f"Unable to prefetch {name} for instance {self.instance_id}")
+
+        with ContextThreadPoolExecutor(max_workers=len(self.PREFETCH)) as executor:
+            list(executor.map(load, self.PREFETCH))
+
+    def invalidate(self, *names: str) -> None:
+        """
+        Drop the cached attributes so they are described again on next access. With no arguments,
+        the entire cache is cleared.
+        """
+
+        with self._lock:
+            if not names:
+                self._cache.clear()
+            for name in names:
+                self._cache.pop(name, None)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+
+from quarantine.resources.s3 import ArtifactWriter
+from quarantine.utils import json_dumps
+
+logger = Logger(child=True)
+
+__all__ = ["DatasetWriter", "iter_lines", "parse_command_output"]
+
+NETSTAT = "netstat"
+LSOF = "lsof"
+
+# Internet socket protocols listed by netstat
+NETSTAT_PROTOCOLS = {"tcp", "tcp6", "udp", "udp6", "udplite", "udplite6", "raw", "raw6"}
+
+# netstat -p shows "PID/Program name" (which may contain spaces), or "-" when unknown
+NETSTAT_PROGRAM = re.compile(r"^(?:\d+/|-$)")
+
+# lsof NAME of a network file, such as "10.0.0.5:22->10.0.0.9:51234 (ESTABLISHED)"
+LSOF_NETWORK_NAME = re.compile(r"^(\S+?)(?:->(\S+))?(?: \((\w+)\))?$")
+
+# Records are encoded in batches of about this many bytes before they are compressed
+WRITE_BATCH_SIZE = 64 * 1024
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Split a stream of chunks into lines, without holding more than a chunk and a line in memory
+    """
+
+    remainder = b""
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if remainder:
+        yield remainder.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value is not None and value.isdigit() else None
+
+
+def _split_address(address: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Split "host:port" (or "[::1]:port", ":::port" and "*:*") into an address and port
+    """
+
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, None
+    host = host.strip("[]")
+    return (host if host != "*" else None), _to_int(port)
+
+
+def _parse_netstat(line: str) -> Optional[Dict[str, Any]]:
+    tokens = line.split()
+    if len(tokens) < 5 or tokens[0] not in NETSTAT_PROTOCOLS:
+        return None
+
+    protocol, recv_q, send_q, local, foreign, *rest = tokens
+
+    # UDP and raw sockets may have no state, the program is the last column with -p
+    start = next(
+        (index for index, token in enumerate(rest) if NETSTAT_PROGRAM.match(token)), len(rest)
+    )
+    state = rest[0] if start > 0 else None
+    program = " ".join(rest[start:])
+
+    pid = None
+    if program and program != "-":
+        pid, _, program = program.partition("/")
+    elif program == "-":
+        program = None
+
+    local_address, local_port = _split_address(local)
+    foreign_address, foreign_port = _split_address(foreign)
+    return {
+        "protocol": protocol,
+        "recv_q": _to_int(recv_q),
+        "send_q": _to_int(send_q),
+        "local_address": local_address,
+        "local_port": local_port,
+        "foreign_address": foreign_address,
+        "foreign_port": foreign_port,
+        "state": state,
+        "pid": _to_int(pid),
+        "program": program or None,
+    }
+
+
+class _LsofColumns:
+    """
+    Columns of the lsof output, located by the positions of the header titles
+
+    lsof aligns every column over the whole output, so each value overlaps the title of its
+    column. Columns can be empty (such as TID for processes), which splitting on whitespace
+    alone cannot tell apart. NAME is the rest of the line and may contain spaces.
+    """
+
+    def __init__(self, header: str) -> None:
+        self.spans = [
+            (match.group().lower().replace("/", "_"), match.start(), match.end())
+            for match in re.finditer(r"\S+", header)
+        ]
+        self.name_start = self.spans[-1][1]
+
+    def parse(self, line: str) -> Optional[Dict[str, Any]]:
+        values: Dict[str, Any] = {column: None for column, _, _ in self.spans}
+        for match in re.finditer(r"\S+", line):
+            start, end = match.span()
+            if start >= self.name_start:
+                values["name"] = line[start:].rstrip()
+                break
+
+            # the column overlapping the value the most, or else the closest one
+            column = min(
+                self.spans[:-1],
+                key=lambda span: (
+                    max(span[1] - end, start - span[2], 0),
+                    max(start, span[1]) - min(end, span[2]),
+                ),
+            )[0]
+            if values[column] is None:
+                values[column] = match.group()
+            else:
+                values[column] += f" {match.group()}"
+
+        if values.get("pid") is None or not str(values["pid"]).isdigit():
+            return None
+
+        values["pid"] = _to_int(values["pid"])
+        if "tid" in values:
+            values["tid"] = _to_int(values["tid"])
+
+        if values.get("type") in ("IPv4", "IPv6") and values.get("name"):
+            match = LSOF_NETWORK_NAME.match(values["name"])
+            if match is not None:
+                local, remote, state = match.groups()
+                values["local_address"], values["local_port"] = _split_address(local)
+                values["remote_address"], values["remote_port"] = (
+                    _split_address(remote) if remote else (None, None)
+                )
+                values["state"] = state
+        return values
+
+
+def parse_command_output(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse the combined output of the SSM commands into (dataset, record) pairs
+
+    The commands write to a single output, so the netstat and lsof sections are recognized by
+    their headers. Rows of internet sockets from netstat and every file from lsof are parsed
+    into records, all other lines are skipped.
+    """
+
+    mode = None
+    columns: Optional[_LsofColumns] = None
+
+    for line in lines:
+        if line.startswith("Active Internet connections"):
+            mode = NETSTAT
+            continue
+        if line.startswith("Active "):
+            # UNIX domain and other sockets
+            mode = None
+            continue
+        if line.startswith("COMMAND") and " PID " in line and line.rstrip().endswith("NAME"):
+            mode = LSOF
+            columns = _LsofColumns(line)
+            continue
+
+        if mode == NETSTAT:
+            record = _parse_netstat(line)
+        elif mode == LSOF:
+            record = columns.parse(line)
+        else:
+            continue
+
+        if record is not None:
+            yield mode, record
+
+
+class DatasetWriter:
+    """
+    Write records as gzip compressed JSON lines, one artifact per dataset
+
+    The artifacts are opened on the first record of their dataset, so datasets without records
+    are not written. Use it as a context manager, so the uploads are aborted on error.
+    """
+
+    def __init__(self, open_dataset: Callable[[str], ArtifactWriter]) -> None:
+        self.open_dataset = open_dataset
+
+        self.counts: Dict[str, int] = {}
+        self._writers: Dict[str, ArtifactWriter] = {}
+        self._batches: Dict[str, List[str]] = {}
+        self._sizes: Dict[str, int] = {}
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        if exc_type is not None:
+            for writer in self._writers.values():
+                writer.abort()
+
+    def write(self, dataset: str, record: Dict[str, Any]) -> None:
+        if dataset not in self._writers:
+            self._writers[dataset] = self.open_dataset(dataset)
+            self._batches[dataset] = []
+            self._sizes[dataset] = 0
+            self.counts[dataset] = 0
+
+        line = json_dumps(record) + "\n"
+        self._batches[dataset].append(line)
+        self._sizes[dataset] += len(line)
+        self.counts[dataset] += 1
+
+        if self._sizes[dataset] >= WRITE_BATCH_SIZE:
+            self._flush(dataset)
+
+    def _flush(self, dataset: str) -> None:
+        self._writers[dataset].write("".join(self._batches[dataset]))
+        self._batches[dataset].clear()
+        self._sizes[dataset] = 0
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish every dataset and return their artifacts
+        """
+
+        artifacts = []
+        for dataset, writer in self._writers.items():
+            self._flush(dataset)
+            artifacts.append({**writer.close(), "records": self.counts[dataset]})
+        return artifacts
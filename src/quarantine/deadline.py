@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import time
+from typing import Any, Iterator, Optional
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+__all__ = ["Deadline", "DeadlineExceeded", "plugin_deadline", "register_deadline", "remaining"]
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised at the next API call of a plugin that ran out of time
+    """
+
+
+class Deadline:
+    """
+    Point in time by which work must finish, measured on the monotonic clock
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.expires = time.monotonic() + seconds
+
+        # whether work was cancelled because the deadline passed
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, operation: str) -> None:
+        """
+        Cancel the caller by raising DeadlineExceeded once the deadline has passed
+        """
+
+        if self.expired:
+            self.cancelled = True
+            raise DeadlineExceeded(f"Deadline passed before {operation}")
+
+
+# Deadline of the plugin making calls on the current thread, inherited by the threads it starts
+# with ContextThreadPoolExecutor. Calls made outside a plugin are not limited.
+_DEADLINE: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+@contextmanager
+def plugin_deadline(seconds: float) -> Iterator[Deadline]:
+    """
+    Run calls with a time budget, the deadline records whether the plugin was cancelled
+    """
+
+    deadline = Deadline(seconds)
+    token = _DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the deadline of the current plugin, or None without a deadline
+    """
+
+    deadline = _DEADLINE.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def register_deadline(client: Any, service_name: str) -> None:
+    """
+    Make calls of a boto3 client honor the deadline of the plugin making them
+
+    A call is not started once the deadline has passed, and a failed attempt is not retried. The
+    connect and read timeouts of the client bound how far a single attempt overruns it.
+    """
+
+    def before_call(model: Any, **kwargs: Any) -> None:
+        deadline = _DEADLINE.get()
+        if deadline is not None:
+            deadline.check(f"{service_name}.{model.name}")
+
+    def needs_retry(
+        operation: Any, response: Any = None, caught_exception: Any = None, **kwargs: Any
+    ) -> None:
+        deadline = _DEADLINE.get()
+        if deadline is None or not deadline.expired:
+            return
+
+        succeeded = (
+            caught_exception is None and response is not None and response[0].status_code < 400
+        )
+        if not succeeded:
+            logger.info(f"Not retrying {service_name}.{operation.name} past the deadline")
+            deadline.check(f"retrying {service_name}.{operation.name}")
+
+    client.meta.events.register("before-parameter-build", before_call)
+    client.meta.events.register("needs-retry", needs_retry)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from typing import Any, Dict, Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.resources import S3
+from quarantine.utils import json_dumps, now
+
+logger = Logger(child=True)
+
+__all__ = ["MANIFEST_KEY", "write_manifest"]
+
+MANIFEST_KEY = "manifest.json"
+
+
+def write_manifest(
+    s3: S3,
+    instance_id: str,
+    finding_id: str,
+    finding_type: str,
+    plugins: Dict[str, Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Write the manifest of an incident, once the plugins for the finding have completed
+
+    The manifest lists every artifact uploaded by the plugins with its key, size, SHA-256
+    digest, creation time and the plugin that produced it, so an incident can be retrieved with
+    a single GET instead of listing its prefix. The other outputs of the plugins (such as
+    snapshot and security group IDs) are included as well. `plugins` is the completed plugins
+    recorded in the checkpoint of the finding.
+    """
+
+    artifacts = []
+    outputs = {}
+    for name, entry in sorted(plugins.items()):
+        output = dict(entry["output"])
+        artifacts.extend({**artifact, "plugin": name} for artifact in output.pop("artifacts", []))
+        outputs[name] = output
+
+    manifest = {
+        "instance_id": instance_id,
+        "finding_id": finding_id,
+        "finding_type": finding_type,
+        "created": now(),
+        "artifacts": artifacts,
+        "plugins": outputs,
+    }
+
+    artifact = s3.put_object(instance_id, finding_id, MANIFEST_KEY, json_dumps(manifest))
+    if artifact is None:
+        logger.error(f"Unable to write the manifest of instance {instance_id}")
+    else:
+        logger.info(f"Wrote manifest of {len(artifacts)} artifacts to {artifact['key']}")
+    return artifact
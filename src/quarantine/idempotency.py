@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+import uuid
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import (
+    CHECKPOINT_TTL_SECS,
+    PENDING_COMMAND_TAG,
+    QUARANTINE_LEASE_SECS,
+    QUARANTINE_RECORD_RETENTION_SECS,
+)
+from quarantine.store import AbstractStore
+
+logger = Logger(child=True)
+
+__all__ = ["QuarantineGuard", "is_quarantined"]
+
+# Status of the quarantine record of an instance
+IN_PROGRESS = "in_progress"
+QUARANTINED = "quarantined"
+FAILED = "failed"
+
+# Attempts at a conditional write before giving up on a heavily contended record
+MAX_ATTEMPTS = 10
+
+
+def is_quarantined(instance: Dict[str, Any]) -> bool:
+    """
+    Whether an instance is tagged as quarantined and only attached to its isolation groups
+    """
+
+    instance_id = instance.get("InstanceId")
+    tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+    if tags.get("SOC-Status") != QUARANTINED or PENDING_COMMAND_TAG in tags:
+        return False
+
+    # the tag is added before isolation, so also check every interface is isolated
+    groups = [
+        group
+        for network_interface in instance.get("NetworkInterfaces", [])
+        for group in network_interface.get("Groups", [])
+    ]
+    return bool(groups) and all(
+        group.get("GroupName", "").startswith(f"quarantine-{instance_id}-") for group in groups
+    )
+
+
+class QuarantineGuard:
+    """
+    Ensure each instance is quarantined by a single invocation, however many findings reference
+    it and however many invocations run concurrently.
+
+    The invocation that acquires the guard owns the quarantine until it completes or its lease
+    expires. Other findings for the instance are recorded against it and skipped.
+    """
+
+    def __init__(
+        self,
+        store: AbstractStore,
+        instance_id: str,
+        finding_id: str,
+        owner: Optional[str] = None,
+    ) -> None:
+        self.store = store
+        self.instance_id = instance_id
+        self.finding_id = finding_id
+
+        self.key = f"quarantine#{instance_id}"
+        # passed on when the quarantine is completed by another invocation (Step Functions tasks)
+        self.owner = owner or uuid.uuid4().hex
+
+    def acquire(self, instance: Dict[str, Any]) -> Optional[str]:
+        """
+        Try to take ownership of the quarantine of the instance
+
+        Returns None when the caller owns the quarantine and must run it, otherwise the status
+        of the quarantine the finding was recorded against.
+        """
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(self.key)
+            version = item["version"] if item is not None else None
+            failed = item is not None and item["status"] == FAILED
+
+            if (
+                item is not None
+                and not failed
+                and (item["status"] == IN_PROGRESS or is_quarantined(instance))
+            ):
+                finding_ids = item.get("finding_ids", [])
+                if self.finding_id in finding_ids:
+                    return item["status"]
+
+                item["finding_ids"] = finding_ids + [self.finding_id]
+                if self.store.put(self.key, item, version):
+                    logger.info(f"Recorded finding {self.finding_id} against {item['status']}")
+                    return item["status"]
+                continue
+
+            if item is None and is_quarantined(instance):
+                # quarantined before the record was kept, or the record has expired
+                item = self._item(QUARANTINED, [self.finding_id], QUARANTINE_RECORD_RETENTION_SECS)
+                if self.store.put(self.key, item, version):
+                    return QUARANTINED
+                continue
+
+            # no quarantine in progress, a previous quarantine was undone, or a failed quarantine
+            # is resumed even if the instance already looks quarantined
+            finding_ids = item.get("finding_ids", []) if item is not None else []
+            item = self._item(IN_PROGRESS, finding_ids + [self.finding_id], QUARANTINE_LEASE_SECS)
+            if self.store.put(self.key, item, version):
+                logger.info(f"Acquired quarantine of instance {self.instance_id}")
+                return None
+
+        raise RuntimeError(f"Unable to acquire quarantine of instance {self.instance_id}")
+
+    def extend(self, seconds: int) -> None:
+        """
+        Extend the lease, for example while waiting for asynchronous SSM commands
+        """
+
+        self._update(IN_PROGRESS, seconds)
+
+    def complete(self) -> None:
+        """
+        Record the instance as quarantined
+        """
+
+        self._update(QUARANTINED, QUARANTINE_RECORD_RETENTION_SECS)
+
+    def release(self) -> None:
+        """
+        Give up ownership after a failure so a retry can quarantine the instance
+
+        The quarantine is recorded as failed rather than removed: the failed invocation may have
+        isolated the instance already, and the retry must still resume the remaining plugins.
+        """
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(self.key)
+            if item is None or item.get("owner") != self.owner or item["status"] != IN_PROGRESS:
+                return
+            failed = self._item(FAILED, item.get("finding_ids", []), CHECKPOINT_TTL_SECS)
+            if self.store.put(self.key, failed, item["version"]):
+                logger.info(f"Released quarantine of instance {self.instance_id}")
+                return
+
+    def _update(self, status: str, seconds: int) -> None:
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(self.key)
+            version = item["version"] if item is not None else None
+            finding_ids = item.get("finding_ids", []) if item is not None else [self.finding_id]
+
+            if self.store.put(self.key, self._item(status, finding_ids, seconds), version):
+                return
+
+        logger.warning(f"Unable to record instance {self.instance_id} as {status}")
+
+    def _item(self, status: str, finding_ids: List[str], seconds: int) -> Dict[str, Any]:
+        return {
+            "status": status,
+            "finding_ids": finding_ids,
+            "owner": self.owner,
+            "ttl": int(time.time()) + seconds,
+        }
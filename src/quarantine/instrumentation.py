@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
+
+logger = Logger(child=True)
+
+__all__ = [
+    "PluginMetrics",
+    "plugin_metrics",
+    "publish_incident_metric",
+    "publish_plugin_metrics",
+    "register_metrics",
+]
+
+
+class PluginMetrics:
+    """
+    Number and duration of the AWS API calls made by a plugin, per service and operation
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[Tuple[str, str], int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.durations: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, service: str, operation: str, duration: float, failed: bool) -> None:
+        key = (service, operation)
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.durations[key] = self.durations.get(key, 0.0) + duration
+            if failed:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+
+# Metrics of the plugin making calls on the current thread, inherited by the threads it starts
+# with ContextThreadPoolExecutor. Calls made outside a plugin are not recorded.
+_METRICS: contextvars.ContextVar[Optional[PluginMetrics]] = contextvars.ContextVar(
+    "metrics", default=None
+)
+
+
+@contextmanager
+def plugin_metrics() -> Iterator[PluginMetrics]:
+    """
+    Record the API calls of a plugin
+    """
+
+    metrics = PluginMetrics()
+    token = _METRICS.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _METRICS.reset(token)
+
+
+def register_metrics(client: Any, service_name: str) -> None:
+    """
+    Record every call made by a boto3 client in the metrics of the plugin making it
+
+    The duration of a call includes its retries and the time it waited for the rate limiter and
+    the shared budget.
+    """
+
+    # on before-parameter-build rather than before-call, which stubbed responses short-circuit
+    def before_call(model: Any, context: Any = None, **kwargs: Any) -> None:
+        if context is not None and _METRICS.get() is not None:
+            context["metrics_started"] = time.monotonic()
+            # after-call-error is not given the operation model
+            context["metrics_operation"] = model
+
+    def after_call(
+        model: Any, parsed: Any = None, context: Any = None, failed: bool = False, **kwargs: Any
+    ) -> None:
+        metrics = _METRICS.get()
+        started = (context or {}).get("metrics_started")
+        if metrics is not None and started is not None:
+            # calls answered with an error response are also failed
+            failed = failed or (isinstance(parsed, dict) and "Error" in parsed)
+            metrics.record(service_name, model.name, time.monotonic() - started, failed)
+
+    def after_call_error(context: Any = None, **kwargs: Any) -> None:
+        operation = (context or {}).get("metrics_operation")
+        if operation is not None:
+            after_call(operation, context=context, failed=True)
+
+    client.meta.events.register("before-parameter-build", before_call)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("after-call-error", after_call_error)
+
+
+def _dimensions(metrics: EphemeralMetrics, **dimensions: str) -> EphemeralMetrics:
+    for name, value in dimensions.items():
+        # CloudWatch does not accept empty dimension values
+        metrics.add_dimension(name=name, value=value or "unknown")
+    return metrics
+
+
+def publish_plugin_metrics(
+    plugin: str,
+    phase: str,
+    finding_type: str,
+    duration: float,
+    failed: bool,
+    api: Optional[PluginMetrics],
+) -> None:
+    """
+    Publish the wall time, outcome and API calls of a plugin as embedded metric format records
+
+    The plugin metrics have the plugin, phase and finding_type dimensions, the API metrics
+    additionally have service and operation dimensions. Without API metrics (the plugin failed
+    before its calls were counted) only the plugin metrics are published.
+    """
+
+    if api is None:
+        api = PluginMetrics()
+
+    metrics = _dimensions(EphemeralMetrics(), plugin=plugin, phase=phase, finding_type=finding_type)
+    metrics.add_metric(name="PluginDuration", unit=MetricUnit.Milliseconds, value=duration * 1000)
+    metrics.add_metric(name="PluginSucceeded", unit=MetricUnit.Count, value=0 if failed else 1)
+    metrics.add_metric(name="PluginFailed", unit=MetricUnit.Count, value=1 if failed else 0)
+    metrics.add_metric(name="ApiCalls", unit=MetricUnit.Count, value=sum(api.calls.values()))
+    metrics.flush_metrics()
+
+    for (service, operation), calls in sorted(api.calls.items()):
+        metrics = _dimensions(
+            EphemeralMetrics(),
+            plugin=plugin,
+            phase=phase,
+            finding_type=finding_type,
+            service=service,
+            operation=operation,
+        )
+        metrics.add_metric(name="ApiCalls", unit=MetricUnit.Count, value=calls)
+        metrics.add_metric(
+            name="ApiErrors", unit=MetricUnit.Count, value=api.errors.get((service, operation), 0)
+        )
+        metrics.add_metric(
+            name="ApiDuration",
+            unit=MetricUnit.Milliseconds,
+            value=api.durations[(service, operation)] * 1000,
+        )
+        metrics.flush_metrics()
+
+
+def publish_incident_metric(name: str, milliseconds: float, finding_type: str) -> None:
+    """
+    Publish a duration of an incident (such as the time to isolation) with the finding_type
+    dimension
+    """
+
+    metrics = _dimensions(EphemeralMetrics(), finding_type=finding_type)
+    metrics.add_metric(name=name, unit=MetricUnit.Milliseconds, value=milliseconds)
+    metrics.flush_metrics()
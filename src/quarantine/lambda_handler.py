@@ -19,66 +19,649 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import inspect
-import importlib
-import pkgutil
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import functools
+import json
+import time
+from typing import Callable, Dict, Any, List, Optional
 
-from aws_lambda_powertools import Logger
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from aws_lambda_powertools.utilities.validation import validator
+from aws_lambda_powertools.utilities.validation import SchemaValidationError, validate, validator
 import boto3
+import botocore
 
-import quarantine.plugins
-from quarantine.plugins.abstract_plugin import AbstractPlugin
-from quarantine.resources import SNS
-from quarantine.schemas import INPUT
+from quarantine.constants import (
+    DEFERRED_PLUGINS_TAG,
+    NOTIFICATION_STREAMING,
+    PENDING_COMMAND_TAG,
+    PENDING_SINCE_TAG,
+    QUARANTINE_LEASE_SECS,
+    SQS_MAX_CONCURRENT_INSTANCES,
+    SSM_ASYNC_EXECUTION_TIMEOUT_SECS,
+    SSM_DRAIN_TIME_SECS,
+)
+from quarantine.checkpoint import Checkpoint
+from quarantine.context import InstanceContext
+from quarantine.deadline import Deadline, DeadlineExceeded
+from quarantine.evidence import write_manifest
+from quarantine.idempotency import QuarantineGuard
+from quarantine.instrumentation import publish_incident_metric
+from quarantine.lb_index import LoadBalancerIndex
+from quarantine.manifest import get_plugins, get_spec, load_plugins
+from quarantine.notifications import (
+    CANCELLED,
+    FAILED,
+    QUARANTINED,
+    SKIPPED,
+    SUCCEEDED,
+    WAITING,
+    Digest,
+)
+from quarantine.plugins.abstract_plugin import CONTAIN
+from quarantine.resources import AutoScaling, EC2, ELB, ELBv2, S3, SNS, SSM
+from quarantine.scheduler import Scheduler
+from quarantine.schemas import INPUT, PLUGIN_INPUT
+from quarantine.store import get_store
+from quarantine.tracing import get_trace_entity, set_trace_entity, tracer
+from quarantine.utils import now
 
 logger = Logger()
+metrics = Metrics()
 
 
-def iter_namespace(ns_pkg):
-    # https://packaging.python.org/en/latest/guides/creating-and-discovering-plugins/#using-namespace-packages
-    return pkgutil.iter_modules(ns_pkg.__path__, ns_pkg.__name__ + ".")
+def timed(handler: Callable[[Dict[str, Any], LambdaContext], Any]) -> Callable:
+    """
+    Record the duration of every invocation of a handler, apply it below log_metrics
+    """
 
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: LambdaContext) -> Any:
+        started = time.monotonic()
+        try:
+            return handler(event, context)
+        finally:
+            metrics.add_dimension(name="handler", value=handler.__name__)
+            metrics.add_metric(
+                name="InvocationDuration",
+                unit=MetricUnit.Milliseconds,
+                value=(time.monotonic() - started) * 1000,
+            )
 
-discovered_plugins = {
-    name: importlib.import_module(name)
-    for _, name, ispkg in iter_namespace(quarantine.plugins)
-    if not ispkg
-}
-
-logger.debug(f"Discovered plugins: {discovered_plugins}")
+    return wrapper
 
 
 @validator(inbound_schema=INPUT)
 @logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+@timed
 def handler(event: Dict[str, Any], context: LambdaContext) -> None:
 
     finding_id = event.get("id")
+    finding_type = event.get("type", "")
     instance_id = event.get("resource", {}).get("instanceDetails", {}).get("instanceId")
     if not instance_id:
         raise Exception("instanceId not found in request")
 
     logger.append_keys(instance_id=instance_id)
+    tracer.put_annotation(key="instance_id", value=instance_id)
 
     session = boto3._get_default_session()
+    deadline = Deadline(context.get_remaining_time_in_millis() / 1000)
+
+    quarantine_instance(
+        session,
+        instance_id,
+        finding_id,
+        finding_type,
+        deadline=deadline,
+        severity=event.get("severity"),
+    )
+
+
+def quarantine_instance(
+    session: boto3.Session,
+    instance_id: str,
+    finding_id: str,
+    finding_type: str = "",
+    instance_context: Optional[InstanceContext] = None,
+    deadline: Optional[Deadline] = None,
+    severity: Optional[float] = None,
+) -> None:
+    """
+    Run the quarantine plugins against an instance, unless it is already quarantined
+
+    Plugins that did not finish before the deadline are reported and DeadlineExceeded is raised,
+    so a retry resumes from them. The results are published as a single digest.
+    """
+
+    started = time.monotonic()
+
+    if instance_context is None:
+        instance_context = InstanceContext(
+            EC2(session), instance_id, AutoScaling(session), SSM(session)
+        )
+
+    digest = Digest(SNS(session), instance_id, finding_id, finding_type, severity)
+    store = get_store(session)
+
+    guard = QuarantineGuard(store, instance_id, finding_id)
+    status = guard.acquire(instance_context.instance)
+    if status is not None:
+        message = f"Instance {instance_id} already {status.replace('_', ' ')}, skipped {finding_id}"
+        digest.publish(SKIPPED, message)
+        return
+
+    # describe the instance once, before any plugin modifies it
+    instance_context.prefetch()
+
+    try:
+        # a retry of the same finding resumes after the plugins that already completed
+        checkpoint = Checkpoint(store, instance_id, finding_id)
+        scheduler = _run_plugins(
+            session,
+            digest,
+            instance_id,
+            finding_id,
+            finding_type,
+            instance_context,
+            guard,
+            checkpoint,
+            deadline,
+        )
+    except DeadlineExceeded as exc:
+        guard.release()
+        digest.publish(CANCELLED, str(exc))
+        raise
+    except Exception:
+        guard.release()
+        digest.publish(FAILED, f"Unable to quarantine instance {instance_id}")
+        raise
+
+    isolated = scheduler.succeeded_at("IsolateInstance")
+    if isolated is not None:
+        time_to_isolation = (isolated - started) * 1000
+        logger.info(f"Isolated instance {instance_id} in {time_to_isolation:.0f} ms")
+        publish_incident_metric("TimeToIsolation", time_to_isolation, finding_type)
+
+    publish_incident_metric("QuarantineDuration", (time.monotonic() - started) * 1000, finding_type)
 
-    plugins = []
-    for _, plugin_module in discovered_plugins.items():
-        clsmembers = inspect.getmembers(plugin_module, inspect.isclass)
-        for (_, c) in clsmembers:
-            if issubclass(c, AbstractPlugin) and (c is not AbstractPlugin):
-                plugins.append(c(session, instance_id, finding_id))
+
+def _run_plugins(
+    session: boto3.Session,
+    digest: Digest,
+    instance_id: str,
+    finding_id: str,
+    finding_type: str,
+    instance_context: InstanceContext,
+    guard: QuarantineGuard,
+    checkpoint: Checkpoint,
+    deadline: Optional[Deadline],
+) -> Scheduler:
+    plugins = [
+        plugin_class(session, instance_id, finding_id, instance_context)
+        for plugin_class in load_plugins(finding_type)
+    ]
 
     logger.info(f"Loaded plugins: {plugins}")
 
+    scheduler = Scheduler(
+        plugins,
+        checkpoint=checkpoint,
+        deadline=deadline,
+        finding_type=finding_type,
+        on_result=digest.add_result,
+    )
+    scheduler.run()
+    digest.add_deferred(scheduler)
+
+    if scheduler.cancelled:
+        raise _cancelled(instance_id, scheduler)
+
+    if scheduler.waiting:
+        message = _defer_plugins(instance_id, finding_id, instance_context, guard, scheduler)
+        digest.publish(WAITING, message)
+        return scheduler
+
+    write_manifest(S3(session), instance_id, finding_id, finding_type, checkpoint.completed)
+    guard.complete()
+    checkpoint.clear()
+
+    message = f"Instance {instance_id} successfully quarantined"
+    digest.publish(QUARANTINED, message)
+
+    return scheduler
+
+
+def _cancelled(instance_id: str, scheduler: Scheduler) -> DeadlineExceeded:
+    # the invocation fails for the plugins that ran out of time, a retry resumes from them
+    cancelled = [plugin.name for plugin in scheduler.cancelled]
+    message = f"Instance {instance_id} ran out of time, cancelled plugins {cancelled}"
+    logger.warning(message)
+    return DeadlineExceeded(message)
+
+
+def _defer_plugins(
+    instance_id: str,
+    finding_id: str,
+    instance_context: InstanceContext,
+    guard: QuarantineGuard,
+    scheduler: Scheduler,
+) -> str:
+    # record the pending work on the instance for the SSM completion handler
+    command_ids = [plugin.pending for plugin in scheduler.plugins if plugin.pending]
+    deferred = [plugin.name for plugin in scheduler.deferred]
+    tags = [
+        {"Key": PENDING_COMMAND_TAG, "Value": ",".join(command_ids)},
+        {"Key": DEFERRED_PLUGINS_TAG, "Value": ",".join(deferred)},
+        {"Key": PENDING_SINCE_TAG, "Value": now()},
+        {"Key": "SOC-FindingId", "Value": finding_id},
+    ]
+    instance_context.ec2.create_tags(instance_id, tags)
+
+    # keep ownership until the SSM completion handler has run the deferred plugins
+    guard.extend(SSM_ASYNC_EXECUTION_TIMEOUT_SECS + QUARANTINE_LEASE_SECS)
+
+    return f"Instance {instance_id} waiting for SSM commands {command_ids} to run {deferred}"
+
+
+@validator(inbound_schema=PLUGIN_INPUT)
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+@timed
+def plugin_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """
+    Quarantine an instance as separate Step Functions tasks
+
+    The "plan" action takes ownership of the quarantine and splits the plugins into groups for
+    each phase, every group is then executed by a "run" task of its own, with the timeout and
+    retry policy of its plugins. "finalize" completes the quarantine once all groups have run,
+    and "release" gives up ownership when a task failed.
+    """
+
+    action = event["action"]
+    finding = event["finding"]
+    finding_id = finding.get("id")
+    instance_id = finding["resource"]["instanceDetails"]["instanceId"]
+
+    logger.append_keys(instance_id=instance_id, action=action)
+    tracer.put_annotation(key="instance_id", value=instance_id)
+
+    session = boto3._get_default_session()
+    store = get_store(session)
+    instance_context = InstanceContext(
+        EC2(session), instance_id, AutoScaling(session), SSM(session)
+    )
+
+    guard = QuarantineGuard(store, instance_id, finding_id, event.get("owner"))
+    checkpoint = Checkpoint(store, instance_id, finding_id)
+
+    # the run tasks only stream progress, the digest is published by the last task
+    digest = Digest(
+        SNS(session),
+        instance_id,
+        finding_id,
+        finding.get("type", ""),
+        finding.get("severity"),
+        streaming=NOTIFICATION_STREAMING and action == "run",
+    )
+
+    if action == "plan":
+        status = guard.acquire(instance_context.instance)
+        if status is not None:
+            message = (
+                f"Instance {instance_id} already {status.replace('_', ' ')}, skipped {finding_id}"
+            )
+            digest.publish(SKIPPED, message)
+            return {"skipped": True, "status": status}
+
+        plugins = [
+            plugin_class(session, instance_id, finding_id, instance_context)
+            for plugin_class in load_plugins(finding.get("type", ""))
+        ]
+        groups = Scheduler(plugins).groups()
+
+        def describe(names: List[str]) -> Dict[str, Any]:
+            specs = [get_spec(name) for name in names]
+            return {
+                "plugins": names,
+                "timeout": sum(spec.timeout for spec in specs),
+                "retry": all(spec.retry for spec in specs),
+            }
+
+        plan = {phase: [describe(names) for names in groups[phase]] for phase in groups}
+        logger.info(f"Planned plugin groups: {plan}")
+
+        return {"skipped": False, "owner": guard.owner, **plan}
+
+    if action == "run":
+        plugins = [
+            plugin_class(session, instance_id, finding_id, instance_context)
+            for plugin_class in get_plugins(event["group"]["plugins"])
+        ]
+        logger.info(f"Loaded plugins: {plugins}")
+
+        # the Step Functions task times out after the timeout of the group
+        seconds = min(context.get_remaining_time_in_millis() / 1000, event["group"]["timeout"])
+
+        # a retried task skips the plugins of the group that already completed
+        scheduler = Scheduler(
+            plugins,
+            checkpoint=checkpoint,
+            deadline=Deadline(seconds),
+            finding_type=finding.get("type", ""),
+            on_result=digest.add_result,
+        )
+        scheduler.run()
+        digest.add_deferred(scheduler)
+        digest.flush()
+
+        if scheduler.cancelled:
+            raise _cancelled(instance_id, scheduler)
+
+        message = None
+        if scheduler.waiting:
+            message = _defer_plugins(instance_id, finding_id, instance_context, guard, scheduler)
+
+        isolated = scheduler.succeeded_at("IsolateInstance")
+        if isolated is not None and event.get("started"):
+            # the execution start time is wall clock time, the scheduler records monotonic time
+            started = datetime.fromisoformat(event["started"].replace("Z", "+00:00"))
+            isolated_at = time.time() - (time.monotonic() - isolated)
+            time_to_isolation = (isolated_at - started.timestamp()) * 1000
+            logger.info(f"Isolated instance {instance_id} in {time_to_isolation:.0f} ms")
+            publish_incident_metric("TimeToIsolation", time_to_isolation, finding.get("type", ""))
+
+        return {
+            "deferred": [plugin.name for plugin in scheduler.deferred],
+            "message": message,
+            "results": digest.results,
+        }
+
+    if action == "finalize":
+        tasks = [task for phase in event.get("results", {}).values() for task in phase]
+        for task in tasks:
+            digest.extend(task["results"])
+
+        deferred = [name for task in tasks for name in task["deferred"]]
+        messages = [task["message"] for task in tasks if task["message"]]
+        if messages:
+            # the SSM completion handler completes the quarantine once the commands finished
+            logger.info(f"Plugins deferred until SSM commands complete: {deferred}")
+            digest.publish(WAITING, "\n".join(messages))
+            return {"deferred": deferred}
+
+        write_manifest(
+            S3(session), instance_id, finding_id, finding.get("type", ""), checkpoint.completed
+        )
+        guard.complete()
+        checkpoint.clear()
+
+        message = f"Instance {instance_id} successfully quarantined"
+        digest.publish(QUARANTINED, message)
+        return {"deferred": []}
+
+    # release
+    guard.release()
+    digest.publish(FAILED, f"Unable to quarantine instance {instance_id}")
+    return {"released": True}
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+@timed
+def sqs_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """
+    Quarantine instances from a batch of GuardDuty findings delivered through SQS
+
+    Findings are grouped by instance so each instance is quarantined once per batch, and only
+    the messages of instances that failed are reported back to SQS to be retried.
+    """
+
+    session = boto3._get_default_session()
+    deadline = Deadline(context.get_remaining_time_in_millis() / 1000)
+
+    failures: List[str] = []
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+
+    for record in event.get("Records", []):
+        message_id = record["messageId"]
+        try:
+            finding = json.loads(record["body"])
+            # EventBridge delivers the whole event unless the target uses an InputPath
+            if "detail-type" in finding:
+                finding = finding["detail"]
+            validate(event=finding, schema=INPUT)
+        except (ValueError, KeyError, SchemaValidationError):
+            logger.exception(f"Invalid finding in message {message_id}")
+            failures.append(message_id)
+            continue
+
+        instance_id = finding["resource"]["instanceDetails"]["instanceId"]
+        groups.setdefault(instance_id, []).append({"messageId": message_id, "finding": finding})
+
+    logger.info(f"Received findings for {len(groups)} instances")
+
+    # describe every instance in the batch together
+    ec2 = EC2(session)
+    instances, errors = ec2.describe_instances_batch(list(groups))
+    for instance_id, error in errors.items():
+        logger.error(f"Unable to describe instance {instance_id}: {error}")
+        failures.extend(item["messageId"] for item in groups.pop(instance_id))
+
+    # the autoscaling groups and SSM state of the instances are also described together, an
+    # instance whose batch failed is described again by the plugin that needs it
+    autoscaling = AutoScaling(session)
+    asg_names, asg_errors = autoscaling.describe_auto_scaling_instances_batch(list(groups))
+    ssm = SSM(session)
+    information, ssm_errors = ssm.describe_instance_information_batch(list(groups))
+
+    trace_parent = get_trace_entity()
+
+    def quarantine_group(instance_id: str) -> None:
+        set_trace_entity(trace_parent)
+        finding = groups[instance_id][0]["finding"]
+        instance_context = InstanceContext(ec2, instance_id, autoscaling, ssm)
+        instance_context.seed("instance", instances[instance_id])
+        if instance_id not in asg_errors:
+            asg_name = asg_names.get(instance_id)
+            instance_context.seed("auto_scaling_groups", [asg_name] if asg_name else [])
+        if instance_id not in ssm_errors:
+            item = information.get(instance_id)
+            instance_context.seed("instance_information", [item] if item else [])
+        quarantine_instance(
+            session,
+            instance_id,
+            finding.get("id"),
+            finding.get("type", ""),
+            instance_context,
+            deadline,
+            finding.get("severity"),
+        )
+
+    with ThreadPoolExecutor(max_workers=SQS_MAX_CONCURRENT_INSTANCES) as executor:
+        futures = {
+            instance_id: executor.submit(quarantine_group, instance_id) for instance_id in groups
+        }
+
+    for instance_id, future in futures.items():
+        try:
+            future.result()
+        except Exception:
+            logger.exception(f"Failed to quarantine instance {instance_id}")
+            failures.extend(item["messageId"] for item in groups[instance_id])
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+@timed
+def ssm_completion_handler(event: Dict[str, Any], context: LambdaContext) -> None:
+    """
+    Handle SSM command invocation notifications for asynchronous command capture
+
+    Invoked on a schedule, complete the captures whose commands should have finished but for
+    which no notification arrived, so the deferred plugins (isolation) still run.
+    """
+
+    session = boto3._get_default_session()
     sns = SNS(session)
+    deadline = Deadline(context.get_remaining_time_in_millis() / 1000)
+
+    if event.get("source") == "aws.events":
+        _complete_overdue_captures(session, sns, deadline)
+        return
+
+    for record in event.get("Records", []):
+        notification = json.loads(record["Sns"]["Message"])
+        command_id = notification["commandId"]
+        instance_id = notification["instanceId"]
+        status = notification["status"]
 
-    for plugin in plugins:
-        message = plugin.execute()
-        if message is not None:
-            sns.publish(instance_id, message)
+        logger.append_keys(instance_id=instance_id)
+
+        instance_context = InstanceContext(
+            EC2(session), instance_id, AutoScaling(session), SSM(session)
+        )
+        tags = {tag["Key"]: tag["Value"] for tag in instance_context.instance.get("Tags", [])}
+        if command_id not in tags.get(PENDING_COMMAND_TAG, "").split(","):
+            logger.info(f"SSM command {command_id} is not a pending capture, ignoring")
+            continue
+
+        _complete_capture(session, sns, instance_context, tags, command_id, status, deadline)
+
+
+def _complete_overdue_captures(session: boto3.Session, sns: SNS, deadline: Deadline) -> None:
+    ec2 = EC2(session)
+    overdue = time.time() - SSM_ASYNC_EXECUTION_TIMEOUT_SECS - SSM_DRAIN_TIME_SECS
+
+    for instance in ec2.describe_tagged_instances(PENDING_COMMAND_TAG):
+        instance_id = instance["InstanceId"]
+        tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+
+        # captures recorded before the tag was written are treated as overdue
+        since = tags.get(PENDING_SINCE_TAG)
+        if since and datetime.fromisoformat(since.replace("Z", "+00:00")).timestamp() > overdue:
+            continue
+
+        logger.append_keys(instance_id=instance_id)
+        logger.warning(f"No SSM notification for the capture on {instance_id}, completing it")
+
+        instance_context = InstanceContext(ec2, instance_id, AutoScaling(session), SSM(session))
+        instance_context.seed("instance", instance)
+        try:
+            _complete_capture(
+                session,
+                sns,
+                instance_context,
+                tags,
+                tags[PENDING_COMMAND_TAG],
+                "Overdue",
+                deadline,
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            # the next sweep retries the instance
+            logger.exception(f"Unable to complete the capture on {instance_id}")
+
+
+def _complete_capture(
+    session: boto3.Session,
+    sns: SNS,
+    instance_context: InstanceContext,
+    tags: Dict[str, str],
+    command_id: str,
+    status: str,
+    deadline: Deadline,
+) -> None:
+    instance_id = instance_context.instance_id
+
+    # remove the limited EC2 instance profile attached for the commands, the deferred plugins
+    # still run if that fails: the instance must be isolated regardless
+    try:
+        instance_context.ec2.remove_ec2_instance_profile(instance_id)
+    except botocore.exceptions.ClientError:
+        logger.warning(f"IAM instance profile is still attached to {instance_id}")
+    instance_context.invalidate()
+
+    finding_id = tags.get("SOC-FindingId")
+    store = get_store(session)
+    checkpoint = Checkpoint(store, instance_id, finding_id)
+    for pending_id in command_id.split(","):
+        _compress_command_output(session, instance_id, pending_id, checkpoint)
+
+    digest = Digest(sns, instance_id, finding_id)
+    digest.add(
+        "CommandOutput",
+        CONTAIN,
+        SUCCEEDED,
+        f"SSM command {command_id} on {instance_id} finished with status {status}",
+    )
+
+    deferred = [name for name in tags.get(DEFERRED_PLUGINS_TAG, "").split(",") if name]
+    plugins = [
+        plugin_class(session, instance_id, finding_id, instance_context)
+        for plugin_class in get_plugins(deferred)
+    ]
+    logger.info(f"Loaded deferred plugins: {plugins}")
+
+    scheduler = Scheduler(
+        plugins, checkpoint=checkpoint, deadline=deadline, on_result=digest.add_result
+    )
+    scheduler.run()
+    digest.add_deferred(scheduler)
+
+    if scheduler.cancelled:
+        exc = _cancelled(instance_id, scheduler)
+        digest.publish(CANCELLED, str(exc))
+        raise exc
+
+    instance_context.ec2.delete_tags(
+        instance_id, [PENDING_COMMAND_TAG, DEFERRED_PLUGINS_TAG, PENDING_SINCE_TAG]
+    )
+    write_manifest(S3(session), instance_id, finding_id, "", checkpoint.completed)
+    QuarantineGuard(store, instance_id, finding_id).complete()
+    checkpoint.clear()
 
     message = f"Instance {instance_id} successfully quarantined"
-    sns.publish(instance_id, message)
+    digest.publish(QUARANTINED, message)
+
+
+def _compress_command_output(
+    session: boto3.Session, instance_id: str, command_id: str, checkpoint: Checkpoint
+) -> None:
+    # add the output of the command to the artifacts of the plugin that sent it
+    try:
+        artifacts = S3(session).compress_staged_objects(
+            instance_id, checkpoint.finding_id, f"ssm-output-file/{command_id}/"
+        )
+    except Exception:
+        # the output is left in the staging prefix
+        logger.exception(f"Unable to compress the output of SSM command {command_id}")
+        return
+
+    entry = checkpoint.completed.get("CommandOutput")
+    if entry is not None:
+        output = {**entry["output"], "artifacts": artifacts}
+        checkpoint.record("CommandOutput", output, entry["pending"])
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler
+def index_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """
+    Rebuild the instance to load balancer index, invoked on a schedule
+    """
+
+    session = boto3._get_default_session()
+
+    index = LoadBalancerIndex(get_store(session), ELB(session), ELBv2(session))
+    return {"instances": index.rebuild()}
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import datetime
+import time
+from typing import Any, Dict, Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import LB_INDEX_REBUILD_SECS, LB_INDEX_TTL_SECS
+from quarantine.resources import ELB, ELBv2
+from quarantine.store import AbstractStore
+
+logger = Logger(child=True)
+
+__all__ = ["LoadBalancerIndex"]
+
+# Key of the item recording when the index was last built
+INDEX_KEY = "lb-index"
+
+
+class LoadBalancerIndex:
+    """
+    Reverse index from instance ID to the target groups and classic ELBs it is registered with.
+
+    Target groups are indexed with the targets (ID and port) the instance is registered as, so
+    registrations on ports other than the default port of the target group are deregistered too.
+
+    The index is rebuilt on a schedule by the index function and each entry expires after
+    `LB_INDEX_TTL_SECS`. Without a state table the index function and the quarantine functions
+    do not share an index, so load balancers are always scanned. Entries can be stale in both
+    directions: deregistration is a no-op for load balancers the instance has since left, but
+    load balancers it joined after the build are not in its entry. Entries are therefore only
+    used while the index is at most one rebuild interval (`LB_INDEX_REBUILD_SECS`) old, which
+    bounds how long a new registration can go unnoticed.
+    """
+
+    def __init__(self, store: AbstractStore, elb: ELB, elbv2: ELBv2) -> None:
+        self.store = store
+        self.elb = elb
+        self.elbv2 = elbv2
+
+    def rebuild(self) -> int:
+        """
+        Scan every target group and classic ELB and store the memberships of each instance
+
+        Returns the number of indexed instances.
+        """
+
+        # registrations made while the load balancers are scanned may be missed, so the index
+        # counts as built when the scan started
+        built_at = int(time.time())
+        target_groups = self.elbv2.list_registrations()
+        load_balancers = self.elb.list_registrations()
+
+        ttl = int(time.time()) + LB_INDEX_TTL_SECS
+        instance_ids = set(target_groups) | set(load_balancers)
+        for instance_id in instance_ids:
+            item = {
+                "target_groups": target_groups.get(instance_id, {}),
+                "load_balancers": load_balancers.get(instance_id, []),
+                "ttl": ttl,
+            }
+            self.store.put(f"{INDEX_KEY}#{instance_id}", item, overwrite=True)
+
+        # written last so a partially written index is never used
+        item = {"built_at": built_at, "duration": int(time.time()) - built_at, "ttl": ttl}
+        self.store.put(INDEX_KEY, item, overwrite=True)
+
+        logger.info(f"Indexed load balancer memberships of {len(instance_ids)} instances")
+        return len(instance_ids)
+
+    def lookup(
+        self, instance_id: str, launch_time: Optional[datetime.datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the target groups (ARN to targets) and classic ELB names of an instance
+
+        Returns None when there is no current index, the index missed a rebuild, the instance
+        was launched after it was built or it has no entry, callers must then scan the load
+        balancers in its VPC. An instance without an entry may have been registered since the
+        index was built, and one with an entry may have been registered with more load balancers.
+        """
+
+        index = self.store.get(INDEX_KEY)
+        if index is None:
+            logger.warning("Load balancer index has expired, it is rebuilt on a schedule")
+            return None
+
+        # the next index replaces this one once it has been built, which takes about as long
+        if time.time() - index["built_at"] > LB_INDEX_REBUILD_SECS + index.get("duration", 0):
+            logger.warning("Load balancer index missed a rebuild, it may be missing registrations")
+            return None
+
+        if launch_time is not None and launch_time.timestamp() >= index["built_at"]:
+            logger.info(f"Instance {instance_id} was launched after the load balancer index")
+            return None
+
+        item = self.store.get(f"{INDEX_KEY}#{instance_id}")
+        if item is None:
+            logger.info(f"Instance {instance_id} is not in the load balancer index")
+            return None
+
+        return {
+            "target_groups": item.get("target_groups", {}),
+            "load_balancers": item.get("load_balancers", []),
+        }
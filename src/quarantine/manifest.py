@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import fnmatch
+import functools
+import importlib
+from typing import Iterable, NamedTuple, Tuple, Type
+
+from aws_lambda_powertools import Logger
+
+from quarantine.plugins.abstract_plugin import AbstractPlugin
+
+logger = Logger(child=True)
+
+__all__ = ["PluginSpec", "PLUGIN_MANIFEST", "get_plugins", "get_spec", "load_plugins"]
+
+
+class PluginSpec(NamedTuple):
+    # plugin class name
+    name: str
+    # module under quarantine.plugins that defines the class
+    module: str
+    # fallback execution order when plugins run sequentially
+    order: int
+    enabled: bool = True
+    # GuardDuty finding type patterns (fnmatch) the plugin applies to
+    finding_types: Tuple[str, ...] = ("*",)
+    # task timeout in seconds when plugins run as separate Step Functions tasks
+    timeout: int = 60
+    # whether a failed task may be retried, plugins with side effects that must not be repeated
+    # (snapshots, SSM commands) are not retried
+    retry: bool = True
+
+
+PLUGIN_MANIFEST: Tuple[PluginSpec, ...] = (
+    PluginSpec("RevokeInstanceProfile", "00_revoke_instance_profile", 0),
+    PluginSpec("ConsoleScreenshot", "01_console_screenshot", 1),
+    PluginSpec("CaptureMetadata", "02_capture_metadata", 2),
+    PluginSpec("TerminationProtection", "03_termination_protection", 3),
+    PluginSpec("ShutdownBehavior", "04_shutdown_behavior", 4),
+    PluginSpec("PreserveVolumes", "05_preserve_volumes", 5),
+    PluginSpec("TagInstance", "06_tag_instance", 6),
+    PluginSpec("SnapshotVolumes", "07_snapshot_volumes", 7, retry=False),
+    PluginSpec("CommandOutput", "08_command_output", 8, timeout=150, retry=False),
+    PluginSpec("DetachFromASG", "09_detach_from_asg", 9),
+    PluginSpec("DeregisterInstance", "10_deregister_instance", 10),
+    PluginSpec("IsolateInstance", "11_isolate_instance", 11),
+    PluginSpec("ParseCommandOutput", "12_parse_command_output", 12, timeout=300),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _import_plugin(spec: PluginSpec) -> Type[AbstractPlugin]:
+    module = importlib.import_module(f"quarantine.plugins.{spec.module}")
+    plugin_class = getattr(module, spec.name)
+    if not issubclass(plugin_class, AbstractPlugin):
+        raise TypeError(f"{spec.module}.{spec.name} is not an AbstractPlugin")
+    return plugin_class
+
+
+@functools.lru_cache(maxsize=None)
+def load_plugins(finding_type: str = "") -> Tuple[Type[AbstractPlugin], ...]:
+    """
+    Return the enabled plugin classes that apply to a finding type, in manifest order.
+
+    Plugin modules are only imported the first time they are selected, and the result is cached
+    for the lifetime of the container.
+    """
+
+    selected = [
+        spec
+        for spec in sorted(PLUGIN_MANIFEST, key=lambda spec: spec.order)
+        if spec.enabled
+        and any(fnmatch.fnmatchcase(finding_type, pattern) for pattern in spec.finding_types)
+    ]
+    logger.debug(f"Selected plugins for finding type '{finding_type}': {selected}")
+
+    return tuple(_import_plugin(spec) for spec in selected)
+
+
+def get_plugins(names: Iterable[str]) -> Tuple[Type[AbstractPlugin], ...]:
+    """
+    Return the plugin classes with the given names, in manifest order
+    """
+
+    names = set(names)
+    specs = sorted(
+        (spec for spec in PLUGIN_MANIFEST if spec.name in names), key=lambda spec: spec.order
+    )
+    return tuple(_import_plugin(spec) for spec in specs)
+
+
+def get_spec(name: str) -> PluginSpec:
+    """
+    Return the manifest entry of a plugin
+    """
+
+    for spec in PLUGIN_MANIFEST:
+        if spec.name == name:
+            return spec
+    raise KeyError(f"Plugin {name} is not in the manifest")
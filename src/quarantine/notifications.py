@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import NOTIFICATION_STREAMING
+from quarantine.plugins.abstract_plugin import COLLECT, CONTAIN, AbstractPlugin
+from quarantine.resources import SNS
+from quarantine.resources.sns import MAX_BATCH_SIZE
+from quarantine.scheduler import Scheduler
+
+logger = Logger(child=True)
+
+__all__ = ["Digest", "severity_label"]
+
+# Status of a plugin in the digest
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DEFERRED = "deferred"
+RESUMED = "resumed"
+
+# Status of the incident, besides failed and cancelled
+QUARANTINED = "quarantined"
+SKIPPED = "skipped"
+WAITING = "waiting"
+
+
+def severity_label(severity: Optional[float]) -> str:
+    """
+    Return the GuardDuty severity level of a finding severity
+    """
+
+    if severity is None:
+        return "UNKNOWN"
+    if severity >= 7:
+        return "HIGH"
+    if severity >= 4:
+        return "MEDIUM"
+    return "LOW"
+
+
+class Digest:
+    """
+    Collect the plugin results of an incident (an instance and the finding that triggered its
+    quarantine) into a single notification, published once at the end of the invocation.
+
+    With streaming, every plugin result is also published as soon as the plugin finishes (results
+    recorded together are published in batches). Messages carry Phase, Status and Severity
+    attributes for subscription filter policies.
+    """
+
+    def __init__(
+        self,
+        sns: SNS,
+        instance_id: str,
+        finding_id: str,
+        finding_type: str = "",
+        severity: Optional[float] = None,
+        streaming: bool = NOTIFICATION_STREAMING,
+    ) -> None:
+        self.sns = sns
+        self.instance_id = instance_id
+        self.finding_id = finding_id
+        self.finding_type = finding_type
+        self.severity = severity_label(severity)
+        self.streaming = streaming
+
+        self.results: List[Dict[str, Any]] = []
+
+        self._progress: List[Tuple[str, Dict[str, str]]] = []
+        self._lock = threading.Lock()
+
+    def _attributes(self, phase: str, status: str) -> Dict[str, str]:
+        return {"Phase": phase, "Status": status, "Severity": self.severity}
+
+    def add(self, plugin: str, phase: str, status: str, message: Optional[str] = None) -> None:
+        """
+        Record the result of a plugin
+        """
+
+        result = {"plugin": plugin, "phase": phase, "status": status, "message": message}
+
+        batch: List[Tuple[str, Dict[str, str]]] = []
+        with self._lock:
+            self.results.append(result)
+            if self.streaming and message is not None:
+                self._progress.append((message, self._attributes(phase, status)))
+                if len(self._progress) >= MAX_BATCH_SIZE:
+                    batch, self._progress = self._progress, []
+
+        if batch:
+            self.sns.publish_batch(self.instance_id, batch)
+
+    def extend(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Record results collected by other invocations, such as Step Functions tasks
+        """
+
+        for result in results:
+            self.add(result["plugin"], result["phase"], result["status"], result["message"])
+
+    def add_result(
+        self, scheduler: Scheduler, plugin: AbstractPlugin, message: Optional[str]
+    ) -> None:
+        """
+        Record the result of a plugin executed by a scheduler, pass as its `on_result` callback
+        so results are streamed as plugins finish
+        """
+
+        if plugin in scheduler.cancelled:
+            status = CANCELLED
+        elif plugin in scheduler.resumed:
+            status = RESUMED
+        elif plugin.failed:
+            status = FAILED
+        else:
+            status = SUCCEEDED
+        self.add(plugin.name, self._phase(scheduler, plugin), status, message)
+
+        if self.streaming:
+            self.flush()
+
+    def add_deferred(self, scheduler: Scheduler) -> None:
+        """
+        Record the plugins a scheduler run deferred
+        """
+
+        for plugin in scheduler.deferred:
+            self.add(plugin.name, self._phase(scheduler, plugin), DEFERRED)
+
+    @staticmethod
+    def _phase(scheduler: Scheduler, plugin: AbstractPlugin) -> str:
+        return CONTAIN if plugin.name in scheduler.contain_path else COLLECT
+
+    def flush(self) -> None:
+        """
+        Publish the streamed results that have not been published yet
+        """
+
+        with self._lock:
+            progress, self._progress = self._progress, []
+
+        if progress:
+            self.sns.publish_batch(self.instance_id, progress)
+
+    def publish(self, status: str, message: str) -> None:
+        """
+        Publish the digest with the overall status of the incident
+        """
+
+        self.flush()
+
+        with self._lock:
+            results = list(self.results)
+
+        phase = COLLECT if any(result["phase"] == COLLECT for result in results) else CONTAIN
+
+        lines = [message] + [
+            f"- {result['plugin']} ({result['phase']}): {result['status']}"
+            + (f": {result['message']}" if result["message"] else "")
+            for result in results
+        ]
+        details = {
+            "instance_id": self.instance_id,
+            "finding_id": self.finding_id,
+            "finding_type": self.finding_type,
+            "severity": self.severity,
+            "status": status,
+            "message": message,
+            "plugins": results,
+        }
+
+        logger.info(f"Publishing digest of {len(results)} plugin results: {status}")
+        self.sns.publish(
+            self.instance_id, "\n".join(lines), self._attributes(phase, status), details
+        )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from typing import Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.plugins.abstract_plugin import CONTAIN, AbstractPlugin
+
+logger = Logger(child=True)
+
+
+class RevokeInstanceProfile(AbstractPlugin):
+    """
+    Remove the IAM instance profile from the instance so it loses its AWS credentials
+    """
+
+    # capture the original instance profile before it is removed
+    depends_on = ("CaptureMetadata",)
+    phase = CONTAIN
+    critical = True
+
+    def execute(self) -> Optional[str]:
+        try:
+            associations = self.context.iam_instance_profile_associations
+            if not associations:
+                logger.debug(f"No IAM instance profiles attached to {self.instance_id}")
+                return
+
+            self.ec2.remove_ec2_instance_profile(self.instance_id, associations)
+            message = f"Removed IAM instance profiles from instance {self.instance_id}"
+        except Exception:
+            message = f"Unable to remove IAM instance profiles from instance {self.instance_id}"
+            logger.exception(message)
+            self.failed = True
+        finally:
+            self.context.invalidate("instance", "iam_instance_profile_associations")
+
+        return message
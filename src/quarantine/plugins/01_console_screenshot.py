@@ -28,6 +28,9 @@ from quarantine.plugins.abstract_plugin import AbstractPlugin
 
 logger = Logger(child=True)
 
+# Characters of base64 image data decoded at a time, a multiple of 4
+DECODE_CHUNK_SIZE = 1024 * 1024
+
 
 class ConsoleScreenshot(AbstractPlugin):
     """
@@ -38,11 +41,21 @@ class ConsoleScreenshot(AbstractPlugin):
         try:
             image_data = self.ec2.get_console_screenshot(self.instance_id)
             key = f"console_screenshot_{self.instance_id}.jpg"
-            screenshot = base64.b64decode(image_data)
-            self.s3.put_object(self.instance_id, key, screenshot)
+
+            # decode the image as it is uploaded rather than all at once
+            screenshot = (
+                base64.b64decode(image_data[start : start + DECODE_CHUNK_SIZE])
+                for start in range(0, len(image_data), DECODE_CHUNK_SIZE)
+            )
+            artifact = self.s3.put_object(self.instance_id, self.finding_id, key, screenshot)
+            if artifact is None:
+                raise Exception(f"Unable to upload {key}")
+            self.output["artifacts"] = [artifact]
+
             message = f"Successfully captured console screen shot: {key}"
         except Exception:
             message = f"Unable to get screenshot from instance {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
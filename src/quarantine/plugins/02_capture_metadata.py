@@ -20,12 +20,11 @@
 """
 
 from typing import Optional
-import tempfile
 
 from aws_lambda_powertools import Logger
 
 from quarantine.plugins.abstract_plugin import AbstractPlugin
-from quarantine.utils import json_dumps
+from quarantine.utils import json_iterencode
 
 logger = Logger(child=True)
 
@@ -36,21 +35,27 @@ class CaptureMetadata(AbstractPlugin):
     """
 
     def execute(self) -> Optional[str]:
-        key = f"metadata_file_{self.instance_id}.json"
+        key = f"metadata_file_{self.instance_id}.json.gz"
 
         try:
             # Capture instance metadata
-            instance_data = self.ec2.describe_instances(self.instance_id)
-            with tempfile.TemporaryFile() as fp:
-                fp.write(json_dumps(instance_data).encode("utf-8"))
-                fp.seek(0)
-
-                self.s3.put_object(self.instance_id, key, fp)
+            instance_data = self.context.instance
+            artifact = self.s3.put_object(
+                self.instance_id,
+                self.finding_id,
+                key,
+                json_iterencode(instance_data),
+                compress=True,
+            )
+            if artifact is None:
+                raise Exception(f"Unable to upload {key}")
+            self.output["artifacts"] = [artifact]
 
             logger.info(f"Captured instance metadata for instance {self.instance_id}")
             message = f"Successfully captured instance metadata: {key}"
         except Exception:
             message = f"Unable to capture instance metadata on instance {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
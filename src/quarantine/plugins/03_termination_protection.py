@@ -33,6 +33,9 @@ class TerminationProtection(AbstractPlugin):
     Enable termination protection on an EC2 instance
     """
 
+    conflicts_with = ("ShutdownBehavior", "PreserveVolumes")
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
             self.ec2.enable_termination_protection(self.instance_id)
@@ -40,5 +43,6 @@ class TerminationProtection(AbstractPlugin):
         except Exception:
             message = f"Failed to enable termination protection on {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
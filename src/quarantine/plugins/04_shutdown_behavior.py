@@ -33,6 +33,9 @@ class ShutdownBehavior(AbstractPlugin):
     Set shutdown behavior to 'stop' (instead of 'terminate')
     """
 
+    conflicts_with = ("TerminationProtection", "PreserveVolumes")
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
             self.ec2.shutdown_behavior_stop(self.instance_id)
@@ -40,5 +43,6 @@ class ShutdownBehavior(AbstractPlugin):
         except Exception:
             message = f"Failed to modify shutdown behavior on {self.instance_id} to 'stop'"
             logger.exception(message)
+            self.failed = True
 
         return message
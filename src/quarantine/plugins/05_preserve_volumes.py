@@ -33,28 +33,39 @@ class PreserveVolumes(AbstractPlugin):
     Enable volume termination protection on all attached volumes
     """
 
+    conflicts_with = ("TerminationProtection", "ShutdownBehavior")
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
-            instance_data = self.ec2.describe_instances(self.instance_id)
+            instance_data = self.context.instance
 
             block_device_mappings = instance_data.get("BlockDeviceMappings", [])
             if not block_device_mappings:
-                logger.debug(f"No EBS volumes found on instance {self.instance_id}, skipping volume termination protection")
+                logger.debug(
+                    f"No EBS volumes found on instance {self.instance_id}, skipping volume termination protection"
+                )
                 return
 
             device_names = [block_device["DeviceName"] for block_device in block_device_mappings]
             if not device_names:
-                logger.debug(f"No EBS device names found on instance {self.instance_id}, skipping volume termination protection")
+                logger.debug(
+                    f"No EBS device names found on instance {self.instance_id}, skipping volume termination protection"
+                )
                 return
 
             logger.debug(f"Found EBS block devices: {device_names}")
 
             # Enable termination protection on volumes
             self.ec2.enable_volume_termination_protection(self.instance_id, device_names)
+            self.context.invalidate("instance")
 
             message = f"Enabled volume termination protection on attached volumes {device_names} on instance {self.instance_id}"
         except Exception:
-            message = f"Unable to enable volume termination protection on instance {self.instance_id}"
+            message = (
+                f"Unable to enable volume termination protection on instance {self.instance_id}"
+            )
             logger.exception(message)
+            self.failed = True
 
         return message
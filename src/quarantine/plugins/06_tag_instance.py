@@ -34,6 +34,8 @@ class TagInstance(AbstractPlugin):
     Tag the instance
     """
 
+    critical = True
+
     def execute(self) -> Optional[str]:
         tags = [
             {
@@ -56,9 +58,11 @@ class TagInstance(AbstractPlugin):
 
         try:
             self.ec2.create_tags(self.instance_id, tags)
+            self.context.invalidate("instance")
             message = f"Added incident tags to instance {self.instance_id}"
         except Exception:
             message = f"Unable to add tags to instance {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
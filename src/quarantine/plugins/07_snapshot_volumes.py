@@ -19,11 +19,13 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from typing import Optional
+from typing import Dict, List, Optional
 
 from aws_lambda_powertools import Logger
 
+from quarantine.constants import SNAPSHOT_MAX_WORKERS
 from quarantine.plugins.abstract_plugin import AbstractPlugin
+from quarantine.utils import ContextThreadPoolExecutor, now
 
 logger = Logger(child=True)
 
@@ -35,11 +37,13 @@ class SnapshotVolumes(AbstractPlugin):
 
     def execute(self) -> Optional[str]:
         try:
-            instance_data = self.ec2.describe_instances(self.instance_id)
+            instance_data = self.context.instance
 
             block_device_mappings = instance_data.get("BlockDeviceMappings", [])
             if not block_device_mappings:
-                logger.debug(f"No EBS volumes found on instance {self.instance_id}, skipping volume snapshot")
+                logger.debug(
+                    f"No EBS volumes found on instance {self.instance_id}, skipping volume snapshot"
+                )
                 return
 
             volume_ids = []
@@ -50,14 +54,71 @@ class SnapshotVolumes(AbstractPlugin):
                     volume_ids.append(volume_id)
             logger.debug(f"Found EBS volume(s) to snapshot: {volume_ids}")
 
-            # Triggering snapshots
-            for volume_id in volume_ids:
-                # TODO: this method can be throttled
-                self.ec2.create_snapshot(self.instance_id, volume_id)
+            tags = [
+                {
+                    "Key": "SOC-InstanceId",
+                    "Value": self.instance_id,
+                },
+                {
+                    "Key": "SOC-ContainedAt",
+                    "Value": now(),
+                },
+                {
+                    "Key": "SOC-FindingId",
+                    "Value": self.finding_id,
+                },
+                {
+                    "Key": "SOC-FindingSource",
+                    "Value": "GuardDuty",
+                },
+            ]
 
-            message = f"Snapshotted EBS volumes {volume_ids} on instance {self.instance_id}"
+            # a single point-in-time snapshot set across all volumes of the instance
+            snapshot_ids: Dict[str, str] = {}
+            try:
+                snapshot_ids = self.ec2.create_snapshots(self.instance_id, tags)
+            except Exception:
+                logger.warning(f"Snapshotting volumes of {self.instance_id} individually")
+
+            remaining = [volume_id for volume_id in volume_ids if volume_id not in snapshot_ids]
+            if remaining:
+                snapshot_ids.update(self._snapshot_volumes(remaining, tags))
+
+            # volumes that could not be snapshotted are reported rather than recorded
+            snapshot_ids = {
+                volume_id: snapshot_id
+                for volume_id, snapshot_id in snapshot_ids.items()
+                if snapshot_id
+            }
+            self.output["snapshot_ids"] = snapshot_ids
+
+            message = f"Snapshotted EBS volumes {snapshot_ids} on instance {self.instance_id}"
+
+            missing = [volume_id for volume_id in volume_ids if volume_id not in snapshot_ids]
+            if missing:
+                message += f", unable to snapshot EBS volumes {missing}"
+                logger.error(f"Unable to snapshot EBS volumes {missing} on {self.instance_id}")
+                self.failed = True
         except Exception:
             message = f"Unable to snapshot EBS volumes on instance {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
+
+    def _snapshot_volumes(
+        self, volume_ids: List[str], tags: List[Dict[str, str]]
+    ) -> Dict[str, Optional[str]]:
+        """
+        Snapshot volumes individually and in parallel, CreateSnapshot calls are rate limited by
+        the EC2 client
+        """
+
+        def snapshot(volume_id: str) -> Optional[str]:
+            return self.ec2.create_snapshot(self.instance_id, volume_id, tags)
+
+        workers = min(SNAPSHOT_MAX_WORKERS, len(volume_ids))
+        with ContextThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="snapshot"
+        ) as executor:
+            return dict(zip(volume_ids, executor.map(snapshot, volume_ids)))
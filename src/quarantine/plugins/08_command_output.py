@@ -20,13 +20,20 @@
 """
 
 import os
-import time
 from typing import Optional
 
 from aws_lambda_powertools import Logger
 
 from quarantine.plugins.abstract_plugin import AbstractPlugin
-from quarantine.constants import SSM_COMMANDS
+from quarantine.constants import (
+    PROFILE_READY_TIMEOUT_SECS,
+    SSM_ASYNC_CAPTURE,
+    SSM_ASYNC_EXECUTION_TIMEOUT_SECS,
+    SSM_COMMANDS,
+    SSM_COMMAND_TIMEOUT_SECS,
+    SSM_DRAIN_TIME_SECS,
+)
+from quarantine.utils import wait_until
 
 logger = Logger(child=True)
 EC2_INSTANCE_PROFILE_ARN = os.getenv("EC2_INSTANCE_PROFILE_ARN")
@@ -37,19 +44,16 @@ class CommandOutput(AbstractPlugin):
     Run commands from SSM and upload results to S3
     """
 
+    # capture the original instance profile before it is removed, and only attach the limited
+    # profile once the original one is gone
+    depends_on = ("CaptureMetadata", "RevokeInstanceProfile")
+
     def execute(self) -> Optional[str]:
         if not SSM_COMMANDS:
             logger.debug(f"No commands to execute on {self.instance_id}, skipping")
             return
 
-        is_ssm_managed = len(self.ssm.describe_instance_information(self.instance_id)) > 0
-
-        try:
-            # remove any existing EC2 instance profiles
-            self.ec2.remove_ec2_instance_profile(self.instance_id)
-        except Exception:
-            logger.exception(f"Unable to remove EC2 instance profile from {self.instance_id}")
-            return
+        is_ssm_managed = len(self.context.instance_information) > 0
 
         if not is_ssm_managed:
             message = (
@@ -66,13 +70,49 @@ class CommandOutput(AbstractPlugin):
             # attach limited EC2 instance profile
             self.ec2.attach_ec2_instance_profile(self.instance_id, EC2_INSTANCE_PROFILE_ARN)
 
-            # wait 5 seconds for the instance profile to stabilize
-            time.sleep(5)
-
-            self.ssm.send_commands(self.instance_id, SSM_COMMANDS)
+            # wait for the instance profile to be associated and the SSM agent to be online
+            if not wait_until(self._is_ready, PROFILE_READY_TIMEOUT_SECS):
+                logger.warning(
+                    f"Instance {self.instance_id} not ready after {PROFILE_READY_TIMEOUT_SECS} "
+                    "seconds, sending commands anyway"
+                )
+
+            if SSM_ASYNC_CAPTURE:
+                command_id = self.ssm.send_commands(
+                    self.instance_id,
+                    self.finding_id,
+                    SSM_COMMANDS,
+                    SSM_ASYNC_EXECUTION_TIMEOUT_SECS,
+                )
+                # the limited instance profile is removed by the completion handler
+                self.pending = command_id
+                self.output["command_id"] = command_id
+                return (
+                    f"Sent commands {SSM_COMMANDS} to {self.instance_id} as SSM command "
+                    f"{command_id}, output will be captured asynchronously"
+                )
+
+            command_id = self.ssm.send_commands(self.instance_id, self.finding_id, SSM_COMMANDS)
+            self.output["command_id"] = command_id
+
+            if not wait_until(
+                lambda: self.ssm.is_command_complete(command_id, self.instance_id),
+                SSM_COMMAND_TIMEOUT_SECS,
+                delay=1.0,
+            ):
+                logger.warning(
+                    f"SSM command {command_id} was queued, but failed to execute before timeout"
+                )
+            elif not wait_until(lambda: self._has_uploaded_output(command_id), SSM_DRAIN_TIME_SECS):
+                logger.warning(f"SSM command {command_id} output was not uploaded before timeout")
+            else:
+                self.output["artifacts"] = self.s3.compress_staged_objects(
+                    self.instance_id, self.finding_id, f"ssm-output-file/{command_id}/"
+                )
 
             # remove the limited EC2 instance profiles
             self.ec2.remove_ec2_instance_profile(self.instance_id)
+            self.context.invalidate("instance", "iam_instance_profile_associations")
 
             message = f"Captured output from {self.instance_id} for commands: {SSM_COMMANDS}"
         except Exception:
@@ -80,5 +120,20 @@ class CommandOutput(AbstractPlugin):
                 f"Unable to capture output from {self.instance_id} for commands: {SSM_COMMANDS}"
             )
             logger.exception(message)
+            self.failed = True
 
         return message
+
+    def _is_ready(self) -> bool:
+        return self.ec2.is_instance_profile_associated(
+            self.instance_id, EC2_INSTANCE_PROFILE_ARN
+        ) and self.ssm.is_online(self.instance_id)
+
+    def _has_uploaded_output(self, command_id: str) -> bool:
+        # SSM writes <prefix>/<command id>/<instance id>/<plugin>/<step>/{stdout,stderr}
+        keys = self.s3.list_staged_objects(
+            self.instance_id,
+            self.finding_id,
+            f"ssm-output-file/{command_id}/{self.instance_id}/",
+        )
+        return any(key.endswith(("/stdout", "/stderr")) for key in keys)
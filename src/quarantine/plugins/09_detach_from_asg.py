@@ -23,7 +23,7 @@ from typing import Optional
 
 from aws_lambda_powertools import Logger
 
-from quarantine.plugins.abstract_plugin import AbstractPlugin
+from quarantine.plugins.abstract_plugin import CONTAIN, AbstractPlugin
 
 logger = Logger(child=True)
 
@@ -33,12 +33,16 @@ class DetachFromASG(AbstractPlugin):
     Detach the instance from any autoscaling groups
     """
 
+    phase = CONTAIN
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
-            self.autoscaling.detach_instance(self.instance_id)
+            self.autoscaling.detach_instance(self.instance_id, self.context.auto_scaling_groups)
             message = f"Detached instance {self.instance_id} from any autoscaling groups"
         except Exception:
             message = f"Unable to detach instance {self.instance_id} from autoscaling groups"
             logger.exception(message)
+            self.failed = True
 
         return message
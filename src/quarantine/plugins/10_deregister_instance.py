@@ -23,7 +23,8 @@ from typing import Optional
 
 from aws_lambda_powertools import Logger
 
-from quarantine.plugins.abstract_plugin import AbstractPlugin
+from quarantine.lb_index import LoadBalancerIndex
+from quarantine.plugins.abstract_plugin import CONTAIN, AbstractPlugin
 
 logger = Logger(child=True)
 
@@ -33,13 +34,35 @@ class DeregisterInstance(AbstractPlugin):
     Deregister the instance from any classic ELBs and ALB/NLB target groups
     """
 
+    phase = CONTAIN
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
-            self.elb.deregister_instance(self.instance_id) # classic ELB
-            self.elbv2.deregister_target(self.instance_id) # ALB/NLB
-            message = f"Deregistered instance {self.instance_id} from all load balancers and target groups"
+            index = LoadBalancerIndex(self.store, self.elb, self.elbv2)
+            memberships = index.lookup(self.instance_id, self.context.instance.get("LaunchTime"))
+            if memberships is not None:
+                self.elb.deregister_instance(
+                    self.instance_id, load_balancer_names=memberships["load_balancers"]
+                )
+                self.elbv2.deregister_target(
+                    self.instance_id, target_groups=memberships["target_groups"]
+                )
+            else:
+                # instances can only be registered with load balancers in their own VPC
+                vpc_id = self.context.instance.get("VpcId")
+                self.elb.deregister_instance(self.instance_id, vpc_id)  # classic ELB
+                self.elbv2.deregister_target(self.instance_id, vpc_id)  # ALB/NLB
+            message = (
+                f"Deregistered instance {self.instance_id} from all load balancers and target "
+                "groups"
+            )
         except Exception:
-            message = f"Unable to deregister instance {self.instance_id} from load balancers or target groups"
+            message = (
+                f"Unable to deregister instance {self.instance_id} from load balancers or target "
+                "groups"
+            )
             logger.exception(message)
+            self.failed = True
 
         return message
@@ -23,7 +23,7 @@ from typing import Optional
 
 from aws_lambda_powertools import Logger
 
-from quarantine.plugins.abstract_plugin import AbstractPlugin
+from quarantine.plugins.abstract_plugin import CONTAIN, AbstractPlugin
 from quarantine.utils import now
 
 logger = Logger(child=True)
@@ -34,9 +34,14 @@ class IsolateInstance(AbstractPlugin):
     Isolate the EC2 instance by moving any attached network interfaces into new security groups
     """
 
+    # SSM needs network access to run commands and upload their output
+    depends_on = ("CaptureMetadata", "CommandOutput")
+    phase = CONTAIN
+    critical = True
+
     def execute(self) -> Optional[str]:
         try:
-            network_interfaces = self.ec2.describe_network_interfaces(self.instance_id)
+            network_interfaces = self.context.network_interfaces
             if not network_interfaces:
                 logger.info(f"No network interfaces found on instance {self.instance_id}")
                 return
@@ -88,10 +93,13 @@ class IsolateInstance(AbstractPlugin):
                     self.ec2.update_security_groups(
                         network_interface["NetworkInterfaceId"], group_id
                     )
+            self.context.invalidate("instance", "network_interfaces")
+            self.output["group_ids"] = vpc_map
 
             message = f"Isolated instance {self.instance_id} into restricted security groups"
         except Exception:
             message = f"Unable to isolate instance {self.instance_id}"
             logger.exception(message)
+            self.failed = True
 
         return message
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from typing import Optional
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import SSM_COMMANDS
+from quarantine.datasets import DatasetWriter, iter_lines, parse_command_output
+from quarantine.plugins.abstract_plugin import AbstractPlugin
+
+logger = Logger(child=True)
+
+
+class ParseCommandOutput(AbstractPlugin):
+    """
+    Parse the netstat and lsof output of the SSM commands into datasets for Athena
+    """
+
+    # with asynchronous capture, the plugin is deferred until the SSM commands complete
+    depends_on = ("CommandOutput",)
+
+    def execute(self) -> Optional[str]:
+        if not SSM_COMMANDS:
+            return
+
+        try:
+            keys = [
+                key
+                for key in self.s3.list_objects(
+                    self.instance_id, self.finding_id, "ssm-output-file/"
+                )
+                if key.endswith("/stdout.gz")
+            ]
+            if not keys:
+                message = f"No SSM command output to parse for instance {self.instance_id}"
+                logger.info(message)
+                return message
+
+            artifacts = []
+            for key in keys:
+                # <prefix>/ssm-output-file/<command id>/<instance id>/<plugin>/<step>/stdout.gz
+                command_id = key.split("/ssm-output-file/", 1)[1].split("/", 1)[0]
+                step = key.split("/")[-2]
+
+                with DatasetWriter(
+                    lambda dataset: self.s3.open_dataset(
+                        self.instance_id,
+                        self.finding_id,
+                        dataset,
+                        f"{command_id}-{step}.json.gz",
+                    )
+                ) as datasets:
+                    for dataset, record in parse_command_output(
+                        iter_lines(self.s3.stream_object(key))
+                    ):
+                        datasets.write(dataset, record)
+                    artifacts.extend(datasets.close())
+
+                logger.info(f"Parsed {datasets.counts} records from {key}")
+
+            self.output["artifacts"] = artifacts
+            message = (
+                f"Parsed SSM command output of {self.instance_id} into {len(artifacts)} datasets"
+            )
+        except Exception:
+            message = f"Unable to parse SSM command output of instance {self.instance_id}"
+            logger.exception(message)
+            self.failed = True
+
+        return message
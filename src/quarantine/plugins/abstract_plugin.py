@@ -20,15 +20,40 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 import boto3
 
+from quarantine.context import InstanceContext
 from quarantine.resources import AutoScaling, EC2, ELB, ELBv2, S3, SSM
+from quarantine.store import get_store
+
+# Plugins in the contain phase start first, together with the plugins they depend on. The other
+# plugins make up the collect phase, which starts once containment has finished.
+CONTAIN = "contain"
+COLLECT = "collect"
 
 
 class AbstractPlugin(ABC):
-    def __init__(self, session: boto3.Session, instance_id: str, finding_id: str) -> None:
+    # Class names of plugins that must finish before this plugin starts
+    depends_on: Tuple[str, ...] = ()
+
+    # Class names of plugins that must not run at the same time as this plugin
+    conflicts_with: Tuple[str, ...] = ()
+
+    # Containment plugins are critical, they keep priority over forensic plugins for the API
+    # budget shared with concurrent invocations
+    critical: bool = False
+
+    phase: str = COLLECT
+
+    def __init__(
+        self,
+        session: boto3.Session,
+        instance_id: str,
+        finding_id: str,
+        context: Optional[InstanceContext] = None,
+    ) -> None:
         self.s3 = S3(session)
         self.ec2 = EC2(session)
         self.autoscaling = AutoScaling(session)
@@ -36,9 +61,32 @@ class AbstractPlugin(ABC):
         self.elb = ELB(session)
         self.elbv2 = ELBv2(session)
 
+        # state shared with other invocations
+        self.store = get_store(session)
+
         self.instance_id = instance_id
         self.finding_id = finding_id
 
+        # shared across plugins by the handler so the instance is only described once
+        self.context = context or InstanceContext(self.ec2, instance_id, self.autoscaling, self.ssm)
+
+        # set by plugins that leave work running after execute() returns (such as an SSM
+        # command), plugins that depend on them are deferred until the work completes
+        self.pending: Optional[str] = None
+
+        # what the plugin produced (such as snapshot IDs), recorded in the checkpoint of the
+        # finding together with whether the plugin failed. Uploaded evidence is listed under
+        # "artifacts" and indexed in the manifest of the incident.
+        self.output: Dict[str, Any] = {}
+        self.failed = False
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def __repr__(self) -> str:
+        return f"<{self.name} instance_id={self.instance_id}>"
+
     @abstractmethod
     def execute(self) -> Optional[str]:
         """
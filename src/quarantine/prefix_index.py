@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+
+from quarantine.store import AbstractStore
+from quarantine.utils import get_prefix
+
+logger = Logger(child=True)
+
+__all__ = ["PrefixIndex"]
+
+# Key of the item listing the artifact prefixes of the incidents of an instance
+INDEX_KEY = "prefix-index"
+
+# Attempts at a conditional write before giving up on a heavily contended index entry
+MAX_ATTEMPTS = 10
+
+# prefixes never change once recorded, so they are cached for the lifetime of the container
+_PREFIXES: Dict[Tuple[str, str], str] = {}
+_LOCK = threading.Lock()
+
+
+class PrefixIndex:
+    """
+    Index from instance and finding to the key prefix of the artifacts of the incident
+
+    The prefix of an incident depends on when it started (see `ARTIFACT_KEY_LAYOUT`), so it is
+    recorded by the first invocation for the finding and read by every later one, such as a
+    retry, a Step Functions task or the SSM completion handler. Each instance has a single item
+    mapping its finding IDs to their prefixes, which investigators can also use to find the
+    evidence of an instance without listing the bucket.
+    """
+
+    def __init__(self, store: AbstractStore) -> None:
+        self.store = store
+
+    def lookup(self, instance_id: str) -> Dict[str, str]:
+        """
+        Return the artifact prefixes of the incidents of an instance, keyed by finding ID
+        """
+
+        item = self.store.get(f"{INDEX_KEY}#{instance_id}")
+        return dict(item["findings"]) if item is not None else {}
+
+    def resolve(self, instance_id: str, finding_id: str) -> str:
+        """
+        Return the artifact prefix of an incident, recording a new one on first use
+        """
+
+        with _LOCK:
+            prefix = _PREFIXES.get((instance_id, finding_id))
+        if prefix is None:
+            prefix = self._resolve(instance_id, finding_id)
+            with _LOCK:
+                _PREFIXES[(instance_id, finding_id)] = prefix
+        return prefix
+
+    def _resolve(self, instance_id: str, finding_id: str) -> str:
+        key = f"{INDEX_KEY}#{instance_id}"
+        prefix: Optional[str] = None
+
+        for _ in range(MAX_ATTEMPTS):
+            item = self.store.get(key)
+            findings = dict(item["findings"]) if item is not None else {}
+            if finding_id in findings:
+                return findings[finding_id]
+
+            if prefix is None:
+                prefix = get_prefix(instance_id, finding_id)
+            findings[finding_id] = prefix
+
+            version = item["version"] if item is not None else None
+            if self.store.put(key, {"findings": findings}, version):
+                logger.info(f"Recorded artifact prefix {prefix} for finding {finding_id}")
+                return prefix
+
+        # the artifacts of the incident still land under a single prefix in this container
+        logger.warning(f"Unable to record artifact prefix for finding {finding_id}")
+        return prefix
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from aws_lambda_powertools import Logger
+
+from quarantine.constants import DEFAULT_RATE_LIMIT, RATE_LIMITS
+
+logger = Logger(child=True)
+
+__all__ = ["RateLimiter", "get_limiter", "register_rate_limiter", "stats"]
+
+# Error codes returned by AWS APIs when a request is throttled
+THROTTLING_ERROR_CODES = frozenset(
+    [
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestLimitExceeded",
+        "RequestThrottled",
+        "RequestThrottledException",
+        "TooManyRequestsException",
+        "SlowDown",
+    ]
+)
+
+
+class RateLimiter:
+    """
+    Thread-safe, adaptive token bucket limiting how often an API is called from this process.
+
+    Tokens are refilled at `rate` per second up to `burst`. `acquire()` blocks until a token is
+    available, so callers running in parallel are spread out rather than rejected. When a call is
+    throttled the rate is halved (down to `min_rate`), and each successful call recovers a
+    tenth of `max_rate` until the configured rate is reached again.
+    """
+
+    DECREASE_FACTOR = 0.5
+    RECOVERY_STEPS = 10
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.5) -> None:
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+
+        # counters, read with stats()
+        self.calls = 0
+        self.throttles = 0
+        self.delayed_calls = 0
+        self.delay_secs = 0.0
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for one if the bucket is empty
+
+        Returns the number of seconds waited.
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.calls += 1
+                    if waited:
+                        self.delayed_calls += 1
+                        self.delay_secs += waited
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self) -> None:
+        """
+        Reduce the rate after a call was throttled
+        """
+
+        with self._lock:
+            self._refill()
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.DECREASE_FACTOR)
+            # drop any saved up burst so the reduced rate applies immediately
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self) -> None:
+        """
+        Gradually recover the rate after a successful call
+        """
+
+        if self.rate >= self.max_rate:
+            return
+
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / self.RECOVERY_STEPS)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttles": self.throttles,
+                "delayed_calls": self.delayed_calls,
+                "delay_secs": self.delay_secs,
+                "rate": self.rate,
+            }
+
+
+# One limiter per API operation, shared by every client and invocation in the container
+_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+_LOCK = threading.Lock()
+
+
+def get_limiter(service_name: str, operation_name: str) -> RateLimiter:
+    """
+    Return the limiter of an API operation, such as ("ec2", "CreateSnapshot")
+    """
+
+    key = (service_name, operation_name)
+
+    limiter = _LIMITERS.get(key)
+    if limiter is None:
+        with _LOCK:
+            limiter = _LIMITERS.get(key)
+            if limiter is None:
+                rate, burst = RATE_LIMITS.get(
+                    f"{service_name}.{operation_name}", DEFAULT_RATE_LIMIT
+                )
+                limiter = RateLimiter(rate, burst)
+                _LIMITERS[key] = limiter
+
+    return limiter
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """
+    Return the counters of every limiter used so far, keyed by "service.Operation"
+    """
+
+    with _LOCK:
+        limiters = dict(_LIMITERS)
+
+    return {
+        f"{service}.{operation}": limiter.stats()
+        for (service, operation), limiter in limiters.items()
+    }
+
+
+def _error_code(parsed: Any) -> str:
+    if isinstance(parsed, dict):
+        return parsed.get("Error", {}).get("Code", "")
+    return ""
+
+
+def register_rate_limiter(client: Any, service_name: str) -> None:
+    """
+    Put every call made by a boto3 client behind the limiter of its operation
+
+    Calls wait for a token before they are sent. Throttled attempts (including the ones botocore
+    retries) reduce the rate of the operation, successful calls let it recover.
+    """
+
+    # on before-parameter-build rather than before-call, which stubbed responses short-circuit
+    def before_call(model: Any, **kwargs: Any) -> None:
+        waited = get_limiter(service_name, model.name).acquire()
+        if waited:
+            logger.debug(f"Delayed {service_name}.{model.name} by {waited:.3f}s")
+
+    def needs_retry(
+        operation: Any, response: Any = None, request_dict: Any = None, **kwargs: Any
+    ) -> None:
+        if response is not None and _error_code(response[1]) in THROTTLING_ERROR_CODES:
+            logger.info(f"Throttled calling {service_name}.{operation.name}")
+            get_limiter(service_name, operation.name).throttled()
+            if request_dict is not None:
+                request_dict["context"]["throttled"] = True
+
+    def after_call(model: Any, parsed: Any, context: Any = None, **kwargs: Any) -> None:
+        limiter = get_limiter(service_name, model.name)
+        if _error_code(parsed) in THROTTLING_ERROR_CODES:
+            # already counted if the attempts went through the retry handler
+            if not (context or {}).get("throttled"):
+                limiter.throttled()
+                if context is not None:
+                    context["throttled"] = True
+        else:
+            limiter.succeeded()
+
+    client.meta.events.register("before-parameter-build", before_call)
+    client.meta.events.register("needs-retry", needs_retry)
+    client.meta.events.register("after-call", after_call)
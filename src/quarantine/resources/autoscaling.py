@@ -20,23 +20,31 @@
 """
 
 from aws_lambda_powertools import Logger
+from typing import Dict, List, Optional, Tuple
+
 import boto3
 import botocore
 
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
+from quarantine.utils import chunks
 
 logger = Logger(child=True)
 
 __all__ = ["AutoScaling"]
 
+# Maximum number of instances per DescribeAutoScalingInstances request
+DESCRIBE_INSTANCES_BATCH_SIZE = 50
+
 
+@traced
 class AutoScaling:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("autoscaling", config=BOTO3_CONFIG)
+        self.client = get_client(session, "autoscaling")
 
-    def detach_instance(self, instance_id: str) -> None:
+    def describe_auto_scaling_groups(self, instance_id: str) -> List[str]:
         """
-        Detach an instance from any autoscaling groups
+        List the autoscaling groups an instance is attached to
         """
 
         logger.info(f"Checking if instance {instance_id} is attached to autoscaling groups")
@@ -47,13 +55,26 @@ class AutoScaling:
             logger.exception("Failed to describe auto scaling instances")
             raise
 
-        instances = response.get("AutoScalingInstances", [])
-        if not instances:
+        return [
+            instance["AutoScalingGroupName"]
+            for instance in response.get("AutoScalingInstances", [])
+        ]
+
+    def detach_instance(self, instance_id: str, asg_names: Optional[List[str]] = None) -> None:
+        """
+        Detach an instance from any autoscaling groups
+
+        The groups are described unless they are given, such as from a batch request.
+        """
+
+        if asg_names is None:
+            asg_names = self.describe_auto_scaling_groups(instance_id)
+
+        if not asg_names:
             logger.info(f"Instance {instance_id} not attached to any auto scaling groups")
             return
 
-        for instance in instances:
-            asg_name = instance["AutoScalingGroupName"]
+        for asg_name in asg_names:
             logger.info(f"Detaching {instance_id} from {asg_name}")
             try:
                 self.client.detach_instances(
@@ -64,3 +85,30 @@ class AutoScaling:
                 logger.info(f"Detached {instance_id} from {asg_name}")
             except botocore.exceptions.ClientError:
                 logger.exception(f"Failed to detach {instance_id} from {asg_name}")
+
+    def describe_auto_scaling_instances_batch(
+        self, instance_ids: List[str]
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Look up the autoscaling group of many instances in as few requests as possible
+
+        Returns the autoscaling group names and the errors, each keyed by instance ID. Instances
+        that are not part of an autoscaling group are omitted from both.
+        """
+
+        groups: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+
+        paginator = self.client.get_paginator("describe_auto_scaling_instances")
+        for batch in chunks(instance_ids, DESCRIBE_INSTANCES_BATCH_SIZE):
+            logger.info(f"Describing {len(batch)} auto scaling instances")
+            try:
+                for page in paginator.paginate(InstanceIds=batch):
+                    for instance in page.get("AutoScalingInstances", []):
+                        groups[instance["InstanceId"]] = instance["AutoScalingGroupName"]
+                logger.debug(f"Described {len(batch)} auto scaling instances")
+            except botocore.exceptions.ClientError as exc:
+                logger.exception(f"Failed to describe {len(batch)} auto scaling instances")
+                errors.update({instance_id: str(exc) for instance_id in batch})
+
+        return groups, errors
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from quarantine.budget import register_budget
+from quarantine.constants import BOTO3_CONFIG
+from quarantine.deadline import register_deadline
+from quarantine.instrumentation import register_metrics
+from quarantine.ratelimit import register_rate_limiter
+from quarantine.tracing import register_tracing
+
+__all__ = ["get_client"]
+
+# Clients are cached for the lifetime of the container so warm invocations and every plugin
+# share the same service models and connection pools. botocore clients are thread-safe once
+# created, but creating them from a shared session is not, hence the lock.
+_CLIENTS: Dict[Tuple[boto3.Session, str, Optional[str], Config], Any] = {}
+_LOCK = threading.Lock()
+
+
+def get_client(
+    session: boto3.Session,
+    service_name: str,
+    region_name: Optional[str] = None,
+    config: Config = BOTO3_CONFIG,
+) -> Any:
+    """
+    Return a cached boto3 client, creating it on first use
+
+    Every call made through the client goes through the rate limiter of its operation, and
+    calls to rate limited APIs take from the budget shared with concurrent invocations. Calls
+    made by a plugin that ran out of time are cancelled before they wait for either. The calls
+    of each plugin are counted and timed for its metrics, and their retries and throttling are
+    annotated on the trace.
+    """
+
+    region_name = region_name or session.region_name
+    key = (session, service_name, region_name, config)
+
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = session.client(service_name, region_name=region_name, config=config)
+                register_metrics(client, service_name)
+                register_deadline(client, service_name)
+                register_rate_limiter(client, service_name)
+                register_budget(client, service_name, session)
+                register_tracing(client, service_name)
+                _CLIENTS[key] = client
+
+    return client
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from decimal import Decimal
+import time
+from typing import Any, Dict, Optional
+
+from aws_lambda_powertools import Logger
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+import botocore
+
+from quarantine.resources.clients import get_client
+from quarantine.store import AbstractStore
+from quarantine.tracing import traced
+
+logger = Logger(child=True)
+
+__all__ = ["DynamoDB"]
+
+_SERIALIZER = TypeSerializer()
+_DESERIALIZER = TypeDeserializer()
+
+
+def _to_dynamodb(value: Any) -> Any:
+    # DynamoDB numbers are decimals, floats must be converted explicitly
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {name: _to_dynamodb(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb(item) for item in value]
+    return value
+
+
+def _from_dynamodb(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {name: _from_dynamodb(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_from_dynamodb(item) for item in value]
+    return value
+
+
+@traced
+class DynamoDB(AbstractStore):
+    """
+    State store backed by a DynamoDB table with a string partition key named `pk`.
+
+    The table should have time to live enabled on the `ttl` attribute so expired items are
+    eventually removed, expired items are ignored on read until then.
+    """
+
+    def __init__(self, session: boto3.Session, table_name: str) -> None:
+        self.client = get_client(session, "dynamodb")
+        self.table_name = table_name
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        logger.debug(f"Getting item {key} from table {self.table_name}")
+        try:
+            response = self.client.get_item(
+                TableName=self.table_name, Key={"pk": {"S": key}}, ConsistentRead=True
+            )
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to get item {key} from table {self.table_name}")
+            raise
+
+        item = response.get("Item")
+        if item is None:
+            return None
+
+        item = {
+            name: _from_dynamodb(_DESERIALIZER.deserialize(value))
+            for name, value in item.items()
+            if name != "pk"
+        }
+        if item.get("ttl") is not None and item["ttl"] <= time.time():
+            return None
+        return item
+
+    def put(
+        self, key: str, item: Dict[str, Any], version: Optional[int] = None, overwrite: bool = False
+    ) -> bool:
+        if overwrite:
+            version = None
+        item = dict(item, version=(version or 0) + 1)
+
+        params = {
+            "TableName": self.table_name,
+            "Item": {"pk": {"S": key}},
+            "ExpressionAttributeNames": {"#version": "version"},
+        }
+        params["Item"].update(
+            {name: _SERIALIZER.serialize(_to_dynamodb(value)) for name, value in item.items()}
+        )
+        if overwrite:
+            del params["ExpressionAttributeNames"]
+        elif version is None:
+            params["ConditionExpression"] = "attribute_not_exists(#version) OR #ttl <= :now"
+            params["ExpressionAttributeNames"]["#ttl"] = "ttl"
+            params["ExpressionAttributeValues"] = {":now": {"N": str(int(time.time()))}}
+        else:
+            params["ConditionExpression"] = "#version = :version"
+            params["ExpressionAttributeValues"] = {":version": {"N": str(version)}}
+
+        logger.debug(f"Putting item {key} version {item['version']} in table {self.table_name}")
+        try:
+            self.client.put_item(**params)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            logger.debug(f"Item {key} was modified concurrently in table {self.table_name}")
+            return False
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to put item {key} in table {self.table_name}")
+            raise
+
+        return True
+
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        params = {
+            "TableName": self.table_name,
+            "Key": {"pk": {"S": key}},
+            "ConditionExpression": "attribute_exists(#version)",
+            "ExpressionAttributeNames": {"#version": "version"},
+        }
+        if version is not None:
+            params["ConditionExpression"] = "#version = :version"
+            params["ExpressionAttributeValues"] = {":version": {"N": str(version)}}
+
+        logger.debug(f"Deleting item {key} from table {self.table_name}")
+        try:
+            self.client.delete_item(**params)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to delete item {key} from table {self.table_name}")
+            raise
+
+        return True
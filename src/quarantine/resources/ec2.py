@@ -21,13 +21,15 @@
 
 import time
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
+from quarantine.utils import chunks
 
 EC2_INSTANCE_PROFILE_ARN = os.environ["EC2_INSTANCE_PROFILE_ARN"]
 
@@ -35,10 +37,14 @@ logger = Logger(child=True)
 
 __all__ = ["EC2"]
 
+# Maximum number of instances per DescribeInstances request
+DESCRIBE_INSTANCES_BATCH_SIZE = 200
 
+
+@traced
 class EC2:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("ec2", config=BOTO3_CONFIG)
+        self.client = get_client(session, "ec2")
 
     def get_console_screenshot(self, instance_id: str) -> str:
         """
@@ -70,6 +76,68 @@ class EC2:
 
         return response["Reservations"][0]["Instances"][0]
 
+    def describe_tagged_instances(self, key: str) -> List[Dict[str, Any]]:
+        """
+        Describe every instance that has a tag, whatever its value
+        """
+
+        instances: List[Dict[str, Any]] = []
+
+        logger.info(f"Describing instances tagged {key}")
+        paginator = self.client.get_paginator("describe_instances")
+        try:
+            for page in paginator.paginate(Filters=[{"Name": "tag-key", "Values": [key]}]):
+                for reservation in page["Reservations"]:
+                    instances.extend(reservation["Instances"])
+            logger.debug(f"Described {len(instances)} instances tagged {key}")
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to describe instances tagged {key}")
+            raise
+
+        return instances
+
+    def describe_instances_batch(
+        self, instance_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        Describe many instances in as few requests as possible
+
+        Returns the instances and the errors, each keyed by instance ID. If a batch is rejected
+        (for example because one of the instances no longer exists), its instances are described
+        one at a time so a single bad instance does not fail the others.
+        """
+
+        instances: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, str] = {}
+
+        paginator = self.client.get_paginator("describe_instances")
+        for batch in chunks(instance_ids, DESCRIBE_INSTANCES_BATCH_SIZE):
+            logger.info(f"Describing {len(batch)} instances")
+            try:
+                for page in paginator.paginate(InstanceIds=batch):
+                    for reservation in page["Reservations"]:
+                        for instance in reservation["Instances"]:
+                            instances[instance["InstanceId"]] = instance
+                logger.debug(f"Described {len(batch)} instances")
+            except botocore.exceptions.ClientError as exc:
+                if len(batch) == 1:
+                    logger.exception(f"Failed to describe instance {batch[0]}")
+                    errors[batch[0]] = str(exc)
+                    continue
+
+                logger.warning(f"Failed to describe {len(batch)} instances, retrying individually")
+                for instance_id in batch:
+                    try:
+                        instances[instance_id] = self.describe_instances(instance_id)
+                    except (botocore.exceptions.ClientError, IndexError) as exc:
+                        errors[instance_id] = str(exc) or "Instance not found"
+
+        for instance_id in instance_ids:
+            if instance_id not in instances and instance_id not in errors:
+                errors[instance_id] = "Instance not found"
+
+        return instances, errors
+
     def describe_security_groups(self, instance_id: str, vpc_id: str) -> Dict[str, Any]:
         """
         Describe security groups
@@ -95,19 +163,60 @@ class EC2:
 
         return response.get("SecurityGroups", [])
 
-    def create_snapshot(self, instance_id: str, volume_id: str) -> None:
+    def create_snapshot(
+        self, instance_id: str, volume_id: str, tags: Optional[List[Dict[str, str]]] = None
+    ) -> Optional[str]:
         """
-        Create an EBS snapshot
+        Create an EBS snapshot, tagged at creation
         """
 
         description = f"Security Response automated copy of {volume_id} for instance {instance_id}"
 
+        params = {"VolumeId": volume_id, "Description": description}
+        if tags:
+            params["TagSpecifications"] = [{"ResourceType": "snapshot", "Tags": tags}]
+
         logger.info(f"Creating snapshot of volume {volume_id}")
         try:
-            self.client.create_snapshot(VolumeId=volume_id, Description=description)
+            response = self.client.create_snapshot(**params)
             logger.debug(f"Created snapshot of volume {volume_id}")
         except botocore.exceptions.ClientError:
             logger.exception(f"Failed to create snapshot of volume {volume_id}")
+            return None
+
+        return response["SnapshotId"]
+
+    def create_snapshots(
+        self, instance_id: str, tags: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, str]:
+        """
+        Create crash-consistent snapshots of all EBS volumes attached to an instance, tagged at
+        creation
+
+        Returns a mapping of volume ID to snapshot ID.
+        """
+
+        description = f"Security Response automated copy of instance {instance_id}"
+
+        params = {
+            "InstanceSpecification": {"InstanceId": instance_id, "ExcludeBootVolume": False},
+            "Description": description,
+        }
+        if tags:
+            params["TagSpecifications"] = [{"ResourceType": "snapshot", "Tags": tags}]
+
+        logger.info(f"Creating snapshots of volumes attached to {instance_id}")
+        try:
+            response = self.client.create_snapshots(**params)
+            logger.debug(f"Created snapshots of volumes attached to {instance_id}")
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to create snapshots of volumes attached to {instance_id}")
+            raise
+
+        return {
+            snapshot["VolumeId"]: snapshot["SnapshotId"]
+            for snapshot in response.get("Snapshots", [])
+        }
 
     def enable_termination_protection(self, instance_id: str) -> None:
         """
@@ -170,9 +279,33 @@ class EC2:
             )
             raise
 
-    def remove_ec2_instance_profile(self, instance_id: str) -> None:
+    def describe_volumes(self, instance_id: str) -> List[Dict[str, Any]]:
         """
-        Remove any EC2 instance profile attached to an instance
+        Describe the EBS volumes attached to an instance
+        """
+
+        params = {
+            "Filters": [
+                {"Name": "attachment.instance-id", "Values": [instance_id]},
+            ]
+        }
+
+        logger.info(f"Describing volumes attached to {instance_id}")
+        try:
+            paginator = self.client.get_paginator("describe_volumes")
+            volumes = [
+                volume for page in paginator.paginate(**params) for volume in page["Volumes"]
+            ]
+            logger.debug(f"Described volumes attached to {instance_id}")
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to describe volumes attached to {instance_id}")
+            raise
+
+        return volumes
+
+    def describe_iam_instance_profile_associations(self, instance_id: str) -> List[Dict[str, Any]]:
+        """
+        Describe the active IAM instance profile associations on an instance
         """
 
         params = {
@@ -182,7 +315,7 @@ class EC2:
             ]
         }
 
-        logger.debug("Describing IAM instance profile associations on {instance_id}")
+        logger.debug(f"Describing IAM instance profile associations on {instance_id}")
         try:
             response = self.client.describe_iam_instance_profile_associations(**params)
             logger.debug(f"Described IAM instance profile associations on {instance_id}")
@@ -192,11 +325,39 @@ class EC2:
             )
             raise
 
-        associations = response.get("IamInstanceProfileAssociations", [])
+        return response.get("IamInstanceProfileAssociations", [])
+
+    def is_instance_profile_associated(self, instance_id: str, profile_arn: str) -> bool:
+        """
+        Check whether an IAM instance profile has finished associating with an instance
+        """
+
+        associations = self.describe_iam_instance_profile_associations(instance_id)
+        return any(
+            association["State"] == "associated"
+            and association["IamInstanceProfile"]["Arn"] == profile_arn
+            for association in associations
+        )
+
+    def remove_ec2_instance_profile(
+        self, instance_id: str, associations: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Remove any EC2 instance profile attached to an instance
+
+        If the current associations are already known they can be passed in to skip describing
+        them again. Every association is disassociated even if one fails, the first failure is
+        raised afterwards.
+        """
+
+        if associations is None:
+            associations = self.describe_iam_instance_profile_associations(instance_id)
+
         if not associations:
             logger.debug(f"No IAM instance profiles attached to {instance_id}")
             return
 
+        error: Optional[botocore.exceptions.ClientError] = None
         for association in associations:
             profile_arn = association["IamInstanceProfile"]["Arn"]
             logger.info(f"Disassociating IAM instance profile {profile_arn} from {instance_id}")
@@ -205,10 +366,14 @@ class EC2:
                     AssociationId=association["AssociationId"]
                 )
                 logger.debug(f"Disassociated IAM instance profile {profile_arn} from {instance_id}")
-            except botocore.exceptions.ClientError:
+            except botocore.exceptions.ClientError as e:
                 logger.exception(
                     f"Failed to disassociate IAM instance profile {profile_arn} from {instance_id}"
                 )
+                error = error or e
+
+        if error is not None:
+            raise error
 
     def attach_ec2_instance_profile(self, instance_id: str, profile_arn: str) -> None:
         """
@@ -291,6 +456,7 @@ class EC2:
             logger.debug(f"Described network interfaces on {instance_id}")
         except botocore.exceptions.ClientError:
             logger.exception(f"Failed to describe network interfaces on {instance_id}")
+            raise
 
         return response.get("NetworkInterfaces", [])
 
@@ -327,3 +493,23 @@ class EC2:
             logger.debug(f"Created tags on {instance_id}")
         except botocore.exceptions.ClientError:
             logger.exception(f"Failed to create tags on {instance_id}")
+
+    def delete_tags(self, instance_id: str, keys: List[str]) -> None:
+        """
+        Delete tags from an EC2 instance
+        """
+
+        if not keys:
+            return
+
+        params = {
+            "Resources": [instance_id],
+            "Tags": [{"Key": key} for key in keys],
+        }
+
+        logger.info(f"Deleting tags {keys} from {instance_id}")
+        try:
+            self.client.delete_tags(**params)
+            logger.debug(f"Deleted tags {keys} from {instance_id}")
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to delete tags {keys} from {instance_id}")
@@ -16,56 +16,103 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from typing import Dict, List, Optional
+
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
 
 logger = Logger(child=True)
 
 __all__ = ["ELB"]
 
 
+@traced
 class ELB:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("elb", config=BOTO3_CONFIG)
+        self.client = get_client(session, "elb")
 
-    def deregister_instance(self, instance_id: str) -> None:
+    def find_load_balancers(self, instance_id: str, vpc_id: Optional[str] = None) -> List[str]:
         """
-        Deregister instance from any classic ELBs
+        Find the classic ELBs an instance is registered with
+
+        The registered instances are part of each load balancer description, so this costs one
+        call per page of load balancers.
         """
 
         logger.info(f"Checking if instance {instance_id} is registered with any classic ELBs")
+
+        load_balancer_names = []
         try:
-            response = self.client.describe_load_balancers()
+            paginator = self.client.get_paginator("describe_load_balancers")
+            for page in paginator.paginate():
+                for lb in page.get("LoadBalancerDescriptions", []):
+                    if vpc_id and lb.get("VPCId") != vpc_id:
+                        continue
+                    if any(i["InstanceId"] == instance_id for i in lb.get("Instances", [])):
+                        load_balancer_name = lb["LoadBalancerName"]
+                        logger.info(f"Found {instance_id} registered to ELB {load_balancer_name}")
+                        load_balancer_names.append(load_balancer_name)
             logger.debug("Described load balancers")
         except botocore.exceptions.ClientError:
             logger.exception("Failed to describe load balancers")
             raise
 
-        for lb in response.get("LoadBalancerDescriptions", []):
-            load_balancer_name = lb["LoadBalancerName"]
-            found_instance = False
-
-            instances = self.client.describe_instance_health(LoadBalancerName=load_balancer_name)
-            for instance in instances.get("InstanceStates", []):
-                if instance_id == instance["InstanceId"]:
-                    logger.info(f"Found {instance_id} registered to ELB {load_balancer_name}")
-                    found_instance = True
-                    break
-
-            if found_instance:
-                params = {
-                    "LoadBalancerName": load_balancer_name,
-                    "Instances": [
-                        {
-                            "InstanceId": instance_id
-                        }
-                    ]
-                }
-                try:
-                    self.client.deregister_instances_from_load_balancer(**params)
-                    logger.info(f"Deregistered instance {instance_id} from ELB {load_balancer_name}")
-                except botocore.exceptions.ClientError:
-                    logger.exception(f"Failed to deregister instance {instance_id} from ELB {load_balancer_name}")
+        return load_balancer_names
+
+    def list_registrations(self) -> Dict[str, List[str]]:
+        """
+        Map every instance registered with a classic ELB to its load balancer names
+        """
+
+        registrations: Dict[str, List[str]] = {}
+
+        logger.info("Listing instances of all classic ELBs")
+        try:
+            paginator = self.client.get_paginator("describe_load_balancers")
+            for page in paginator.paginate():
+                for lb in page.get("LoadBalancerDescriptions", []):
+                    for instance in lb.get("Instances", []):
+                        registrations.setdefault(instance["InstanceId"], []).append(
+                            lb["LoadBalancerName"]
+                        )
+            logger.debug("Listed instances of all classic ELBs")
+        except botocore.exceptions.ClientError:
+            logger.exception("Failed to describe load balancers")
+            raise
+
+        return registrations
+
+    def deregister_instance(
+        self,
+        instance_id: str,
+        vpc_id: Optional[str] = None,
+        load_balancer_names: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Deregister instance from any classic ELBs
+
+        When the load balancers are already known (from the load balancer index) only those are
+        deregistered from, instead of describing every load balancer.
+        """
+
+        if load_balancer_names is None:
+            load_balancer_names = self.find_load_balancers(instance_id, vpc_id)
+
+        for load_balancer_name in load_balancer_names:
+            params = {
+                "LoadBalancerName": load_balancer_name,
+                "Instances": [{"InstanceId": instance_id}],
+            }
+            try:
+                self.client.deregister_instances_from_load_balancer(**params)
+                logger.info(f"Deregistered instance {instance_id} from ELB {load_balancer_name}")
+            except self.client.exceptions.AccessPointNotFoundException:
+                logger.info(f"ELB {load_balancer_name} no longer exists")
+            except botocore.exceptions.ClientError:
+                logger.exception(
+                    f"Failed to deregister instance {instance_id} from ELB {load_balancer_name}"
+                )
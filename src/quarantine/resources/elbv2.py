@@ -16,56 +16,182 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, List, Optional, Set
+
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.constants import ELB_SCAN_MAX_WORKERS
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
+from quarantine.utils import ContextThreadPoolExecutor
 
 logger = Logger(child=True)
 
 __all__ = ["ELBv2"]
 
 
+def _targets_of(response: Dict, instance_id: str) -> List[Dict]:
+    # targets that are not registered are reported with the reason Target.NotRegistered
+    return [
+        {"Id": target["Target"]["Id"], "Port": target["Target"]["Port"]}
+        for target in response.get("TargetHealthDescriptions", [])
+        if target["Target"]["Id"] == instance_id
+        and target.get("TargetHealth", {}).get("Reason") != "Target.NotRegistered"
+    ]
+
+
+@traced
 class ELBv2:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("elbv2", config=BOTO3_CONFIG)
+        self.client = get_client(session, "elbv2")
 
-    def deregister_target(self, instance_id: str) -> None:
+    def registered_targets(self, instance_id: str, target_group_arn: str) -> List[Dict]:
         """
-        Deregister instance from any target groups
+        Return the targets (ID and port) an instance is registered as with a target group
+
+        An instance can be registered on several ports, or on a port other than the default port
+        of the target group, so all targets are described and matched on the instance ID.
+        """
+
+        try:
+            response = self.client.describe_target_health(TargetGroupArn=target_group_arn)
+        except self.client.exceptions.TargetGroupNotFoundException:
+            return []
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to describe target health of {target_group_arn}")
+            raise
+
+        return _targets_of(response, instance_id)
+
+    def find_target_groups(
+        self, instance_id: str, vpc_id: Optional[str] = None
+    ) -> Dict[str, List[Dict]]:
+        """
+        Find the target groups an instance is registered with, and the targets it is registered as
+
+        Target groups are paginated and checked in parallel while the next page is fetched.
+        Only instance target groups (in the VPC of the instance, when given) can contain the
+        instance.
         """
 
         logger.info(f"Checking if instance {instance_id} is registered with any target groups")
+
+        found: Dict[str, List[Dict]] = {}
+        futures: Dict[Future, str] = {}
+        pending: Set[Future] = set()
+
+        def collect(done: Set[Future]) -> None:
+            for future in done:
+                targets = future.result()
+                if targets:
+                    target_group_arn = futures[future]
+                    logger.info(f"Found {instance_id} registered to {target_group_arn}")
+                    found[target_group_arn] = targets
+
+        executor = ContextThreadPoolExecutor(
+            max_workers=ELB_SCAN_MAX_WORKERS, thread_name_prefix="elb"
+        )
         try:
-            response = self.client.describe_target_groups()
+            paginator = self.client.get_paginator("describe_target_groups")
+            for page in paginator.paginate():
+                for tg in page.get("TargetGroups", []):
+                    if tg.get("TargetType", "instance") != "instance":
+                        continue
+                    if vpc_id and tg.get("VpcId") != vpc_id:
+                        continue
+                    future = executor.submit(
+                        self.registered_targets, instance_id, tg["TargetGroupArn"]
+                    )
+                    futures[future] = tg["TargetGroupArn"]
+                    pending.add(future)
+
+                done = {future for future in pending if future.done()}
+                pending -= done
+                collect(done)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
             logger.debug("Described target groups")
         except botocore.exceptions.ClientError:
             logger.exception("Failed to describe target groups")
             raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return found
+
+    def list_registrations(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """
+        Map every instance registered with an instance target group to its target group ARNs and
+        the targets (ID and port) it is registered as with each
+        """
+
+        registrations: Dict[str, Dict[str, List[Dict]]] = {}
+
+        def describe_targets(target_group_arn: str) -> List[Dict]:
+            try:
+                response = self.client.describe_target_health(TargetGroupArn=target_group_arn)
+            except self.client.exceptions.TargetGroupNotFoundException:
+                return []
+            return [
+                {"Id": target["Target"]["Id"], "Port": target["Target"]["Port"]}
+                for target in response["TargetHealthDescriptions"]
+            ]
+
+        logger.info("Listing targets of all target groups")
+        try:
+            paginator = self.client.get_paginator("describe_target_groups")
+            target_group_arns = [
+                tg["TargetGroupArn"]
+                for page in paginator.paginate()
+                for tg in page.get("TargetGroups", [])
+                if tg.get("TargetType", "instance") == "instance"
+            ]
+
+            with ContextThreadPoolExecutor(
+                max_workers=ELB_SCAN_MAX_WORKERS, thread_name_prefix="elb"
+            ) as executor:
+                for target_group_arn, targets in zip(
+                    target_group_arns, executor.map(describe_targets, target_group_arns)
+                ):
+                    for target in targets:
+                        registrations.setdefault(target["Id"], {}).setdefault(
+                            target_group_arn, []
+                        ).append(target)
+            logger.debug(f"Listed targets of {len(target_group_arns)} target groups")
+        except botocore.exceptions.ClientError:
+            logger.exception("Failed to list targets of target groups")
+            raise
+
+        return registrations
+
+    def deregister_target(
+        self,
+        instance_id: str,
+        vpc_id: Optional[str] = None,
+        target_groups: Optional[Dict[str, List[Dict]]] = None,
+    ) -> None:
+        """
+        Deregister instance from any target groups
+
+        When the target groups are already known (from the load balancer index) only those are
+        deregistered from, instead of scanning every target group. Targets are deregistered with
+        their port, deregistering without one only removes the target on the default port.
+        """
+
+        if target_groups is None:
+            target_groups = self.find_target_groups(instance_id, vpc_id)
 
-        for tg in response.get("TargetGroups", []):
-            target_group_arn = tg["TargetGroupArn"]
-            found_instance = False
-
-            instances = self.client.describe_target_health(TargetGroupArn=target_group_arn)
-            for target in instances.get("TargetHealthDescriptions", []):
-                if instance_id == target["Target"]["Id"]:
-                    logger.info(f"Found {instance_id} registered to target group {target_group_arn}")
-                    found_instance = True
-                    break
-
-            if found_instance:
-                params = {
-                    "TargetGroupArn": target_group_arn,
-                    "Targets": [
-                        {
-                            "Id": instance_id
-                        }
-                    ]
-                }
-                try:
-                    self.client.deregister_targets(**params)
-                    logger.info(f"Deregistered instance {instance_id} from target group {target_group_arn}")
-                except botocore.exceptions.ClientError:
-                    logger.exception(f"Failed to deregister instance {instance_id} from target group {target_group_arn}")
+        for target_group_arn, targets in target_groups.items():
+            params = {"TargetGroupArn": target_group_arn, "Targets": targets}
+            try:
+                self.client.deregister_targets(**params)
+                logger.info(f"Deregistered instance {instance_id} from {target_group_arn}")
+            except self.client.exceptions.TargetGroupNotFoundException:
+                logger.info(f"Target group {target_group_arn} no longer exists")
+            except botocore.exceptions.ClientError:
+                logger.exception(f"Failed to deregister {instance_id} from {target_group_arn}")
@@ -19,44 +19,424 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import base64
+import hashlib
 import os
-from typing import Union
+import zlib
+from types import TracebackType
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Type, Union
 
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.utils import get_prefix
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.constants import (
+    ARTIFACT_COMPRESSION_LEVEL,
+    ARTIFACT_MULTIPART_THRESHOLD,
+    ARTIFACT_PART_SIZE,
+)
+from quarantine.prefix_index import PrefixIndex
+from quarantine.store import get_store
+from quarantine.utils import chunks, get_staging_prefix, now
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
 
 BUCKET_NAME = os.environ["ARTIFACT_BUCKET"]
 AWS_ACCOUNT_ID = os.environ["AWS_ACCOUNT_ID"]
 
+MAX_DELETE_BATCH_SIZE = 1000
+
 logger = Logger(child=True)
 
-__all__ = ["S3"]
+__all__ = ["ArtifactWriter", "S3"]
+
+Body = Union[bytes, str, BinaryIO, Iterable[Union[bytes, str]]]
+
+
+def _checksum(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+
+
+class ArtifactWriter:
+    """
+    File-like writer that streams an artifact to S3, holding at most one part in memory.
+
+    Artifacts up to `ARTIFACT_MULTIPART_THRESHOLD` bytes are uploaded with a single PutObject
+    when the writer is closed, larger ones as a multipart upload of `ARTIFACT_PART_SIZE` parts.
+    The SHA-256 digest of the artifact is computed as it is written and returned when the writer
+    is closed, to be recorded in the evidence manifest. S3 verifies the SHA-256 checksum of every
+    request and stores it with the object, as a checksum of the part checksums for multipart
+    uploads. Single part artifacts also carry the hex digest as the `sha256` object metadata,
+    the metadata of a multipart upload is fixed before the digest is known.
+
+    With `compress`, the artifact is gzip compressed as it is written. The size and digest are
+    then those of the compressed object.
+    """
+
+    def __init__(
+        self, client: Any, key: str, metadata: Dict[str, str], compress: bool = False
+    ) -> None:
+        self.client = client
+        self.key = key
+        self.metadata = metadata
+
+        self.size = 0
+        self.uncompressed_size = 0
+        self.sha256: Optional[str] = None
+        self.created: Optional[str] = None
+
+        # wbits 31 writes a gzip header and trailer
+        self._compressor = (
+            zlib.compressobj(ARTIFACT_COMPRESSION_LEVEL, zlib.DEFLATED, 31) if compress else None
+        )
+        self._extra: Dict[str, str] = {"ContentType": "application/gzip"} if compress else {}
+
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    def __enter__(self) -> "ArtifactWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None:
+            self.abort()
+            return
+
+        try:
+            self.close()
+        except Exception:
+            self.abort()
+            raise
+
+    def write(self, data: Union[bytes, str]) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        size = len(data)
+        self.uncompressed_size += size
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+
+        self._append(data)
+        return size
+
+    def _append(self, data: bytes) -> None:
+        self._hash.update(data)
+        self.size += len(data)
+        self._buffer += data
+
+        if self._upload_id is None and len(self._buffer) > ARTIFACT_MULTIPART_THRESHOLD:
+            self._create_multipart_upload()
+        if self._upload_id is not None:
+            while len(self._buffer) >= ARTIFACT_PART_SIZE:
+                self._upload_part(ARTIFACT_PART_SIZE)
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish the upload and return the key, size, SHA-256 hex digest and creation time of the
+        artifact, and the uncompressed size of a compressed artifact
+        """
+
+        if self._compressor is not None:
+            self._append(self._compressor.flush())
+            self._compressor = None
+
+        self.sha256 = self._hash.hexdigest()
+        self.created = now()
+
+        if self._upload_id is None:
+            body = bytes(self._buffer)
+            self._buffer.clear()
+
+            logger.debug(f"Uploading s3://{BUCKET_NAME}/{self.key}")
+            self.client.put_object(
+                ACL="bucket-owner-full-control",
+                Bucket=BUCKET_NAME,
+                Key=self.key,
+                Body=body,
+                ChecksumSHA256=_checksum(body),
+                Metadata={**self.metadata, "sha256": self.sha256},
+                ExpectedBucketOwner=AWS_ACCOUNT_ID,
+                **self._extra,
+            )
+        else:
+            if self._buffer or not self._parts:
+                self._upload_part(len(self._buffer))
+
+            self.client.complete_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+                ExpectedBucketOwner=AWS_ACCOUNT_ID,
+            )
+            self._upload_id = None
+
+        logger.debug(f"Uploaded s3://{BUCKET_NAME}/{self.key} ({self.size} bytes)")
+        return self.artifact
+
+    @property
+    def artifact(self) -> Dict[str, Any]:
+        artifact = {
+            "key": self.key,
+            "size": self.size,
+            "sha256": self.sha256,
+            "created": self.created,
+        }
+        if self._extra:
+            artifact["uncompressed_size"] = self.uncompressed_size
+        return artifact
+
+    def abort(self) -> None:
+        """
+        Discard the artifact, removing the parts uploaded so far
+        """
+
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=self.key,
+                UploadId=self._upload_id,
+                ExpectedBucketOwner=AWS_ACCOUNT_ID,
+            )
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to abort upload of s3://{BUCKET_NAME}/{self.key}")
+        self._upload_id = None
+
+    def _create_multipart_upload(self) -> None:
+        logger.debug(f"Starting multipart upload of s3://{BUCKET_NAME}/{self.key}")
+        response = self.client.create_multipart_upload(
+            ACL="bucket-owner-full-control",
+            Bucket=BUCKET_NAME,
+            Key=self.key,
+            ChecksumAlgorithm="SHA256",
+            Metadata=self.metadata,
+            ExpectedBucketOwner=AWS_ACCOUNT_ID,
+            **self._extra,
+        )
+        self._upload_id = response["UploadId"]
+
+    def _upload_part(self, size: int) -> None:
+        body = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        part_number = len(self._parts) + 1
+        checksum = _checksum(body)
+        response = self.client.upload_part(
+            Bucket=BUCKET_NAME,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+            ChecksumSHA256=checksum,
+            ExpectedBucketOwner=AWS_ACCOUNT_ID,
+        )
+        self._parts.append(
+            {"ETag": response["ETag"], "PartNumber": part_number, "ChecksumSHA256": checksum}
+        )
 
 
+def _iter_body(body: Body) -> Iterator[Union[bytes, str]]:
+    if isinstance(body, (bytes, bytearray, str)):
+        yield body
+    elif hasattr(body, "read"):
+        while True:
+            chunk = body.read(ARTIFACT_PART_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from body
+
+
+@traced
 class S3:
+    """
+    Artifacts of an incident (an instance and a finding) are stored under the prefix recorded
+    for the incident in the prefix index
+    """
+
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("s3", config=BOTO3_CONFIG)
+        self.client = get_client(session, "s3")
+        self.prefix_index = PrefixIndex(get_store(session))
+
+    def get_prefix(self, instance_id: str, finding_id: str) -> str:
+        """
+        Return the key prefix of the artifacts of an incident
+        """
+
+        return self.prefix_index.resolve(instance_id, finding_id)
+
+    def open_artifact(
+        self, instance_id: str, finding_id: str, key: str, compress: bool = False
+    ) -> ArtifactWriter:
+        """
+        Return a writer that streams an artifact of an incident to S3, use it as a context
+        manager so the upload is completed, or aborted on error
+        """
+
+        prefix = self.get_prefix(instance_id, finding_id)
+        metadata = {"instance_id": instance_id, "finding_id": finding_id}
+        return ArtifactWriter(self.client, f"{prefix}/{key}", metadata, compress)
+
+    def put_object(
+        self, instance_id: str, finding_id: str, key: str, body: Body, compress: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Upload an artifact from bytes, a string, a file-like object or an iterable of chunks,
+        gzip compressed with `compress`
+
+        Returns the key, size, SHA-256 digest and creation time of the artifact, or None if the
+        upload failed.
+        """
+
+        prefix = self.get_prefix(instance_id, finding_id)
+
+        logger.debug(f"Uploading s3://{BUCKET_NAME}/{prefix}/{key}")
+        try:
+            with self.open_artifact(instance_id, finding_id, key, compress) as writer:
+                for chunk in _iter_body(body):
+                    writer.write(chunk)
+            logger.debug(f"Uploaded s3://{BUCKET_NAME}/{prefix}/{key}")
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to upload s3://{BUCKET_NAME}/{prefix}/{key}")
+            return None
+
+        return writer.artifact
+
+    def open_dataset(
+        self, instance_id: str, finding_id: str, dataset: str, name: str
+    ) -> ArtifactWriter:
+        """
+        Return a writer for a gzip compressed partition of a dataset, written under
+        datasets/<dataset>/<incident prefix>/ so a single table covers every incident
+        """
+
+        prefix = self.get_prefix(instance_id, finding_id)
+        metadata = {"instance_id": instance_id, "finding_id": finding_id}
+        return ArtifactWriter(
+            self.client, f"datasets/{dataset}/{prefix}/{name}", metadata, compress=True
+        )
 
-    def put_object(self, instance_id: str, key: str, body: Union[bytes, str]) -> None:
-        prefix = get_prefix(instance_id)
+    def stream_object(self, key: str) -> Iterator[bytes]:
+        """
+        Read an object in chunks, decompressing gzip compressed artifacts as they are read
+        """
 
+        logger.debug(f"Reading s3://{BUCKET_NAME}/{key}")
+        try:
+            response = self.client.get_object(
+                Bucket=BUCKET_NAME, Key=key, ExpectedBucketOwner=AWS_ACCOUNT_ID
+            )
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to read s3://{BUCKET_NAME}/{key}")
+            raise
+
+        if response.get("ContentType") != "application/gzip":
+            yield from response["Body"].iter_chunks(ARTIFACT_PART_SIZE)
+            return
+
+        # wbits 47 reads the gzip header, and the output of each chunk is limited so highly
+        # compressed text does not expand in memory
+        decompressor = zlib.decompressobj(47)
+        for chunk in response["Body"].iter_chunks(ARTIFACT_PART_SIZE):
+            while chunk:
+                yield decompressor.decompress(chunk, ARTIFACT_PART_SIZE)
+                chunk = decompressor.unconsumed_tail
+        yield decompressor.flush()
+
+    def compress_staged_objects(
+        self, instance_id: str, finding_id: str, key_prefix: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Move the staged objects under a key prefix of an incident into its evidence, gzip
+        compressed, and return the artifacts
+
+        Each object is streamed through the compressor, so it is never held in memory as a
+        whole. The staged objects are deleted once every one of them has been compressed.
+        """
+
+        staging = get_staging_prefix(self.get_prefix(instance_id, finding_id))
+        keys = self._list_keys(f"{staging}/{key_prefix}")
+
+        artifacts = []
+        for key in keys:
+            logger.debug(f"Compressing s3://{BUCKET_NAME}/{key}")
+            try:
+                response = self.client.get_object(
+                    Bucket=BUCKET_NAME, Key=key, ExpectedBucketOwner=AWS_ACCOUNT_ID
+                )
+                with self.open_artifact(
+                    instance_id, finding_id, f"{key[len(staging) + 1 :]}.gz", compress=True
+                ) as writer:
+                    for chunk in response["Body"].iter_chunks(ARTIFACT_PART_SIZE):
+                        writer.write(chunk)
+            except botocore.exceptions.ClientError:
+                logger.exception(f"Failed to compress s3://{BUCKET_NAME}/{key}")
+                raise
+            artifacts.append(writer.artifact)
+
+        for batch in chunks(keys, MAX_DELETE_BATCH_SIZE):
+            try:
+                response = self.client.delete_objects(
+                    Bucket=BUCKET_NAME,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                    ExpectedBucketOwner=AWS_ACCOUNT_ID,
+                )
+            except botocore.exceptions.ClientError:
+                # the compressed copies are complete, the staged objects are only left behind
+                logger.exception(f"Failed to delete staged objects under {staging}/{key_prefix}")
+                continue
+            for error in response.get("Errors", []):
+                logger.warning(f"Failed to delete s3://{BUCKET_NAME}/{error['Key']}: {error}")
+
+        return artifacts
+
+    def list_objects(self, instance_id: str, finding_id: str, key_prefix: str) -> List[str]:
+        """
+        List the object keys under a key prefix for an incident
+        """
+
+        prefix = self.get_prefix(instance_id, finding_id)
+        return self._list_keys(f"{prefix}/{key_prefix}")
+
+    def list_staged_objects(self, instance_id: str, finding_id: str, key_prefix: str) -> List[str]:
+        """
+        List the staged object keys under a key prefix for an incident
+        """
+
+        staging = get_staging_prefix(self.get_prefix(instance_id, finding_id))
+        return self._list_keys(f"{staging}/{key_prefix}")
+
+    def _list_keys(self, prefix: str) -> List[str]:
         params = {
-            "ACL": "bucket-owner-full-control",
             "Bucket": BUCKET_NAME,
-            "Key": f"{prefix}/{key}",
-            "Metadata": {"instance_id": instance_id},
+            "Prefix": prefix,
             "ExpectedBucketOwner": AWS_ACCOUNT_ID,
         }
-        logger.debug(params)
-        params["Body"] = body  # the body is separate so its not logged
 
-        logger.debug(f"Uploading s3://{BUCKET_NAME}/{prefix}/{key}")
+        logger.debug(f"Listing s3://{BUCKET_NAME}/{prefix}")
         try:
-            self.client.put_object(**params)
-            logger.debug(f"Uploaded s3://{BUCKET_NAME}/{prefix}/{key}")
+            paginator = self.client.get_paginator("list_objects_v2")
+            keys = [
+                item["Key"]
+                for page in paginator.paginate(**params)
+                for item in page.get("Contents", [])
+            ]
+            logger.debug(f"Listed s3://{BUCKET_NAME}/{prefix}")
         except botocore.exceptions.ClientError:
-            logger.exception(f"Failed to upload s3://{BUCKET_NAME}/{prefix}/{key}")
+            logger.exception(f"Failed to list s3://{BUCKET_NAME}/{prefix}")
+            raise
+
+        return keys
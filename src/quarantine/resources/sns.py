@@ -20,32 +20,64 @@
 """
 
 import os
+from typing import Any, Dict, List, Optional, Tuple
 
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.utils import json_dumps
-from quarantine.constants import BOTO3_CONFIG
+from quarantine.utils import chunks, json_dumps
+from quarantine.resources.clients import get_client
+from quarantine.tracing import traced
 
 TOPIC_ARN = os.environ["NOTIFICATION_TOPIC_ARN"]
 
+# Maximum number of messages in a PublishBatch request
+MAX_BATCH_SIZE = 10
+
+# Protocols that receive the structured details of a message instead of its text
+STRUCTURED_PROTOCOLS = ("sqs", "lambda", "http", "https")
+
 logger = Logger(child=True)
 
 __all__ = ["SNS"]
 
 
+@traced
 class SNS:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("sns", config=BOTO3_CONFIG)
+        self.client = get_client(session, "sns")
+
+    def _message(
+        self,
+        instance_id: str,
+        message: str,
+        attributes: Optional[Dict[str, str]] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        body = {"default": message, "instance_id": instance_id}
+        if details is not None:
+            body.update({protocol: json_dumps(details) for protocol in STRUCTURED_PROTOCOLS})
+
+        # attributes let subscribers filter messages with a subscription filter policy
+        message_attributes = {"InstanceId": {"DataType": "String", "StringValue": instance_id}}
+        for name, value in (attributes or {}).items():
+            message_attributes[name] = {"DataType": "String", "StringValue": value}
 
-    def publish(self, instance_id: str, message: str) -> None:
-        params = {
-            "TopicArn": TOPIC_ARN,
-            "Message": json_dumps({"default": message, "instance_id": instance_id}),
+        return {
+            "Message": json_dumps(body),
             "MessageStructure": "json",
-            "MessageAttributes": {"InstanceId": {"DataType": "String", "StringValue": instance_id}},
+            "MessageAttributes": message_attributes,
         }
+
+    def publish(
+        self,
+        instance_id: str,
+        message: str,
+        attributes: Optional[Dict[str, str]] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        params = {"TopicArn": TOPIC_ARN, **self._message(instance_id, message, attributes, details)}
         logger.debug(params)
 
         logger.debug(f"Publishing message to topic {TOPIC_ARN}")
@@ -54,3 +86,25 @@ class SNS:
             logger.debug(f"Published message to topic {TOPIC_ARN}")
         except botocore.exceptions.ClientError:
             logger.exception(f"Failed to publish message to topic {TOPIC_ARN}")
+
+    def publish_batch(self, instance_id: str, messages: List[Tuple[str, Dict[str, str]]]) -> None:
+        """
+        Publish (message, attributes) pairs with as few requests as possible
+        """
+
+        for batch in chunks(messages, MAX_BATCH_SIZE):
+            entries = [
+                {"Id": str(index), **self._message(instance_id, message, attributes)}
+                for index, (message, attributes) in enumerate(batch)
+            ]
+
+            logger.debug(f"Publishing {len(entries)} messages to topic {TOPIC_ARN}")
+            try:
+                response = self.client.publish_batch(
+                    TopicArn=TOPIC_ARN, PublishBatchRequestEntries=entries
+                )
+                for failure in response.get("Failed", []):
+                    logger.error(f"Failed to publish message to topic {TOPIC_ARN}: {failure}")
+                logger.debug(f"Published {len(response.get('Successful', []))} messages")
+            except botocore.exceptions.ClientError:
+                logger.exception(f"Failed to publish messages to topic {TOPIC_ARN}")
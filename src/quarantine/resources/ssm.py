@@ -20,15 +20,17 @@
 """
 
 import os
-import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 from aws_lambda_powertools import Logger
 import boto3
 import botocore
 
-from quarantine.constants import SSM_DRAIN_TIME_SECS, BOTO3_CONFIG
-from quarantine.utils import get_prefix
+from quarantine.prefix_index import PrefixIndex
+from quarantine.resources.clients import get_client
+from quarantine.store import get_store
+from quarantine.tracing import traced
+from quarantine.utils import chunks, get_staging_prefix
 
 BUCKET_NAME = os.environ["ARTIFACT_BUCKET"]
 NOTIFICATION_TOPIC_ARN = os.environ["NOTIFICATION_TOPIC_ARN"]
@@ -37,10 +39,18 @@ logger = Logger(child=True)
 
 __all__ = ["SSM"]
 
+# Command invocation statuses after which the status will no longer change
+TERMINAL_STATUSES = {"Success", "Cancelled", "TimedOut", "Failed"}
 
+# Maximum number of instance IDs per DescribeInstanceInformation filter
+DESCRIBE_INSTANCE_INFORMATION_BATCH_SIZE = 50
+
+
+@traced
 class SSM:
     def __init__(self, session: boto3.Session) -> None:
-        self.client = session.client("ssm", config=BOTO3_CONFIG)
+        self.client = get_client(session, "ssm")
+        self.prefix_index = PrefixIndex(get_store(session))
 
     def describe_instance_information(self, instance_id: str) -> List[Dict[str, Any]]:
         """
@@ -59,12 +69,52 @@ class SSM:
 
         return response.get("InstanceInformationList", [])
 
-    def send_commands(self, instance_id: str, commands: List[str]) -> None:
+    def describe_instance_information_batch(
+        self, instance_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        Describe many SSM managed instances in as few requests as possible
+
+        Returns the instance information and the errors, each keyed by instance ID. Instances
+        that are not managed by SSM are omitted from both.
+        """
+
+        information: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, str] = {}
+
+        paginator = self.client.get_paginator("describe_instance_information")
+        for batch in chunks(instance_ids, DESCRIBE_INSTANCE_INFORMATION_BATCH_SIZE):
+            logger.info(f"Checking if {len(batch)} instances are managed by SSM")
+            try:
+                for page in paginator.paginate(Filters=[{"Key": "InstanceIds", "Values": batch}]):
+                    for item in page.get("InstanceInformationList", []):
+                        information[item["InstanceId"]] = item
+                logger.debug(f"Described SSM instance information for {len(batch)} instances")
+            except botocore.exceptions.ClientError as exc:
+                logger.exception(f"Failed to describe SSM instance information for {batch}")
+                errors.update({instance_id: str(exc) for instance_id in batch})
+
+        return information, errors
+
+    def is_online(self, instance_id: str) -> bool:
         """
-        Send commands through SSM to an instance
+        Check whether the SSM agent on an instance is reporting online
         """
 
-        prefix = get_prefix(instance_id)
+        return any(
+            information.get("PingStatus") == "Online"
+            for information in self.describe_instance_information(instance_id)
+        )
+
+    def send_commands(
+        self, instance_id: str, finding_id: str, commands: List[str], execution_timeout: int = 3600
+    ) -> str:
+        """
+        Send commands through SSM to an instance and return the command ID
+        """
+
+        # the output is compressed into the evidence of the incident once the command finished
+        prefix = get_staging_prefix(self.prefix_index.resolve(instance_id, finding_id))
 
         params = {
             "InstanceIds": [instance_id],
@@ -72,7 +122,7 @@ class SSM:
             "TimeoutSeconds": 240,
             "Parameters": {
                 "commands": commands,
-                "executionTimeout": ["3600"],
+                "executionTimeout": [str(execution_timeout)],
                 "workingDirectory": ["/tmp"],
             },
             "OutputS3BucketName": BUCKET_NAME,
@@ -98,17 +148,29 @@ class SSM:
             logger.exception(f"Failed to send SSM commands to {instance_id}")
             raise
 
-        command_id = response["Command"]["CommandId"]
+        return response["Command"]["CommandId"]
+
+    def get_command_status(self, command_id: str, instance_id: str) -> Optional[str]:
+        """
+        Return the status of a command invocation on an instance, or None if the invocation has
+        not been registered yet
+        """
 
-        waiter = self.client.get_waiter("command_executed")
         try:
-            # wait 60 seconds for all commands to execute
-            waiter.wait(
-                CommandId=command_id,
-                InstanceId=instance_id,
-                WaiterConfig={"Delay": 3, "MaxAttempts": 20},
+            response = self.client.get_command_invocation(
+                CommandId=command_id, InstanceId=instance_id
             )
-            logger.info(f"Waiting {SSM_DRAIN_TIME_SECS} seconds for SSM to complete uploads")
-            time.sleep(SSM_DRAIN_TIME_SECS)
-        except Exception:
-            logger.exception("SSM commands were queued, but failed to execute before timeout")
+        except self.client.exceptions.InvocationDoesNotExist:
+            return None
+        except botocore.exceptions.ClientError:
+            logger.exception(f"Failed to get SSM command {command_id} invocation on {instance_id}")
+            raise
+
+        return response["Status"]
+
+    def is_command_complete(self, command_id: str, instance_id: str) -> bool:
+        """
+        Check whether a command invocation has reached a terminal status
+        """
+
+        return self.get_command_status(command_id, instance_id) in TERMINAL_STATUSES
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from aws_lambda_powertools import Logger
+
+from quarantine.budget import plugin_scope
+from quarantine.checkpoint import Checkpoint
+from quarantine.constants import (
+    DEADLINE_CRITICAL_RESERVE_SECS,
+    DEADLINE_SAFETY_MARGIN_SECS,
+    PLUGIN_MAX_WORKERS,
+)
+from quarantine.deadline import Deadline, plugin_deadline
+from quarantine.instrumentation import PluginMetrics, plugin_metrics, publish_plugin_metrics
+from quarantine.manifest import get_spec
+from quarantine.plugins.abstract_plugin import COLLECT, CONTAIN, AbstractPlugin
+from quarantine.tracing import get_trace_entity, plugin_trace
+
+logger = Logger(child=True)
+
+__all__ = ["Scheduler"]
+
+
+class Scheduler:
+    """
+    Execute plugins on a thread pool, honoring the dependencies and conflicts declared on each
+    plugin class. With a single worker, plugins run one after another in the order given, moving
+    plugins after the plugins they depend on.
+
+    Containment comes first: the plugins of the contain phase and the plugins they depend on
+    (such as capturing volatile evidence before isolation) start before any other plugin, and
+    the collect phase only starts once they have all finished.
+
+    With a checkpoint, plugins that completed in a previous invocation for the same finding are
+    not executed again, and every plugin that completes without failing is recorded.
+
+    With a deadline (the end of the invocation), each plugin gets a time budget of at most its
+    manifest timeout from the time left. Non-critical plugins may not use the time reserved for
+    critical plugins that have not finished. Plugins that run out of time are cancelled at their
+    next API call and listed in `cancelled`.
+
+    The wall time, outcome and API calls of every executed plugin are published as metrics with
+    the finding type as a dimension, and traced in a subsegment of the caller's trace.
+
+    With `on_result`, the scheduler, each plugin and its message are passed to the callback as
+    soon as the plugin finishes, on the thread calling run().
+    """
+
+    def __init__(
+        self,
+        plugins: List[AbstractPlugin],
+        max_workers: int = PLUGIN_MAX_WORKERS,
+        checkpoint: Optional[Checkpoint] = None,
+        deadline: Optional[Deadline] = None,
+        finding_type: str = "",
+        on_result: Optional[Callable[["Scheduler", AbstractPlugin, Optional[str]], None]] = None,
+    ) -> None:
+        self.plugins = plugins
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.deadline = deadline
+        self.finding_type = finding_type
+        self.on_result = on_result
+
+        # plugins whose dependencies finished their work asynchronously
+        self.deferred: List[AbstractPlugin] = []
+
+        # non-critical plugins that ran out of API budget, retried once the others finish
+        self.starved: List[AbstractPlugin] = []
+
+        # plugins that were not started or did not finish before their time budget ran out
+        self.cancelled: List[AbstractPlugin] = []
+
+        # plugins that were not executed because they completed in a previous invocation
+        self.resumed: List[AbstractPlugin] = []
+
+        self.names = [plugin.name for plugin in plugins]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Duplicate plugin names: {self.names}")
+
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.conflicts: Dict[str, Set[str]] = {name: set() for name in self.names}
+
+        for plugin in plugins:
+            missing = set(plugin.depends_on) - set(self.names)
+            if missing:
+                logger.debug(
+                    f"Ignoring dependencies of {plugin.name} that are not loaded: {missing}"
+                )
+            self.dependencies[plugin.name] = set(plugin.depends_on) - missing
+
+            # conflicts are symmetric
+            for other in plugin.conflicts_with:
+                if other in self.conflicts:
+                    self.conflicts[plugin.name].add(other)
+                    self.conflicts[other].add(plugin.name)
+
+        self._check_cycles()
+
+        # the contain phase, including the plugins it depends on
+        self.contain_path: Set[str] = set()
+        stack = [plugin.name for plugin in plugins if plugin.phase == CONTAIN]
+        while stack:
+            name = stack.pop()
+            if name not in self.contain_path:
+                self.contain_path.add(name)
+                stack.extend(self.dependencies[name])
+
+        # time.monotonic() when each plugin finished
+        self.started: Optional[float] = None
+        self.finished: Dict[str, float] = {}
+
+        # trace entity of the thread calling run(), the parent of the plugin subsegments
+        self.trace_parent: Any = None
+
+    def _check_cycles(self) -> None:
+        """
+        Raise a ValueError if the declared dependencies contain a cycle
+        """
+
+        visiting: Set[str] = set()
+        visited: Set[str] = set()
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Plugin dependency cycle: {' -> '.join(path + (name,))}")
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency, path + (name,))
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.names:
+            visit(name, ())
+
+    def _defer_dependents(self, name: str, pending: List[AbstractPlugin]) -> None:
+        """
+        Move every pending plugin that (transitively) depends on a plugin into the deferred list
+
+        This includes containment plugins: isolation must not cut off an SSM command before it
+        has uploaded its output.
+        """
+
+        blocked = {name}
+        changed = True
+        while changed:
+            changed = False
+            for plugin in list(pending):
+                if self.dependencies[plugin.name] & blocked:
+                    logger.info(f"Deferring {plugin.name} until {name} completes")
+                    pending.remove(plugin)
+                    self.deferred.append(plugin)
+                    blocked.add(plugin.name)
+                    changed = True
+
+    def groups(self) -> Dict[str, List[List[str]]]:
+        """
+        Split the plugins of each phase into groups that can run independently of each other
+
+        Plugins that depend on or conflict with each other are in the same group, so each group
+        can be executed by its own scheduler (for example as a separate Step Functions task)
+        once the previous phase has finished. Groups list plugins in the order given.
+        """
+
+        phases = {
+            plugin.name: CONTAIN if plugin.name in self.contain_path else COLLECT
+            for plugin in self.plugins
+        }
+
+        # union-find over dependencies and conflicts within a phase
+        parents = {name: name for name in self.names}
+
+        def find(name: str) -> str:
+            while parents[name] != name:
+                parents[name] = parents[parents[name]]
+                name = parents[name]
+            return name
+
+        for name in self.names:
+            for other in self.dependencies[name] | self.conflicts[name]:
+                if phases[other] == phases[name]:
+                    parents[find(name)] = find(other)
+
+        groups: Dict[str, Dict[str, List[str]]] = {CONTAIN: {}, COLLECT: {}}
+        for name in self.names:
+            groups[phases[name]].setdefault(find(name), []).append(name)
+
+        return {phase: list(members.values()) for phase, members in groups.items()}
+
+    @property
+    def waiting(self) -> bool:
+        """
+        Whether plugins left work running (such as an SSM command), which plugins may have been
+        deferred until
+        """
+
+        return bool(self.deferred) or any(plugin.pending for plugin in self.plugins)
+
+    def succeeded_at(self, name: str) -> Optional[float]:
+        """
+        time.monotonic() when a plugin finished, if it executed in this invocation and did not
+        fail. None for plugins that failed, were cancelled or deferred, or completed in a previous
+        invocation.
+        """
+
+        for plugin in self.plugins:
+            if plugin.name == name:
+                if plugin.failed or plugin in self.resumed or plugin in self.cancelled:
+                    return None
+                return self.finished.get(name)
+        return None
+
+    def _containing(self, completed: Set[str]) -> bool:
+        """
+        Whether the contain phase still has plugins to run
+        """
+
+        deferred = {plugin.name for plugin in self.deferred}
+        return bool(self.contain_path - completed - deferred)
+
+    def _time_budget(self, plugin: AbstractPlugin) -> float:
+        """
+        Seconds a plugin may run for, from the time left before the deadline
+        """
+
+        if self.deadline is None:
+            return math.inf
+
+        budget = self.deadline.remaining() - DEADLINE_SAFETY_MARGIN_SECS
+        if not plugin.critical and any(
+            other.critical and other.name not in self.finished for other in self.plugins
+        ):
+            budget -= DEADLINE_CRITICAL_RESERVE_SECS
+
+        return min(budget, get_spec(plugin.name).timeout)
+
+    def _execute(self, plugin: AbstractPlugin) -> Optional[str]:
+        if self.checkpoint is not None:
+            completed = self.checkpoint.completed.get(plugin.name)
+            if completed is not None:
+                logger.info(f"Plugin {plugin.name} already completed, skipping")
+                plugin.output = completed["output"]
+                plugin.pending = completed["pending"]
+                self.resumed.append(plugin)
+                self.finished[plugin.name] = time.monotonic()
+                return None
+
+        # a starved plugin runs again, without the outcome of its previous attempt
+        plugin.failed = False
+        plugin.output = {}
+        plugin.pending = None
+
+        budget = self._time_budget(plugin)
+        if budget <= 0:
+            logger.warning(f"No time left to run plugin {plugin.name}, cancelling it")
+            plugin.failed = True
+            self.cancelled.append(plugin)
+            return None
+
+        phase = CONTAIN if plugin.name in self.contain_path else COLLECT
+        started = time.monotonic()
+        raised = True
+        # unbound if entering one of the contexts raises
+        deadline: Optional[Deadline] = None
+        api: Optional[PluginMetrics] = None
+        try:
+            with (
+                plugin_scope(plugin.critical) as scope,
+                plugin_deadline(budget) as deadline,
+                plugin_metrics() as api,
+                plugin_trace(
+                    plugin.name, phase, plugin.instance_id, plugin.finding_id, self.trace_parent
+                ),
+            ):
+                message = plugin.execute()
+            raised = False
+        finally:
+            self.finished[plugin.name] = time.monotonic()
+            publish_plugin_metrics(
+                plugin.name,
+                phase,
+                self.finding_type,
+                self.finished[plugin.name] - started,
+                raised or plugin.failed or (deadline is not None and deadline.cancelled),
+                api,
+            )
+
+        if deadline.cancelled:
+            logger.warning(f"Plugin {plugin.name} ran out of time and was cancelled")
+            plugin.failed = True
+            self.cancelled.append(plugin)
+        elif scope.exhausted:
+            logger.info(f"Plugin {plugin.name} ran out of API budget")
+            self.starved.append(plugin)
+        elif self.checkpoint is not None and not plugin.failed:
+            self.checkpoint.record(plugin.name, plugin.output, plugin.pending)
+
+        return message
+
+    def _retry_starved(self, results: List[Tuple[AbstractPlugin, Optional[str]]]) -> None:
+        """
+        Execute the plugins that ran out of API budget once more, after every other plugin
+        """
+
+        starved, self.starved = self.starved, []
+        for plugin in starved:
+            logger.info(f"Retrying plugin {plugin.name}")
+            results[:] = [result for result in results if result[0] is not plugin]
+            self._finish(results, plugin, self._execute(plugin))
+
+    def _finish(
+        self,
+        results: List[Tuple[AbstractPlugin, Optional[str]]],
+        plugin: AbstractPlugin,
+        message: Optional[str],
+    ) -> None:
+        results.append((plugin, message))
+        # a starved plugin is reported once it has been retried
+        if self.on_result is not None and plugin not in self.starved:
+            self.on_result(self, plugin, message)
+
+    def run(self) -> List[Tuple[AbstractPlugin, Optional[str]]]:
+        """
+        Execute all plugins and return (plugin, message) pairs in completion order.
+
+        A plugin that raises does not prevent its dependents from running; the first exception
+        is re-raised once every plugin has finished. Plugins that depend on a plugin which left
+        work pending are not executed and are listed in `deferred` instead. Non-critical plugins
+        that ran out of API budget are retried once at the end, so containment is not delayed.
+        """
+
+        self.started = time.monotonic()
+        self.trace_parent = get_trace_entity()
+
+        if self.max_workers <= 1:
+            results = self._run_sequential()
+            self._retry_starved(results)
+            return results
+
+        results: List[Tuple[AbstractPlugin, Optional[str]]] = []
+        errors: List[BaseException] = []
+
+        pending = list(self.plugins)
+        running: Dict[Future, AbstractPlugin] = {}
+        completed: Set[str] = set()
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="plugin"
+        ) as executor:
+            while pending or running:
+                running_names = {plugin.name for plugin in running.values()}
+                containing = self._containing(completed)
+                for plugin in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if containing and plugin.name not in self.contain_path:
+                        continue
+                    if not self.dependencies[plugin.name] <= completed:
+                        continue
+                    if self.conflicts[plugin.name] & running_names:
+                        continue
+
+                    logger.debug(f"Starting plugin {plugin.name}")
+                    pending.remove(plugin)
+                    running[executor.submit(self._execute, plugin)] = plugin
+                    running_names.add(plugin.name)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    plugin = running.pop(future)
+                    completed.add(plugin.name)
+                    try:
+                        self._finish(results, plugin, future.result())
+                        logger.debug(f"Finished plugin {plugin.name}")
+                    except Exception as exc:
+                        logger.exception(f"Plugin {plugin.name} raised an exception")
+                        errors.append(exc)
+
+                    if plugin.pending:
+                        self._defer_dependents(plugin.name, pending)
+
+        if errors:
+            raise errors[0]
+
+        self._retry_starved(results)
+        return results
+
+    def _run_sequential(self) -> List[Tuple[AbstractPlugin, Optional[str]]]:
+        results: List[Tuple[AbstractPlugin, Optional[str]]] = []
+
+        # the contain phase first, otherwise in the order given
+        pending = sorted(self.plugins, key=lambda plugin: plugin.name not in self.contain_path)
+        completed: Set[str] = set()
+        while pending:
+            plugin = next(
+                (plugin for plugin in pending if self.dependencies[plugin.name] <= completed),
+                pending[0],
+            )
+            pending.remove(plugin)
+            self._finish(results, plugin, self._execute(plugin))
+            completed.add(plugin.name)
+            if plugin.pending:
+                self._defer_dependents(plugin.name, pending)
+
+        return results
@@ -38,3 +38,34 @@ INPUT = {
     },
     "required": ["resource"],
 }
+
+PLUGIN_INPUT = {
+    "$schema": "http://json-schema.org/draft-07/schema",
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["plan", "run", "finalize", "release"]},
+        "finding": INPUT,
+        "owner": {"type": "string"},
+        "started": {"type": "string"},
+        "group": {
+            "type": "object",
+            "properties": {
+                "plugins": {"type": "array", "items": {"type": "string"}},
+                "timeout": {"type": "integer", "minimum": 1},
+            },
+            "required": ["plugins", "timeout"],
+        },
+    },
+    "required": ["action", "finding"],
+    "allOf": [
+        {
+            # every action after the plan needs the owner returned by the plan
+            "if": {"properties": {"action": {"not": {"const": "plan"}}}},
+            "then": {"required": ["owner"]},
+        },
+        {
+            "if": {"properties": {"action": {"const": "run"}}},
+            "then": {"required": ["group"]},
+        },
+    ],
+}
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from abc import ABC, abstractmethod
+import copy
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import boto3
+
+from quarantine.constants import STATE_TABLE
+
+__all__ = ["AbstractStore", "MemoryStore", "get_store"]
+
+
+class AbstractStore(ABC):
+    """
+    Key-value store for state shared between concurrent quarantine invocations.
+
+    Every item carries a `version` maintained by the store. Writes are conditional on the version
+    the caller last read, so concurrent read-modify-write cycles never overwrite each other: the
+    loser gets `False` back and must read again. Items with a `ttl` (epoch seconds) in the past
+    are treated as absent.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the item stored under a key, or None if there is no unexpired item
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(
+        self, key: str, item: Dict[str, Any], version: Optional[int] = None, overwrite: bool = False
+    ) -> bool:
+        """
+        Store an item if the current version matches
+
+        A version of None only succeeds if there is no unexpired item under the key. Returns
+        whether the item was written. With `overwrite` the item is replaced unconditionally and
+        its version restarts, which is only meant for items never updated conditionally.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        """
+        Delete an item, only if its version matches when one is given
+        """
+        raise NotImplementedError
+
+
+class MemoryStore(AbstractStore):
+    """
+    In-process store, used when no state table is configured and for local testing.
+
+    State is only shared between invocations running in the same container.
+    """
+
+    def __init__(self) -> None:
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _current(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._items.get(key)
+        if item is not None and item.get("ttl") is not None and item["ttl"] <= time.time():
+            del self._items[key]
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._current(key))
+
+    def put(
+        self, key: str, item: Dict[str, Any], version: Optional[int] = None, overwrite: bool = False
+    ) -> bool:
+        with self._lock:
+            current = self._current(key)
+            current_version = current["version"] if current is not None else None
+            if overwrite:
+                version = None
+            elif current_version != version:
+                return False
+
+            item = copy.deepcopy(item)
+            item["version"] = (version or 0) + 1
+            self._items[key] = item
+            return True
+
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        with self._lock:
+            current = self._current(key)
+            if current is None or (version is not None and current["version"] != version):
+                return False
+
+            del self._items[key]
+            return True
+
+
+_MEMORY_STORE = MemoryStore()
+
+
+def get_store(session: boto3.Session) -> AbstractStore:
+    """
+    Return the DynamoDB state table if one is configured, otherwise the in-process store
+    """
+
+    if STATE_TABLE:
+        from quarantine.resources.dynamodb import DynamoDB
+
+        return DynamoDB(session, STATE_TABLE)
+
+    return _MEMORY_STORE
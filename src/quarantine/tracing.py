@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+from aws_lambda_powertools import Logger, Tracer
+
+logger = Logger(child=True)
+
+__all__ = [
+    "get_trace_entity",
+    "plugin_trace",
+    "register_tracing",
+    "set_trace_entity",
+    "traced",
+    "tracer",
+]
+
+# Disabled outside Lambda and with POWERTOOLS_TRACE_DISABLED, in which case nothing below opens
+# subsegments or registers hooks
+tracer = Tracer()
+
+T = TypeVar("T")
+
+
+class _Span:
+    """
+    AWS API calls made within a subsegment, counted into every enclosing span
+    """
+
+    # spans are shared with the threads started within them, which count into them concurrently
+    _lock = threading.Lock()
+
+    def __init__(self, parent: Optional["_Span"], instance_id: Any, finding_id: Any) -> None:
+        self.parent = parent
+        self.instance_id = instance_id or (parent.instance_id if parent else None)
+        self.finding_id = finding_id or (parent.finding_id if parent else None)
+        self.calls = 0
+        self.retries = 0
+        self.throttled = False
+
+        # the subsegment of the span and the thread that opened it
+        self.subsegment: Any = None
+        self.thread = threading.get_ident()
+
+    def record(self, retries: int, throttled: bool) -> None:
+        with self._lock:
+            span: Optional[_Span] = self
+            while span is not None:
+                span.calls += 1
+                span.retries += retries
+                span.throttled = span.throttled or throttled
+                span = span.parent
+
+
+# Innermost span on the current thread, inherited by the threads started within it with
+# ContextThreadPoolExecutor
+_SPAN: contextvars.ContextVar[Optional[_Span]] = contextvars.ContextVar("span", default=None)
+
+
+@contextmanager
+def _span(
+    operation: str, instance_id: Any = None, finding_id: Any = None, **annotations: Any
+) -> Iterator[_Span]:
+    parent = _SPAN.get()
+    if parent is not None and parent.thread != threading.get_ident():
+        # started on a worker thread, which has no open subsegment of its own
+        set_trace_entity(parent.subsegment)
+
+    span = _Span(parent, instance_id, finding_id)
+    token = _SPAN.set(span)
+    try:
+        with tracer.provider.in_subsegment(f"## {operation}") as subsegment:
+            span.subsegment = subsegment
+            try:
+                yield span
+            finally:
+                if subsegment is not None:
+                    annotations.update(
+                        operation=operation,
+                        instance_id=span.instance_id,
+                        finding_id=span.finding_id,
+                        api_calls=span.calls,
+                        retries=span.retries,
+                        throttled=span.throttled,
+                    )
+                    for key, value in annotations.items():
+                        # X-Ray only accepts strings, numbers and booleans
+                        if isinstance(value, (str, int, float, bool)):
+                            subsegment.put_annotation(key, value)
+    finally:
+        _SPAN.reset(token)
+
+
+def get_trace_entity() -> Any:
+    """
+    Segment or subsegment open on the current thread, to pass to plugin_trace() on a worker
+    """
+
+    if tracer.disabled:
+        return None
+    return tracer.provider.get_trace_entity()
+
+
+def set_trace_entity(entity: Any) -> None:
+    """
+    Continue the trace of another thread on the current thread
+
+    X-Ray keeps the open subsegments per thread, so work submitted to a thread pool needs the
+    entity of the thread that submitted it to appear under it rather than as a sibling of the
+    function segment.
+    """
+
+    if entity is not None and tracer.provider.get_trace_entity() is not entity:
+        tracer.provider.set_trace_entity(entity)
+
+
+@contextmanager
+def plugin_trace(
+    plugin: str, phase: str, instance_id: str, finding_id: str, parent: Any = None
+) -> Iterator[None]:
+    """
+    Trace the execution of a plugin in a subsegment of `parent`, the entity returned by
+    get_trace_entity() on the thread that started the plugin
+    """
+
+    if tracer.disabled:
+        yield
+        return
+
+    set_trace_entity(parent)
+
+    with _span(f"{plugin}.execute", instance_id, finding_id, plugin=plugin, phase=phase):
+        yield
+
+
+def _argument(parameters: List[str], name: str) -> Callable[[tuple, dict], Any]:
+    index = parameters.index(name) if name in parameters else None
+
+    def get(args: tuple, kwargs: dict) -> Any:
+        if name in kwargs:
+            return kwargs[name]
+        if index is not None and index < len(args):
+            return args[index]
+        return None
+
+    return get
+
+
+def _trace_method(owner: str, method: Callable) -> Callable:
+    operation = f"{owner}.{method.__name__}"
+    parameters = list(inspect.signature(method).parameters)
+    instance_id = _argument(parameters, "instance_id")
+    finding_id = _argument(parameters, "finding_id")
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with _span(operation, instance_id(args, kwargs), finding_id(args, kwargs)):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def traced(cls: T) -> T:
+    """
+    Class decorator tracing every public method of a resource in its own subsegment
+
+    The subsegment is annotated with the operation (such as EC2.describe_instances), the
+    instance and finding it concerns (from the arguments of the method or the plugin calling
+    it), and the number of API calls, retries and whether any call was throttled. Generator
+    methods are not traced, their subsegment would close before they are consumed. When tracing
+    is disabled the class is returned unchanged.
+    """
+
+    if tracer.disabled:
+        return cls
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(member):
+            continue
+        if inspect.isgeneratorfunction(member):
+            continue
+        setattr(cls, name, _trace_method(cls.__name__, member))
+
+    return cls
+
+
+def register_tracing(client: Any, service_name: str) -> None:
+    """
+    Count every call made by a boto3 client, with its retries and whether it was throttled, in
+    the spans open on the calling thread
+
+    Must be registered after the rate limiter, which flags throttled calls in their context.
+    The calls themselves are traced by the botocore patch of the tracer.
+    """
+
+    if tracer.disabled:
+        return
+
+    def after_call(context: Any = None, **kwargs: Any) -> None:
+        span = _SPAN.get()
+        if span is None:
+            return
+        context = context or {}
+        # the first attempt is attempt 1
+        retries = max(context.get("retries", {}).get("attempt", 1) - 1, 0)
+        span.record(retries, bool(context.get("throttled")))
+
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("after-call-error", after_call)
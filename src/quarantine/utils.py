@@ -19,13 +19,44 @@
 * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
 import datetime
+import hashlib
 import json
-from typing import Any
+import time
+from typing import Any, Callable, Iterator, List, Optional, Sequence, TypeVar
 
 from aws_lambda_powertools.shared.json_encoder import Encoder
 
-__all__ = ["json_dumps", "get_prefix", "now"]
+from quarantine.constants import ARTIFACT_KEY_LAYOUT, ARTIFACT_KEY_SHARD_WIDTH
+from quarantine.deadline import remaining as time_left
+
+__all__ = [
+    "ContextThreadPoolExecutor",
+    "chunks",
+    "json_dumps",
+    "json_iterencode",
+    "get_prefix",
+    "get_staging_prefix",
+    "now",
+    "wait_until",
+]
+
+T = TypeVar("T")
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool running each task in a copy of the context of the thread that submitted it
+
+    Threads do not inherit context variables, which hold the API budget scope, deadline, metrics
+    and trace span of the plugin running on a thread. Work a plugin hands to this pool is
+    budgeted, cancelled, counted and traced as its own.
+    """
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
 
 
 class DateTimeEncoder(Encoder):
@@ -41,12 +72,46 @@ def json_dumps(obj: Any) -> str:
     return json.dumps(obj, indent=None, sort_keys=True, separators=(",", ":"), cls=DateTimeEncoder)
 
 
-def get_prefix(instance_id: str) -> str:
-    # now = datetime.datetime.now(tz=datetime.timezone.utc).strftime(
-    #    "year=%Y/month=%m/day=%d/hour=%H"
-    # )
-    # return f"{now}/{instance_id}"
-    return instance_id
+def json_iterencode(obj: Any) -> Iterator[str]:
+    """
+    Encode an object like json_dumps, in chunks so the whole document is never held in memory
+    """
+
+    encoder = DateTimeEncoder(indent=None, sort_keys=True, separators=(",", ":"))
+    return encoder.iterencode(obj)
+
+
+def get_prefix(
+    instance_id: str, finding_id: str, started: Optional[datetime.datetime] = None
+) -> str:
+    """
+    Return the key prefix of the artifacts of an incident in `ARTIFACT_KEY_LAYOUT`
+
+    Use quarantine.prefix_index to find the prefix of an existing incident, it depends on when
+    the incident started.
+    """
+
+    if started is None:
+        started = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    shard = hashlib.sha256(instance_id.encode("utf-8")).hexdigest()[:ARTIFACT_KEY_SHARD_WIDTH]
+    return ARTIFACT_KEY_LAYOUT.format(
+        shard=shard,
+        year=started.strftime("%Y"),
+        month=started.strftime("%m"),
+        day=started.strftime("%d"),
+        hour=started.strftime("%H"),
+        instance_id=instance_id,
+        finding_id=finding_id,
+    ).strip("/")
+
+
+def get_staging_prefix(prefix: str) -> str:
+    """
+    Return the key prefix of the objects of an incident that are written by other services, such
+    as SSM command output, before they are compressed into its evidence
+    """
+    return f"staging/{prefix}"
 
 
 def now() -> str:
@@ -59,3 +124,41 @@ def now() -> str:
         .isoformat()
         .replace("+00:00", "Z")
     )
+
+
+def wait_until(
+    predicate: Callable[[], bool],
+    timeout: float,
+    delay: float = 0.5,
+    max_delay: float = 5.0,
+    backoff: float = 2.0,
+) -> bool:
+    """
+    Poll a predicate with exponential backoff until it returns True or the timeout (in seconds)
+    expires. Returns whether the predicate was satisfied. A plugin never waits past its deadline.
+    """
+
+    remaining = time_left()
+    if remaining is not None:
+        timeout = min(timeout, remaining)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        if predicate():
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * backoff, max_delay)
+
+
+def chunks(items: Sequence[T], size: int) -> Iterator[List[T]]:
+    """
+    Split a sequence into lists of at most `size` items
+    """
+
+    for start in range(0, len(items), size):
+        yield list(items[start : start + size])
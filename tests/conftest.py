@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+
+# configuration read by quarantine.constants when it is first imported, the tests never reach AWS
+os.environ.update(
+    ARTIFACT_BUCKET="bucket",
+    AWS_ACCOUNT_ID="123456789012",
+    AWS_DEFAULT_REGION="us-east-1",
+    AWS_ACCESS_KEY_ID="testing",
+    AWS_SECRET_ACCESS_KEY="testing",
+    EC2_INSTANCE_PROFILE_ARN="arn:aws:iam::123456789012:instance-profile/ssm",
+    NOTIFICATION_TOPIC_ARN="arn:aws:sns:us-east-1:123456789012:topic",
+    POWERTOOLS_METRICS_NAMESPACE="test",
+    POWERTOOLS_TRACE_DISABLED="1",
+    SSM_ROLE_ARN="arn:aws:iam::123456789012:role/ssm",
+)
+os.environ.pop("STATE_TABLE", None)
+
+from typing import Any, Callable, List, Tuple  # noqa: E402
+
+import boto3  # noqa: E402
+from botocore.awsrequest import AWSResponse  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def session() -> boto3.Session:
+    """
+    A new session, so clients created by the test are not shared with other tests
+    """
+
+    return boto3.Session(region_name="us-east-1")
+
+
+class LambdaContext:
+    function_name = "quarantine"
+    function_version = "$LATEST"
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:quarantine"
+    memory_limit_in_mb = 256
+    aws_request_id = "52fdfc07-2182-154f-163f-5f0f9a621d72"
+    log_group_name = "/aws/lambda/quarantine"
+    log_stream_name = "2026/01/01/[$LATEST]0123456789abcdef"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 60000
+
+
+@pytest.fixture
+def lambda_context() -> LambdaContext:
+    return LambdaContext()
+
+
+class _Raw:
+    """
+    Minimal urllib3 response, AWSResponse only streams its body
+    """
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, **kwargs: Any) -> Any:
+        yield self.body
+
+
+@pytest.fixture
+def http_stub() -> Callable[[Any, str, List[Tuple[int, bytes]]], List[Any]]:
+    """
+    Answer the calls of an operation with raw HTTP responses, in order
+
+    Unlike Stubber, whose responses bypass the retry handler, the responses go through retries
+    and every handler registered on the client. Returns the list of requests sent.
+    """
+
+    def stub(client: Any, operation: str, responses: List[Tuple[int, bytes]]) -> List[Any]:
+        sent = []
+
+        def send(request: Any, **kwargs: Any) -> AWSResponse:
+            sent.append(request)
+            status_code, body = responses.pop(0)
+            return AWSResponse(request.url, status_code, {}, _Raw(body))
+
+        service = client.meta.service_model.service_name
+        client.meta.events.register(f"before-send.{service}.{operation}", send)
+        return sent
+
+    return stub
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+import pytest
+
+from quarantine import budget
+from quarantine.budget import ApiBudget, BudgetExhausted, plugin_scope
+from quarantine.constants import BUDGET_WINDOW_SECS
+from quarantine.store import MemoryStore
+from quarantine.utils import ContextThreadPoolExecutor
+
+API = "ec2.CreateSnapshot"
+
+
+def _spend(store, critical):
+    """
+    Use up the budget of the current window
+    """
+
+    api_budget = ApiBudget(store, "123456789012")
+    window = int(time.time() // BUDGET_WINDOW_SECS)
+    key = f"budget#123456789012#{API}#{window}"
+    store.put(key, {"used": api_budget._capacity(API, critical)}, overwrite=True)
+    return api_budget
+
+
+@pytest.fixture(autouse=True)
+def frozen(monkeypatch):
+    """
+    Stay in the same budget window and give up waiting for budget at once
+    """
+
+    monkeypatch.setattr(time, "time", lambda: 1700000000.5)
+    monkeypatch.setattr(budget, "BUDGET_MAX_WAIT_SECS", 0)
+
+
+def test_forensic_call_gives_up_without_budget():
+    api_budget = _spend(MemoryStore(), critical=False)
+
+    with pytest.raises(BudgetExhausted):
+        api_budget.acquire(API, critical=False)
+
+
+def test_containment_call_proceeds_without_budget(monkeypatch):
+    api_budget = _spend(MemoryStore(), critical=True)
+
+    # containment calls do not wait for a later window
+    monkeypatch.setattr(budget, "BUDGET_MAX_WAIT_SECS", 10)
+    monkeypatch.setattr(time, "sleep", lambda _: pytest.fail("containment call waited"))
+    api_budget.acquire(API, critical=True)
+
+
+def test_scope_inherited_by_plugin_threads():
+    with plugin_scope(critical=False) as scope:
+        with ContextThreadPoolExecutor(max_workers=2) as executor:
+            scopes = list(executor.map(lambda _: budget._SCOPE.get(), range(2)))
+
+    assert scopes == [scope, scope]
+    assert budget._SCOPE.get() is None
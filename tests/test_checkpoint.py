@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import pytest
+
+from quarantine.checkpoint import Checkpoint
+from quarantine.plugins.abstract_plugin import AbstractPlugin
+from quarantine.scheduler import Scheduler
+from quarantine.store import MemoryStore
+
+INSTANCE_ID = "i-0000000000000000a"
+
+# names of the plugins executed, in order
+executed = []
+
+
+class RecordingPlugin(AbstractPlugin):
+    def execute(self):
+        executed.append(self.name)
+        self.output = {"ran": self.name}
+        return f"{self.name} done"
+
+
+class First(RecordingPlugin):
+    pass
+
+
+class Second(RecordingPlugin):
+    depends_on = ("First",)
+
+
+class Flaky(RecordingPlugin):
+    depends_on = ("Second",)
+
+    # whether the invocation fails
+    fail = False
+
+    def execute(self):
+        super().execute()
+        if Flaky.fail:
+            raise RuntimeError("invocation failed")
+        return f"{self.name} done"
+
+
+def _run(session, store, max_workers):
+    plugins = [cls(session, INSTANCE_ID, "f1") for cls in (First, Second, Flaky)]
+    checkpoint = Checkpoint(store, INSTANCE_ID, "f1")
+    scheduler = Scheduler(plugins, max_workers=max_workers, checkpoint=checkpoint)
+    return scheduler, scheduler.run()
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_resumed_plugins_are_not_executed_again(monkeypatch, session, max_workers):
+    executed.clear()
+    store = MemoryStore()
+
+    monkeypatch.setattr(Flaky, "fail", True)
+    with pytest.raises(RuntimeError, match="invocation failed"):
+        _run(session, store, max_workers)
+    assert executed == ["First", "Second", "Flaky"]
+
+    executed.clear()
+    monkeypatch.setattr(Flaky, "fail", False)
+    scheduler, results = _run(session, store, max_workers)
+
+    assert executed == ["Flaky"]
+    assert [plugin.name for plugin in scheduler.resumed] == ["First", "Second"]
+    # the outputs recorded by the failed invocation are restored
+    assert [plugin.output for plugin in scheduler.resumed] == [{"ran": "First"}, {"ran": "Second"}]
+    assert [(plugin.name, message) for plugin, message in results if message] == [
+        ("Flaky", "Flaky done")
+    ]
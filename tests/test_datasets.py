@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from quarantine.datasets import iter_lines, parse_command_output
+
+# output of the SSM commands recorded on an Amazon Linux instance
+COMMAND_OUTPUT = """\
+Linux ip-10-0-0-5.ec2.internal 6.1.102-108.177.amzn2023.x86_64 #1 SMP x86_64 GNU/Linux
+root
+Active Internet connections (servers and established)
+Proto Recv-Q Send-Q Local Address           Foreign Address         State       PID/Program name
+tcp        0      0 0.0.0.0:22              0.0.0.0:*               LISTEN      1034/sshd: /usr/sbi
+tcp        0     36 10.0.0.5:22             10.0.0.9:51234          ESTABLISHED 2211/sshd: ec2-user
+tcp6       0      0 :::22                   :::*                    LISTEN      1034/sshd: /usr/sbi
+udp        0      0 127.0.0.1:323           0.0.0.0:*                           812/chronyd
+udp6       0      0 ::1:323                 :::*                                812/chronyd
+udp        0      0 10.0.0.5:68             0.0.0.0:*                           -
+Active UNIX domain sockets (servers and established)
+Proto RefCnt Flags       Type       State         I-Node   PID/Program name     Path
+unix  2      [ ACC ]     STREAM     LISTENING     15843    1/systemd            /run/systemd/private
+COMMAND     PID   TID TASKCMD   USER        FD TYPE        DEVICE SIZE/OFF     NODE NAME
+systemd       1                 root       cwd DIR          202,1      224       64 /
+chronyd     812                 chrony      5u IPv4         17920      0t0      UDP 127.0.0.1:323
+chronyd     812                 chrony      6u IPv6         17921      0t0      UDP [::1]:323
+sshd       1034                 root        4u IPv6         18433      0t0      TCP *:22 (LISTEN)
+sshd       2211                 root        4u IPv4         25110      0t0      TCP 10.0.0.5:22->10.0.0.9:51234 (ESTABLISHED)
+amazon-ss  1201  1250 amazon-ss root        9u IPv6         21002      0t0      TCP [2600:1f18::5]:40112->[2600:1f18::1]:443 (ESTABLISHED)
+bash       3001                 ec2-user  255u CHR          136,0      0t0        3 /dev/pts/0
+"""
+
+
+def _records(dataset):
+    lines = iter_lines([COMMAND_OUTPUT.encode("utf-8")])
+    return [record for name, record in parse_command_output(lines) if name == dataset]
+
+
+def test_netstat_rows():
+    records = _records("netstat")
+
+    # UNIX domain sockets are skipped
+    assert len(records) == 6
+    assert records[1] == {
+        "protocol": "tcp",
+        "recv_q": 0,
+        "send_q": 36,
+        "local_address": "10.0.0.5",
+        "local_port": 22,
+        "foreign_address": "10.0.0.9",
+        "foreign_port": 51234,
+        "state": "ESTABLISHED",
+        "pid": 2211,
+        "program": "sshd: ec2-user",
+    }
+
+
+def test_netstat_program_names_with_spaces():
+    assert [record["program"] for record in _records("netstat")[:3]] == [
+        "sshd: /usr/sbi",
+        "sshd: ec2-user",
+        "sshd: /usr/sbi",
+    ]
+
+
+def test_netstat_udp_rows_without_state():
+    udp = [record for record in _records("netstat") if record["protocol"].startswith("udp")]
+
+    assert [(record["state"], record["pid"], record["program"]) for record in udp] == [
+        (None, 812, "chronyd"),
+        (None, 812, "chronyd"),
+        (None, None, None),
+    ]
+
+
+def test_netstat_ipv6_addresses():
+    tcp6, udp6 = [record for record in _records("netstat") if record["protocol"].endswith("6")]
+
+    assert (tcp6["local_address"], tcp6["local_port"]) == ("::", 22)
+    assert (tcp6["foreign_address"], tcp6["foreign_port"]) == ("::", None)
+    assert (udp6["local_address"], udp6["local_port"]) == ("::1", 323)
+
+
+def test_lsof_columns_aligned_by_header():
+    records = _records("lsof")
+
+    assert len(records) == 7
+    # the empty TID and TASKCMD columns of processes do not shift the other values
+    assert records[0] == {
+        "command": "systemd",
+        "pid": 1,
+        "tid": None,
+        "taskcmd": None,
+        "user": "root",
+        "fd": "cwd",
+        "type": "DIR",
+        "device": "202,1",
+        "size_off": "224",
+        "node": "64",
+        "name": "/",
+    }
+    # threads fill them
+    assert (records[5]["tid"], records[5]["taskcmd"], records[5]["user"]) == (
+        1250,
+        "amazon-ss",
+        "root",
+    )
+    # values wider than their title
+    assert (records[6]["user"], records[6]["fd"]) == ("ec2-user", "255u")
+
+
+def test_lsof_network_files():
+    records = {(record["pid"], record["fd"]): record for record in _records("lsof")}
+
+    udp = records[(812, "5u")]
+    assert (udp["local_address"], udp["local_port"], udp["remote_address"], udp["state"]) == (
+        "127.0.0.1",
+        323,
+        None,
+        None,
+    )
+
+    listening = records[(1034, "4u")]
+    assert (listening["local_address"], listening["local_port"], listening["state"]) == (
+        None,
+        22,
+        "LISTEN",
+    )
+
+    ipv6 = records[(1201, "9u")]
+    assert (ipv6["local_address"], ipv6["local_port"]) == ("2600:1f18::5", 40112)
+    assert (ipv6["remote_address"], ipv6["remote_port"]) == ("2600:1f18::1", 443)
+    assert ipv6["state"] == "ESTABLISHED"
+    assert records[(812, "6u")]["local_address"] == "::1"
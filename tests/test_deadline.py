@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+import pytest
+
+from quarantine.deadline import DeadlineExceeded, plugin_deadline, remaining
+from quarantine.resources.clients import get_client
+from quarantine.utils import ContextThreadPoolExecutor
+
+THROTTLED = (
+    b"<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+    b"<Message>Request limit exceeded.</Message></Error></Errors>"
+    b"<RequestID>ab0ea6a2-3a1b-4c6d-9e1f-0123456789ab</RequestID></Response>"
+)
+
+
+def _describe(client):
+    return client.describe_instances(InstanceIds=["i-0123456789abcdef0"])
+
+
+def test_call_cancelled_past_deadline(session, http_stub):
+    client = get_client(session, "ec2")
+    sent = http_stub(client, "DescribeInstances", [])
+
+    with plugin_deadline(0) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            _describe(client)
+
+    assert deadline.cancelled
+    assert sent == []
+
+
+def test_call_cancelled_in_plugin_thread(session, http_stub):
+    client = get_client(session, "ec2")
+    sent = http_stub(client, "DescribeInstances", [])
+
+    with plugin_deadline(0) as deadline:
+        with ContextThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(_describe, client)
+            with pytest.raises(DeadlineExceeded):
+                future.result()
+
+    assert deadline.cancelled
+    assert sent == []
+
+
+def test_remaining_in_plugin_thread():
+    with plugin_deadline(30):
+        with ContextThreadPoolExecutor(max_workers=1) as executor:
+            left = executor.submit(remaining).result()
+
+    assert 0 < left <= 30
+    assert remaining() is None
+
+
+def test_throttled_call_not_retried_past_deadline(session, http_stub):
+    client = get_client(session, "ec2")
+    # the first attempt outlasts the deadline, further attempts would fail the test
+    sent = http_stub(client, "DescribeInstances", [(503, THROTTLED)])
+    client.meta.events.register_first(
+        "before-send.ec2.DescribeInstances", lambda **kwargs: time.sleep(0.2)
+    )
+
+    with plugin_deadline(0.1) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            _describe(client)
+
+    assert deadline.cancelled
+    assert len(sent) == 1
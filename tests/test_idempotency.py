@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.stub import Stubber
+import pytest
+
+from quarantine import lambda_handler
+from quarantine.context import InstanceContext
+from quarantine.idempotency import IN_PROGRESS, QUARANTINED, QuarantineGuard
+from quarantine.resources import EC2
+from quarantine.resources.clients import get_client
+from quarantine.store import MemoryStore, get_store
+
+INSTANCE_ID = "i-0123456789abcdef0"
+
+
+def _instance(quarantined=False):
+    instance = {"InstanceId": INSTANCE_ID, "Tags": [], "NetworkInterfaces": []}
+    if quarantined:
+        instance["Tags"] = [{"Key": "SOC-Status", "Value": "quarantined"}]
+        instance["NetworkInterfaces"] = [
+            {"Groups": [{"GroupName": f"quarantine-{INSTANCE_ID}-1700000000"}]}
+        ]
+    return instance
+
+
+def test_duplicate_finding_skipped():
+    store = MemoryStore()
+
+    assert QuarantineGuard(store, INSTANCE_ID, "f1").acquire(_instance()) is None
+
+    # another finding, and the same finding delivered again, while the quarantine runs
+    assert QuarantineGuard(store, INSTANCE_ID, "f2").acquire(_instance()) == IN_PROGRESS
+    assert QuarantineGuard(store, INSTANCE_ID, "f1").acquire(_instance()) == IN_PROGRESS
+
+    assert store.get(f"quarantine#{INSTANCE_ID}")["finding_ids"] == ["f1", "f2"]
+
+
+def test_finding_skipped_once_quarantined():
+    store = MemoryStore()
+
+    guard = QuarantineGuard(store, INSTANCE_ID, "f1")
+    guard.acquire(_instance())
+    guard.complete()
+
+    assert QuarantineGuard(store, INSTANCE_ID, "f2").acquire(_instance(True)) == QUARANTINED
+
+
+def test_instance_tagged_without_record_skipped():
+    assert QuarantineGuard(MemoryStore(), INSTANCE_ID, "f1").acquire(_instance(True)) == QUARANTINED
+
+
+def test_failed_quarantine_resumed():
+    store = MemoryStore()
+
+    guard = QuarantineGuard(store, INSTANCE_ID, "f1")
+    guard.acquire(_instance())
+    guard.release()
+
+    # the instance may already look quarantined, the remaining plugins must still run
+    assert QuarantineGuard(store, INSTANCE_ID, "f1").acquire(_instance(True)) is None
+
+
+def test_concurrent_findings_quarantined_once():
+    store = MemoryStore()
+
+    def acquire(finding_id):
+        return QuarantineGuard(store, INSTANCE_ID, finding_id).acquire(_instance())
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        statuses = list(executor.map(acquire, [f"f{i}" for i in range(10)]))
+
+    assert statuses.count(None) == 1
+    assert statuses.count(IN_PROGRESS) == 9
+    assert len(store.get(f"quarantine#{INSTANCE_ID}")["finding_ids"]) == 10
+
+
+def test_quarantine_instance_skips_duplicate(session, monkeypatch):
+    def run_plugins(*args, **kwargs):
+        pytest.fail("plugins ran for a duplicate finding")
+
+    monkeypatch.setattr(lambda_handler, "_run_plugins", run_plugins)
+
+    instance_id = "i-0fedcba9876543210"
+    instance = {"InstanceId": instance_id, "Tags": [], "NetworkInterfaces": []}
+    QuarantineGuard(get_store(session), instance_id, "f1").acquire(instance)
+
+    context = InstanceContext(EC2(session), instance_id)
+    context.seed("instance", instance)
+
+    with Stubber(get_client(session, "sns")) as stubber:
+        stubber.add_response("publish", {"MessageId": "m1"})
+        lambda_handler.quarantine_instance(session, instance_id, "f2", instance_context=context)
+        stubber.assert_no_pending_responses()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+import pytest
+
+from quarantine.instrumentation import plugin_metrics
+from quarantine.resources.clients import get_client
+from quarantine.utils import ContextThreadPoolExecutor
+
+
+def test_calls_recorded_per_operation(session):
+    client = get_client(session, "ec2")
+
+    with Stubber(client) as stubber, plugin_metrics() as metrics:
+        stubber.add_response("describe_volumes", {"Volumes": []})
+        stubber.add_client_error("describe_volumes", "InvalidVolume.NotFound")
+
+        client.describe_volumes()
+        with pytest.raises(ClientError):
+            client.describe_volumes()
+
+    assert metrics.calls == {("ec2", "DescribeVolumes"): 2}
+    assert metrics.errors == {("ec2", "DescribeVolumes"): 1}
+    assert metrics.durations[("ec2", "DescribeVolumes")] >= 0
+
+
+def test_calls_from_plugin_threads_attributed(session):
+    client = get_client(session, "ec2")
+
+    with Stubber(client) as stubber, plugin_metrics() as metrics:
+        for _ in range(3):
+            stubber.add_response("describe_snapshots", {"Snapshots": []})
+
+        with ContextThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda _: client.describe_snapshots(), range(3)))
+
+    assert metrics.calls == {("ec2", "DescribeSnapshots"): 3}
+
+
+def test_calls_outside_plugin_not_recorded(session):
+    client = get_client(session, "ec2")
+
+    with plugin_metrics() as metrics:
+        pass
+
+    with Stubber(client) as stubber:
+        stubber.add_response("describe_volumes", {"Volumes": []})
+        client.describe_volumes()
+
+    assert metrics.calls == {}
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+from quarantine import lb_index
+from quarantine.lb_index import LoadBalancerIndex
+from quarantine.store import MemoryStore
+
+INSTANCE_ID = "i-0000000000000000a"
+TARGET_GROUP_ARN = "arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/tg/0123"
+
+
+class FakeELB:
+    def list_registrations(self):
+        return {INSTANCE_ID: ["classic"]}
+
+
+class FakeELBv2:
+    def list_registrations(self):
+        targets = [{"Id": INSTANCE_ID, "Port": 80}, {"Id": INSTANCE_ID, "Port": 8080}]
+        return {INSTANCE_ID: {TARGET_GROUP_ARN: targets}}
+
+
+def test_lookup_returns_targets_with_ports():
+    index = LoadBalancerIndex(MemoryStore(), FakeELB(), FakeELBv2())
+    assert index.rebuild() == 1
+
+    assert index.lookup(INSTANCE_ID) == {
+        "target_groups": {
+            TARGET_GROUP_ARN: [
+                {"Id": INSTANCE_ID, "Port": 80},
+                {"Id": INSTANCE_ID, "Port": 8080},
+            ]
+        },
+        "load_balancers": ["classic"],
+    }
+    assert index.lookup("i-0000000000000000b") is None
+
+
+def test_lookup_ignores_index_that_missed_a_rebuild(monkeypatch):
+    index = LoadBalancerIndex(MemoryStore(), FakeELB(), FakeELBv2())
+    index.rebuild()
+
+    # registrations made since the last build would be missed, so the instance must be scanned
+    built = time.time()
+    monkeypatch.setattr(time, "time", lambda: built + lb_index.LB_INDEX_REBUILD_SECS + 60)
+    assert index.lookup(INSTANCE_ID) is None
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+from quarantine.manifest import PLUGIN_MANIFEST, load_plugins
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Cold start budget of importing the handler, in microseconds
+IMPORT_BUDGET_US = int(os.getenv("IMPORT_BUDGET_US", "1500000"))
+
+
+def _import_handler() -> subprocess.CompletedProcess:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, quarantine.lambda_handler; print(*sorted(sys.modules))",
+        ],
+        cwd=SRC,
+        env=dict(os.environ, PYTHONPATH=SRC),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result
+
+
+def test_import_time_within_budget():
+    result = _import_handler()
+
+    match = re.search(r"\|\s*(\d+)\s*\| quarantine\.lambda_handler$", result.stderr, re.MULTILINE)
+    assert match is not None
+    assert int(match.group(1)) <= IMPORT_BUDGET_US
+
+
+def test_plugins_not_imported_with_handler():
+    modules = _import_handler().stdout.split()
+
+    for spec in PLUGIN_MANIFEST:
+        assert f"quarantine.plugins.{spec.module}" not in modules
+
+
+def test_load_plugins_selects_by_finding_type():
+    plugins = load_plugins("UnauthorizedAccess:EC2/SSHBruteForce")
+
+    assert [plugin.__name__ for plugin in plugins] == [
+        spec.name for spec in sorted(PLUGIN_MANIFEST, key=lambda spec: spec.order) if spec.enabled
+    ]
+    assert load_plugins("UnauthorizedAccess:EC2/SSHBruteForce") is plugins
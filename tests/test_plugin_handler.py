@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+from pathlib import Path
+
+import boto3
+from botocore.stub import Stubber
+import pytest
+
+from quarantine import lambda_handler, store
+from quarantine.resources.clients import get_client
+from quarantine.store import MemoryStore
+
+EVENT = json.loads((Path(__file__).parents[1] / "events" / "plugin_event.json").read_text())
+INSTANCE_ID = EVENT["finding"]["resource"]["instanceDetails"]["instanceId"]
+FINDING_ID = EVENT["finding"]["id"]
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """
+    A state store of its own, shared by every invocation of the test
+    """
+
+    memory_store = MemoryStore()
+    monkeypatch.setattr(store, "_MEMORY_STORE", memory_store)
+    return memory_store
+
+
+@pytest.fixture
+def stubs():
+    session = boto3._get_default_session()
+    stubbers = {service: Stubber(get_client(session, service)) for service in ("ec2", "s3", "sns")}
+    for stubber in stubbers.values():
+        stubber.activate()
+    yield stubbers
+    for stubber in stubbers.values():
+        stubber.deactivate()
+
+
+def _describe_instance(stubber):
+    stubber.add_response(
+        "describe_instances",
+        {"Reservations": [{"Instances": [{"InstanceId": INSTANCE_ID, "Tags": []}]}]},
+        {"InstanceIds": [INSTANCE_ID]},
+    )
+
+
+def _invoke(lambda_context, action, **fields):
+    return lambda_handler.plugin_handler({**EVENT, "action": action, **fields}, lambda_context)
+
+
+def test_plan_run_finalize(state, stubs, lambda_context):
+    _describe_instance(stubs["ec2"])
+    plan = _invoke(lambda_context, "plan")
+
+    assert plan["skipped"] is False
+    # plugins that depend on each other are grouped, containment comes first
+    contain = [group["plugins"] for group in plan["contain"]]
+    assert contain[0] == [
+        "RevokeInstanceProfile",
+        "CaptureMetadata",
+        "CommandOutput",
+        "IsolateInstance",
+    ]
+    assert all(group["timeout"] > 0 for phase in ("contain", "collect") for group in plan[phase])
+    assert state.get(f"quarantine#{INSTANCE_ID}")["status"] == "in_progress"
+
+    # the group from the event captures the instance metadata
+    _describe_instance(stubs["ec2"])
+    stubs["s3"].add_response("put_object", {})
+    run = _invoke(lambda_context, "run", owner=plan["owner"])
+
+    assert run["deferred"] == []
+    assert run["message"] is None
+    assert [result["plugin"] for result in run["results"]] == ["CaptureMetadata"]
+
+    # the manifest is written and the quarantine completed
+    stubs["s3"].add_response("put_object", {})
+    stubs["sns"].add_response("publish", {"MessageId": "1"})
+    finalized = _invoke(lambda_context, "finalize", owner=plan["owner"], results={"collect": [run]})
+
+    assert finalized == {"deferred": []}
+    for stubber in stubs.values():
+        stubber.assert_no_pending_responses()
+    assert state.get(f"quarantine#{INSTANCE_ID}")["status"] == "quarantined"
+
+
+def test_plan_release(state, stubs, lambda_context):
+    _describe_instance(stubs["ec2"])
+    plan = _invoke(lambda_context, "plan")
+
+    stubs["sns"].add_response("publish", {"MessageId": "1"})
+    released = _invoke(lambda_context, "release", owner=plan["owner"])
+
+    assert released == {"released": True}
+    stubs["sns"].assert_no_pending_responses()
+    # a retried execution resumes the quarantine
+    assert state.get(f"quarantine#{INSTANCE_ID}")["status"] == "failed"
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+import pytest
+
+from quarantine import budget, ratelimit
+from quarantine.constants import BUDGET_WINDOW_SECS
+from quarantine.resources.clients import get_client
+from quarantine.store import MemoryStore
+
+THROTTLED = (
+    b"<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+    b"<Message>Request limit exceeded.</Message></Error></Errors>"
+    b"<RequestID>ab0ea6a2-3a1b-4c6d-9e1f-0123456789ab</RequestID></Response>"
+)
+TAGGED = (
+    b'<CreateTagsResponse xmlns="http://ec2.amazonaws.com/doc/2016-11-15/">'
+    b"<requestId>ab0ea6a2-3a1b-4c6d-9e1f-0123456789ab</requestId><return>true</return>"
+    b"</CreateTagsResponse>"
+)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """
+    Fresh limiters and budget, so counters do not carry over from other tests
+    """
+
+    store = MemoryStore()
+    monkeypatch.setattr(ratelimit, "_LIMITERS", {})
+    monkeypatch.setattr(budget, "get_store", lambda session: store)
+    return store
+
+
+def _create_tags(client):
+    client.create_tags(
+        Resources=["i-0123456789abcdef0"], Tags=[{"Key": "SOC-Status", "Value": "x"}]
+    )
+
+
+def test_throttled_call_retried_within_budget(session, store, http_stub):
+    client = get_client(session, "ec2")
+    sent = http_stub(client, "CreateTags", [(503, THROTTLED), (200, TAGGED)])
+
+    window = int(time.time() // BUDGET_WINDOW_SECS)
+    _create_tags(client)
+    windows = range(window, int(time.time() // BUDGET_WINDOW_SECS) + 1)
+
+    assert len(sent) == 2
+    limiter = ratelimit.get_limiter("ec2", "CreateTags")
+    assert limiter.stats()["calls"] == 1
+    assert limiter.stats()["throttles"] == 1
+    assert limiter.rate < limiter.max_rate
+
+    # the retry is part of the same call, it takes budget once
+    used = [store.get(f"budget#123456789012#ec2.CreateTags#{w}") for w in windows]
+    assert sum(item["used"] for item in used if item is not None) == 1
+
+
+def test_throttling_reduces_rate_until_recovered(session, store):
+    client = get_client(session, "ec2")
+    limiter = ratelimit.get_limiter("ec2", "CreateTags")
+
+    with Stubber(client) as stubber:
+        stubber.add_client_error("create_tags", "RequestLimitExceeded", http_status_code=503)
+        for _ in range(limiter.RECOVERY_STEPS):
+            stubber.add_response("create_tags", {})
+
+        with pytest.raises(ClientError):
+            _create_tags(client)
+        assert limiter.rate == limiter.max_rate * limiter.DECREASE_FACTOR
+
+        _create_tags(client)
+        assert limiter.max_rate * limiter.DECREASE_FACTOR < limiter.rate < limiter.max_rate
+
+        for _ in range(limiter.RECOVERY_STEPS - 1):
+            _create_tags(client)
+        assert limiter.rate == limiter.max_rate
+
+    assert limiter.stats()["throttles"] == 1
+
+
+def test_limiter_spaces_calls_past_burst():
+    limiter = ratelimit.RateLimiter(rate=20.0, burst=2)
+
+    waited = [limiter.acquire() for _ in range(4)]
+
+    assert waited[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waited[2:])
+    assert limiter.stats()["delayed_calls"] == 2
+    assert limiter.stats()["delay_secs"] == pytest.approx(sum(waited))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from botocore.stub import Stubber
+
+from quarantine.manifest import get_plugins
+from quarantine.resources.clients import get_client
+
+INSTANCE_ID = "i-0000000000000000a"
+
+
+def _association(number):
+    return {
+        "AssociationId": f"iip-assoc-{number}",
+        "InstanceId": INSTANCE_ID,
+        "IamInstanceProfile": {
+            "Arn": f"arn:aws:iam::123456789012:instance-profile/profile-{number}",
+            "Id": f"AIPA{number}",
+        },
+        "State": "associated",
+    }
+
+
+def test_failed_disassociation_fails_plugin(session):
+    (plugin_class,) = get_plugins(["RevokeInstanceProfile"])
+    plugin = plugin_class(session, INSTANCE_ID, "f1")
+
+    with Stubber(get_client(session, "ec2")) as stubber:
+        stubber.add_response(
+            "describe_iam_instance_profile_associations",
+            {"IamInstanceProfileAssociations": [_association(1), _association(2)]},
+        )
+        stubber.add_client_error(
+            "disassociate_iam_instance_profile",
+            "UnauthorizedOperation",
+            expected_params={"AssociationId": "iip-assoc-1"},
+        )
+        stubber.add_response(
+            "disassociate_iam_instance_profile",
+            {},
+            {"AssociationId": "iip-assoc-2"},
+        )
+        message = plugin.execute()
+        # the second association is still removed
+        stubber.assert_no_pending_responses()
+
+    assert plugin.failed
+    assert message.startswith("Unable to remove IAM instance profiles")
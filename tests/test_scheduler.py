@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import threading
+import time
+
+import pytest
+
+from quarantine import scheduler
+from quarantine.plugins.abstract_plugin import CONTAIN, AbstractPlugin
+from quarantine.scheduler import Scheduler
+
+INSTANCE_ID = "i-0000000000000000a"
+
+
+class FakePlugin(AbstractPlugin):
+    def execute(self):
+        return f"{self.name} done"
+
+
+# ("start" or "end", plugin name) in the order they happened
+events = []
+_events_lock = threading.Lock()
+
+
+class TimedPlugin(AbstractPlugin):
+    """
+    Runs long enough for other plugins to start meanwhile
+    """
+
+    def execute(self):
+        with _events_lock:
+            events.append(("start", self.name))
+        time.sleep(0.05)
+        with _events_lock:
+            events.append(("end", self.name))
+        return f"{self.name} done"
+
+
+class Metadata(TimedPlugin):
+    pass
+
+
+class Memory(TimedPlugin):
+    depends_on = ("Metadata",)
+
+
+class Screenshot(TimedPlugin):
+    pass
+
+
+class Snapshot(TimedPlugin):
+    conflicts_with = ("Screenshot",)
+
+
+class Isolate(TimedPlugin):
+    depends_on = ("Memory",)
+    phase = CONTAIN
+
+
+class Tag(TimedPlugin):
+    phase = CONTAIN
+
+
+@pytest.fixture(autouse=True)
+def clear_events():
+    events.clear()
+
+
+def _run(session, plugin_classes, max_workers):
+    plugins = [plugin_class(session, INSTANCE_ID, "f1") for plugin_class in plugin_classes]
+    return Scheduler(plugins, max_workers=max_workers).run()
+
+
+def _index(event, name):
+    return events.index((event, name))
+
+
+def test_dependencies_run_first(session):
+    results = _run(session, [Memory, Metadata], max_workers=4)
+
+    assert _index("end", "Metadata") < _index("start", "Memory")
+    assert [plugin.name for plugin, _ in results] == ["Metadata", "Memory"]
+
+
+def test_conflicting_plugins_do_not_overlap(session):
+    # the conflict is only declared by Snapshot, it applies both ways
+    _run(session, [Screenshot, Snapshot], max_workers=4)
+
+    first, second = sorted(["Screenshot", "Snapshot"], key=lambda name: _index("start", name))
+    assert _index("end", first) < _index("start", second)
+
+
+def test_contain_path_runs_first(session):
+    _run(session, [Screenshot, Isolate, Memory, Metadata, Tag], max_workers=4)
+
+    # Metadata and Memory are collect plugins, but isolation depends on them
+    contain_path = ["Metadata", "Memory", "Isolate", "Tag"]
+    assert _index("start", "Screenshot") > max(_index("end", name) for name in contain_path)
+
+
+def test_sequential_fallback(session):
+    results = _run(session, [Screenshot, Isolate, Memory, Metadata, Tag], max_workers=1)
+
+    # the contain path first, plugins after the plugins they depend on, otherwise in order
+    order = ["Metadata", "Memory", "Isolate", "Tag", "Screenshot"]
+    assert [plugin.name for plugin, _ in results] == order
+    assert events == [(event, name) for name in order for event in ("start", "end")]
+
+
+def test_failure_entering_plugin_contexts_is_raised(monkeypatch, session):
+    @contextmanager
+    def plugin_deadline(seconds):
+        raise RuntimeError("no deadline")
+        yield
+
+    published = []
+    monkeypatch.setattr(scheduler, "plugin_deadline", plugin_deadline)
+    monkeypatch.setattr(scheduler, "publish_plugin_metrics", lambda *args: published.append(args))
+
+    plugin = FakePlugin(session, INSTANCE_ID, "f1")
+    with pytest.raises(RuntimeError, match="no deadline"):
+        Scheduler([plugin], max_workers=1)._execute(plugin)
+
+    # the plugin is still reported as failed, without API metrics
+    assert [(args[0], args[4], args[5]) for args in published] == [("FakePlugin", True, None)]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+
+import boto3
+from botocore.stub import Stubber
+import pytest
+
+from quarantine import lambda_handler
+from quarantine.resources.clients import get_client
+
+
+def _record(message_id, instance_id, finding_id):
+    finding = {
+        "id": finding_id,
+        "type": "UnauthorizedAccess:EC2/SSHBruteForce",
+        "severity": 5,
+        "resource": {"resourceType": "Instance", "instanceDetails": {"instanceId": instance_id}},
+    }
+    return {"messageId": message_id, "body": json.dumps(finding)}
+
+
+def _instance(instance_id):
+    return {"InstanceId": instance_id, "Tags": [], "NetworkInterfaces": []}
+
+
+@pytest.fixture
+def quarantined(monkeypatch):
+    """
+    Replace the plugin pipeline, quarantining i-bbbbbbbb fails
+    """
+
+    calls = []
+
+    def quarantine_instance(session, instance_id, finding_id, finding_type, context, *args):
+        calls.append((instance_id, finding_id, context))
+        if instance_id == "i-bbbbbbbb":
+            raise RuntimeError("Unable to isolate instance")
+
+    monkeypatch.setattr(lambda_handler, "quarantine_instance", quarantine_instance)
+    return calls
+
+
+def test_partial_batch_failure(quarantined, lambda_context):
+    session = boto3._get_default_session()
+    event = {
+        "Records": [
+            _record("m1", "i-aaaaaaaa", "f1"),
+            _record("m2", "i-aaaaaaaa", "f2"),
+            _record("m3", "i-bbbbbbbb", "f3"),
+            _record("m4", "i-cccccccc", "f4"),
+            {"messageId": "m5", "body": "not a finding"},
+        ]
+    }
+
+    ec2 = get_client(session, "ec2")
+    autoscaling = get_client(session, "autoscaling")
+    ssm = get_client(session, "ssm")
+    with Stubber(ec2) as ec2_stub, Stubber(autoscaling) as asg_stub, Stubber(ssm) as ssm_stub:
+        # i-cccccccc no longer exists
+        ec2_stub.add_response(
+            "describe_instances",
+            {"Reservations": [{"Instances": [_instance("i-aaaaaaaa"), _instance("i-bbbbbbbb")]}]},
+            {"InstanceIds": ["i-aaaaaaaa", "i-bbbbbbbb", "i-cccccccc"]},
+        )
+        asg_stub.add_response(
+            "describe_auto_scaling_instances",
+            {
+                "AutoScalingInstances": [
+                    {
+                        "InstanceId": "i-aaaaaaaa",
+                        "AutoScalingGroupName": "web",
+                        "AvailabilityZone": "us-east-1a",
+                        "LifecycleState": "InService",
+                        "HealthStatus": "HEALTHY",
+                        "ProtectedFromScaleIn": False,
+                    }
+                ]
+            },
+            {"InstanceIds": ["i-aaaaaaaa", "i-bbbbbbbb"]},
+        )
+        ssm_stub.add_response(
+            "describe_instance_information",
+            {"InstanceInformationList": []},
+            {"Filters": [{"Key": "InstanceIds", "Values": ["i-aaaaaaaa", "i-bbbbbbbb"]}]},
+        )
+
+        response = lambda_handler.sqs_handler(event, lambda_context)
+
+        ec2_stub.assert_no_pending_responses()
+        asg_stub.assert_no_pending_responses()
+        ssm_stub.assert_no_pending_responses()
+
+    failures = sorted(item["itemIdentifier"] for item in response["batchItemFailures"])
+    assert failures == ["m3", "m4", "m5"]
+
+    # both findings for i-aaaaaaaa are handled by a single quarantine
+    assert sorted(call[:2] for call in quarantined) == [
+        ("i-aaaaaaaa", "f1"),
+        ("i-bbbbbbbb", "f3"),
+    ]
+
+    # the batched describes are seeded so plugins do not describe the instance again
+    context = next(call[2] for call in quarantined if call[0] == "i-aaaaaaaa")
+    assert context.instance == _instance("i-aaaaaaaa")
+    assert context.auto_scaling_groups == ["web"]
+    assert context.instance_information == []
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import boto3
+from botocore.stub import Stubber
+
+from quarantine import lambda_handler
+from quarantine.resources.clients import get_client
+
+
+def _instance(instance_id, since):
+    return {
+        "InstanceId": instance_id,
+        "Tags": [
+            {"Key": "SOC-FindingId", "Value": "f1"},
+            {"Key": "SOC-PendingCommandId", "Value": f"command-{instance_id}"},
+            {"Key": "SOC-DeferredPlugins", "Value": "IsolateInstance,ParseCommandOutput"},
+            {"Key": "SOC-PendingSince", "Value": since},
+        ],
+    }
+
+
+def test_overdue_capture_completed_without_notification(monkeypatch, lambda_context):
+    completed = []
+
+    def complete_capture(session, sns, context, tags, command_id, status, deadline):
+        completed.append((context.instance_id, command_id, status))
+
+    monkeypatch.setattr(lambda_handler, "_complete_capture", complete_capture)
+
+    session = boto3._get_default_session()
+    with Stubber(get_client(session, "ec2")) as stubber:
+        stubber.add_response(
+            "describe_instances",
+            {
+                "Reservations": [
+                    {
+                        "Instances": [
+                            _instance("i-0000000000000000a", "2020-01-01T00:00:00Z"),
+                            _instance("i-0000000000000000b", lambda_handler.now()),
+                        ]
+                    }
+                ]
+            },
+            {"Filters": [{"Name": "tag-key", "Values": ["SOC-PendingCommandId"]}]},
+        )
+        lambda_handler.ssm_completion_handler(
+            {"source": "aws.events", "detail-type": "Scheduled Event"}, lambda_context
+        )
+
+    # the capture sent just now still waits for its notification
+    assert completed == [("i-0000000000000000a", "command-i-0000000000000000a", "Overdue")]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+* Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+* SPDX-License-Identifier: MIT-0
+*
+* Permission is hereby granted, free of charge, to any person obtaining a copy of this
+* software and associated documentation files (the "Software"), to deal in the Software
+* without restriction, including without limitation the rights to use, copy, modify,
+* merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+* permit persons to whom the Software is furnished to do so.
+*
+* THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+* INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+* PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+* HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+* OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+* SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Snapshot two volumes individually, in the thread pool of the plugin, with tracing enabled.
+# Tracing is configured when quarantine.tracing is imported, so this runs in a new interpreter.
+SNAPSHOT_VOLUMES = """
+import importlib, json
+
+import boto3
+from aws_xray_sdk.core import xray_recorder
+from botocore.stub import Stubber
+
+from quarantine.context import InstanceContext
+from quarantine.resources import EC2
+from quarantine.resources.clients import get_client
+from quarantine.tracing import get_trace_entity, plugin_trace
+
+sent = []
+xray_recorder.emitter.send_entity = lambda entity: sent.append(json.loads(entity.serialize()))
+
+session = boto3.Session(region_name="us-east-1")
+instance_id = "i-0123456789abcdef0"
+context = InstanceContext(EC2(session), instance_id)
+context.seed(
+    "instance",
+    {
+        "InstanceId": instance_id,
+        "BlockDeviceMappings": [
+            {"DeviceName": "/dev/xvda", "Ebs": {"VolumeId": "vol-0a"}},
+            {"DeviceName": "/dev/xvdb", "Ebs": {"VolumeId": "vol-0b"}},
+        ],
+    },
+)
+
+module = importlib.import_module("quarantine.plugins.07_snapshot_volumes")
+plugin = module.SnapshotVolumes(session, instance_id, "f1", context)
+
+with Stubber(get_client(session, "ec2")) as stubber:
+    stubber.add_client_error("create_snapshots", "InvalidParameterValue")
+    stubber.add_response("create_snapshot", {"SnapshotId": "snap-0a"})
+    stubber.add_response("create_snapshot", {"SnapshotId": "snap-0b"})
+    with plugin_trace("SnapshotVolumes", "collect", instance_id, "f1", get_trace_entity()):
+        plugin.execute()
+
+print(json.dumps({"failed": plugin.failed, "output": plugin.output, "sent": sent}))
+"""
+
+
+def _entities(sent):
+    """
+    Every subsegment sent, keyed by ID. Subsegments are streamed as they close, so a child is
+    either nested in its parent or sent on its own with the ID of its parent.
+    """
+
+    entities = {}
+
+    def add(entity, parent_id=None):
+        entity.setdefault("parent_id", parent_id)
+        entities[entity["id"]] = entity
+        for subsegment in entity.pop("subsegments", []):
+            add(subsegment, entity["id"])
+
+    for entity in sent:
+        add(entity)
+    return entities
+
+
+def test_snapshot_calls_under_plugin_subsegment():
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC,
+        POWERTOOLS_TRACE_DISABLED="false",
+        AWS_LAMBDA_FUNCTION_NAME="quarantine",
+        LAMBDA_TASK_ROOT=SRC,
+        _X_AMZN_TRACE_ID="Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", SNAPSHOT_VOLUMES],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    run = json.loads(result.stdout.splitlines()[-1])
+
+    assert not run["failed"]
+    assert run["output"]["snapshot_ids"] == {"vol-0a": "snap-0a", "vol-0b": "snap-0b"}
+
+    entities = _entities(run["sent"])
+    (plugin,) = [e for e in entities.values() if e["name"] == "## SnapshotVolumes.execute"]
+    snapshots = [e for e in entities.values() if e["name"] == "## EC2.create_snapshot"]
+
+    # both pool threads continue the trace of the plugin, with their API call within
+    assert len(snapshots) == 2
+    for snapshot in snapshots:
+        assert snapshot["parent_id"] == plugin["id"]
+        assert snapshot["annotations"]["instance_id"] == "i-0123456789abcdef0"
+        assert snapshot["annotations"]["api_calls"] == 1
+
+        (call,) = [e for e in entities.values() if e["parent_id"] == snapshot["id"]]
+        assert call["namespace"] == "aws"
+        assert call["aws"]["operation"] == "CreateSnapshot"
+
+    assert plugin["annotations"]["api_calls"] == 3